@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Switch Tracker API 响应缓存
+数据只在收集脚本入库（或导入翻译）时变化，这两处都会把 meta 表中的数据版本号加一。
+API 响应按 (路径, 查询参数) 缓存，并以数据版本号生成强 ETag：
+
+- 浏览器带着相同的 If-None-Match 再次请求时直接返回 304
+- 其他客户端命中缓存时直接返回已编码好的 JSON，不再查询和序列化
+- 响应按 Accept-Encoding 压缩，压缩结果同样缓存；流式响应边发送边写入缓存
+- 数据版本号在进程内缓存，只有数据库被其他连接修改后才重新读取
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import current_app, request
+
+import database
+from api_encoding import MIN_COMPRESS_SIZE, compress, compress_chunks, negotiate_encoding
+
+# 最多缓存的响应数量
+MAX_ENTRIES = 256
+
+
+class ResponseCache:
+    """线程安全的 LRU 缓存，条目与数据版本号绑定"""
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._version = None
+        self._lock = threading.Lock()
+
+    def _check_version(self, version):
+        """数据版本变化后旧条目不会再被命中，直接全部丢弃以释放内存"""
+        if version != self._version:
+            self._entries.clear()
+            self._version = version
+
+    def get(self, key, version):
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, version, value):
+        with self._lock:
+            # 旧版本的请求在数据更新后才完成时，不能把过期结果写入缓存
+            if version != self._version:
+                return
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class CachedBody:
+    """缓存的响应体，压缩后的版本按需生成并一并保存"""
+
+    __slots__ = ('body', 'mimetype', 'headers', 'encoded', 'chunks')
+
+    def __init__(self, body, mimetype, headers, chunks=None):
+        self.body = body
+        self.mimetype = mimetype
+        self.headers = headers
+        self.encoded = {}
+        # 流式响应的原始分块：首次发送时逐块压缩，之后按同样的分块压缩，
+        # 同一个 ETag 无论是否命中缓存都对应同一份字节
+        self.chunks = chunks
+
+    def get(self, encoding):
+        """返回 (响应体, 实际使用的压缩方式)"""
+        if encoding is None or (self.chunks is None and len(self.body) < MIN_COMPRESS_SIZE):
+            return self.body, None
+        if encoding not in self.encoded:
+            if self.chunks is None:
+                self.encoded[encoding] = compress(self.body, encoding)
+            else:
+                self.encoded[encoding] = b''.join(compress_chunks(self.chunks, encoding))
+        return self.encoded[encoding], encoding
+
+
+response_cache = ResponseCache()
+
+
+class DataVersionWatcher:
+    """进程内缓存的数据版本号
+
+    常驻一个只读连接，每次请求只执行 PRAGMA data_version：其他连接提交修改后该值才会变化，
+    此时才重新读取 meta 表中的数据版本号。PRAGMA 不读取任何数据页，比从连接池取连接查询便宜得多
+    """
+
+    def __init__(self):
+        self._conn = None
+        self._db_file = None
+        self._pragma_version = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        with self._lock:
+            # 基准测试等场景会切换数据库文件，切换后重新打开连接
+            if self._db_file != database.DB_FILE:
+                self._close()
+                self._conn = sqlite3.connect(database.DB_FILE, timeout=database.BUSY_TIMEOUT,
+                                             check_same_thread=False)
+                self._db_file = database.DB_FILE
+            pragma_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if pragma_version != self._pragma_version:
+                self._version = database.get_data_version(self._conn)
+                self._pragma_version = pragma_version
+            return self._version
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._db_file = None
+        self._pragma_version = None
+        self._version = None
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+
+data_version = DataVersionWatcher()
+
+
+def current_version():
+    """当前数据版本；包含日期，因为“本周/本月”等统计会随日期变化"""
+    return f'{data_version.get()}.{date.today().isoformat()}'
+
+
+def _stream_into_cache(chunks, key, version, mimetype, headers, encoding):
+    """边发送流式响应边收集原始和压缩后的响应体，完整发送后写入缓存，
+    之后命中缓存时返回与首次发送完全相同的字节"""
+    parts = []
+    encoded_parts = []
+
+    def collect():
+        for chunk in chunks:
+            parts.append(chunk)
+            yield chunk
+
+    output = compress_chunks(collect(), encoding) if encoding else collect()
+    for chunk in output:
+        encoded_parts.append(chunk)
+        yield chunk
+
+    cached = CachedBody(b''.join(parts), mimetype, headers, chunks=parts)
+    if encoding:
+        cached.encoded[encoding] = b''.join(encoded_parts)
+    response_cache.put(key, version, cached)
+
+
+def cached_response(view):
+    """为 API 视图添加 ETag/304、内容协商压缩和按数据版本失效的响应缓存"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        version = current_version()
+        key = (request.path, tuple(sorted(request.args.items(multi=True))))
+        encoding = negotiate_encoding(request.accept_encodings)
+        etag = hashlib.sha1(repr((version, key, encoding)).encode('utf-8')).hexdigest()[:20]
+
+        if request.if_none_match.contains(etag):
+            response = current_app.response_class(status=304)
+        else:
+            cached = response_cache.get(key, version)
+            if cached is None:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                # 保留视图设置的额外响应头（如分页的 X-Next-Cursor）
+                headers = [(name, value) for name, value in response.headers
+                           if name.startswith('X-')]
+                if response.is_streamed:
+                    response.response = _stream_into_cache(
+                        response.response, key, version, response.mimetype, headers, encoding
+                    )
+                    if encoding:
+                        response.headers['Content-Encoding'] = encoding
+                    cached = None
+                else:
+                    cached = CachedBody(response.get_data(), response.mimetype, headers)
+                    response_cache.put(key, version, cached)
+            if cached is not None:
+                body, used_encoding = cached.get(encoding)
+                response = current_app.response_class(body, mimetype=cached.mimetype, headers=cached.headers)
+                if used_encoding:
+                    response.headers['Content-Encoding'] = used_encoding
+
+        response.set_etag(etag)
+        response.vary.add('Accept-Encoding')
+        # 允许浏览器缓存，但每次使用前都要带 If-None-Match 向服务器确认
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
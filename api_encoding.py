@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Switch Tracker API 响应编码
+- 流式 JSON：边读取 sqlite 游标边输出，不在内存中构建完整列表
+- 内容协商压缩：支持 br（需安装 brotli）和 gzip
+"""
+
+import json
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# 小于该大小的响应不压缩
+MIN_COMPRESS_SIZE = 1024
+# 流式输出时每次发送的最小字节数
+STREAM_CHUNK_SIZE = 16 * 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+
+def dumps(obj):
+    """紧凑的 JSON 编码，中文直接输出为 UTF-8"""
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def json_array_chunks(items):
+    """把可迭代对象编码为 JSON 数组，按 STREAM_CHUNK_SIZE 分块输出"""
+    buffer = ['[']
+    size = 1
+    first = True
+    for item in items:
+        encoded = dumps(item)
+        buffer.append(encoded if first else ',' + encoded)
+        size += len(encoded) + 1
+        first = False
+        if size >= STREAM_CHUNK_SIZE:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    buffer.append(']')
+    yield ''.join(buffer).encode('utf-8')
+
+
+def negotiate_encoding(accept_encodings):
+    """根据 Accept-Encoding 选择压缩方式，返回 'br'、'gzip' 或 None"""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def _compressor(encoding):
+    """返回 (压缩函数, 刷新函数, 结束函数)"""
+    if encoding == 'br':
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        return compressor.process, compressor.flush, compressor.finish
+    # wbits=31 输出带 gzip 头的数据
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def compress(body, encoding):
+    """一次性压缩完整响应体"""
+    process, _, finish = _compressor(encoding)
+    return process(body) + finish()
+
+
+def compress_chunks(chunks, encoding):
+    """流式压缩，每个输入块都会刷新输出，客户端可以尽早收到数据"""
+    process, flush, finish = _compressor(encoding)
+    for chunk in chunks:
+        yield process(chunk) + flush()
+    yield finish()
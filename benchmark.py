@@ -0,0 +1,1155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Switch Tracker 性能基准测试脚本
+在临时的合成数据库上对比新旧实现的耗时
+
+用法:
+    python benchmark.py history [--years 5] [--titles 500] [--titles-per-day 20]
+    python benchmark.py concurrency [--readers 8] [--duration 10]
+    python benchmark.py payload [--years 5]   # 比较 /api/history 的压缩和响应结构
+    python benchmark.py load [--url http://127.0.0.1:8000] [--concurrency 16]
+    python benchmark.py accounts [--accounts 1 2 4 8 16] [--workers 4]
+    python benchmark.py archive [--snapshots 500] [--titles 200]
+    python benchmark.py rebuild [--snapshots 1000] [--workers 4]
+    python benchmark.py ingest [--sizes 1000 10000 100000]
+    python benchmark.py parse [--titles 10000]
+    python benchmark.py detail [--years 5] [--points 200]
+    python benchmark.py calendar [--years 5]
+    python benchmark.py day [--years 5]
+    python benchmark.py dashboard [--years 2]
+    python benchmark.py search [--titles 2000]
+    python benchmark.py translations [--count 5000]
+"""
+
+import io
+import os
+import csv
+import sys
+import json
+import time
+import random
+import sqlite3
+import argparse
+import tempfile
+import tracemalloc
+import http.client
+import urllib.parse
+import threading
+from contextlib import contextmanager, redirect_stdout, ExitStack
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from datetime import date, datetime, timedelta
+
+import api_cache
+import api_encoding
+import database
+import game_names
+import get_switch_data
+import history_archive
+import play_records
+import server
+
+
+def build_synthetic_db(db_file, years=5, titles=500, titles_per_day=20, seed=42):
+    """生成合成数据库：titles 款游戏，years 年的每日游玩记录"""
+    rng = random.Random(seed)
+    database.DB_FILE = db_file
+    get_switch_data.init_database()
+
+    conn = sqlite3.connect(db_file)
+    title_ids = [f'0100{i:012X}' for i in range(titles)]
+    conn.executemany('''
+    INSERT OR REPLACE INTO games (title_id, title_name, image_url, device_type)
+    VALUES (?, ?, ?, ?)
+    ''', [
+        (title_id, f'Game {i}', f'https://example.com/images/{title_id}.jpg', 'HAC')
+        for i, title_id in enumerate(title_ids)
+    ])
+    game_names.refresh_search_index(conn)
+
+    start = date.today() - timedelta(days=365 * years)
+    collected_at = date.today().isoformat()
+    rows = []
+    for offset in range(365 * years):
+        played_date = (start + timedelta(days=offset)).isoformat()
+        for title_id in rng.sample(title_ids, min(titles_per_day, titles)):
+            rows.append((title_id, played_date, rng.randint(1, 180), collected_at))
+    conn.executemany('''
+    INSERT INTO daily_play (title_id, played_date, played_minutes, collected_at)
+    VALUES (?, ?, ?, ?)
+    ''', rows)
+    get_switch_data.rebuild_play_rollups(conn)
+    conn.executemany('''
+    INSERT INTO game_latest (title_id, total_played_days, total_played_minutes, collected_at)
+    VALUES (?, ?, ?, ?)
+    ''', [(title_id, 10, rng.randint(60, 6000), collected_at) for title_id in title_ids])
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def timed(func, repeat=3):
+    """运行 repeat 次，返回最快一次的耗时（秒）和最后一次的结果"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def legacy_history(db_file):
+    """旧版 /api/history：先取出所有日期，再逐日查询（N+1）"""
+    conn = sqlite3.connect(db_file)
+    conn.row_factory = sqlite3.Row
+    dates = [row['played_date'] for row in conn.execute('''
+        SELECT DISTINCT played_date FROM daily_play ORDER BY played_date DESC
+    ''')]
+    history = []
+    for played_date in dates:
+        cursor = conn.execute('''
+            SELECT
+                d.title_id,
+                CASE
+                    WHEN g.chinese_name IS NOT NULL AND g.chinese_name != ''
+                    THEN g.chinese_name
+                    ELSE g.title_name
+                END AS display_name,
+                g.image_url,
+                d.played_minutes
+            FROM daily_play d
+            JOIN games g ON d.title_id = g.title_id
+            WHERE d.played_date = ?
+            ORDER BY d.played_minutes DESC
+        ''', (played_date,))
+        games = [{
+            'title_id': row['title_id'],
+            'name': row['display_name'],
+            'image_url': row['image_url'],
+            'minutes': row['played_minutes']
+        } for row in cursor]
+        if games:
+            history.append({'date': played_date, 'games': games})
+    conn.close()
+    return json.dumps(history).encode('utf-8')
+
+
+def bench_history(args):
+    """对比 /api/history 新旧实现"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'bench.db')
+        row_count = build_synthetic_db(db_file, args.years, args.titles, args.titles_per_day)
+        print(f"合成数据: {args.years} 年, {args.titles} 款游戏, {row_count} 条每日记录")
+
+        database.DB_FILE = db_file
+        client = server.app.test_client()
+
+        def fetch(query=''):
+            # 测量的是查询和序列化本身，不能命中响应缓存
+            api_cache.response_cache.clear()
+            response = client.get(f'/api/history{query}')
+            assert response.status_code == 200, response.status_code
+            return response.data
+
+        legacy_time, legacy_body = timed(lambda: legacy_history(db_file), args.repeat)
+        full_time, full_body = timed(fetch, args.repeat)
+        month_time, month_body = timed(lambda: fetch('?limit=31'), args.repeat)
+
+        assert len(json.loads(legacy_body)) == len(json.loads(full_body))
+
+        print(f"{'路径':<28}{'耗时(ms)':>12}{'响应大小(KB)':>16}")
+        for label, elapsed, body in [
+            ('旧版 N+1 全量', legacy_time, legacy_body),
+            ('新版 单次查询 全量', full_time, full_body),
+            ('新版 单次查询 limit=31', month_time, month_body),
+        ]:
+            print(f"{label:<28}{elapsed * 1000:>12.1f}{len(body) / 1024:>16.1f}")
+        print(f"全量加速比: {legacy_time / full_time:.1f}x")
+
+
+def percentile(values, fraction):
+    """返回已排序列表中的分位数"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def synthetic_payload(title_ids, round_no, days=7, titles_per_day=20):
+    """生成与 play_histories 接口结构相同的合成数据，每一轮的时长都会增加"""
+    today = date.today()
+    return {
+        'playHistories': [{
+            'titleId': title_id,
+            'titleName': f'Game {i}',
+            'imageUrl': f'https://example.com/images/{title_id}.jpg',
+            'deviceType': 'HAC',
+            'totalPlayedDays': 10 + round_no,
+            'totalPlayedMinutes': 600 + i + round_no,
+        } for i, title_id in enumerate(title_ids)],
+        'recentPlayHistories': [{
+            'playedDate': (today - timedelta(days=offset)).isoformat(),
+            'dailyPlayHistories': [{
+                'titleId': title_id,
+                'totalPlayedMinutes': 30 + round_no,
+            } for title_id in title_ids[:titles_per_day]],
+        } for offset in range(days)],
+    }
+
+
+def run_concurrency(db_file, readers, duration):
+    """一个写线程持续入库，同时 readers 个线程请求 /api/games，返回统计结果"""
+    title_ids = [row[0] for row in sqlite3.connect(db_file).execute('SELECT title_id FROM games')]
+    stop = threading.Event()
+    latencies = []
+    errors = []
+    writes = []
+
+    def reader():
+        client = server.app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            try:
+                response = client.get('/api/games')
+                if response.status_code != 200:
+                    errors.append(response.status_code)
+                    continue
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    def writer():
+        round_no = 0
+        while not stop.is_set():
+            round_no += 1
+            start = time.perf_counter()
+            if get_switch_data.save_to_database(synthetic_payload(title_ids, round_no)):
+                writes.append(time.perf_counter() - start)
+            else:
+                errors.append('save_to_database')
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'rps': len(latencies) / duration,
+        'p50': percentile(latencies, 0.50) * 1000,
+        'p99': percentile(latencies, 0.99) * 1000,
+        'writes': len(writes),
+        'errors': len(errors),
+    }
+
+
+def bench_concurrency(args):
+    """对比旧连接方式（每次新建连接、回滚日志）与共享连接池（WAL）在读写并发下的表现"""
+    legacy_settings = {
+        'CONNECTION_PRAGMAS': ('PRAGMA journal_mode = DELETE', 'PRAGMA synchronous = FULL'),
+        'POOL_SIZE': 0,
+        'BUSY_TIMEOUT': 5.0,
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for label, settings in [('旧版 无连接池/DELETE', legacy_settings), ('连接池/WAL', {})]:
+            saved = {name: getattr(database, name) for name in settings}
+            for name, value in settings.items():
+                setattr(database, name, value)
+            try:
+                db_file = os.path.join(tmp_dir, f'concurrency_{len(results)}.db')
+                database.close_all_connections()
+                api_cache.response_cache.clear()
+                build_synthetic_db(db_file, years=1, titles=args.titles, titles_per_day=10)
+                database.close_all_connections()
+                results.append((label, run_concurrency(db_file, args.readers, args.duration)))
+            finally:
+                for name, value in saved.items():
+                    setattr(database, name, value)
+                database.close_all_connections()
+
+    print(f"{args.readers} 个读线程请求 /api/games，1 个写线程持续入库，持续 {args.duration} 秒")
+    print(f"{'模式':<24}{'请求数':>10}{'req/s':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'入库次数':>10}{'错误':>8}")
+    for label, r in results:
+        print(f"{label:<24}{r['requests']:>10}{r['rps']:>10.1f}{r['p50']:>10.1f}"
+              f"{r['p99']:>10.1f}{r['writes']:>10}{r['errors']:>8}")
+
+
+@contextmanager
+def running_server(app):
+    """在后台线程中启动真实的 HTTP 服务器，产出 (host, port)"""
+    from werkzeug.serving import make_server
+
+    http_server = make_server('127.0.0.1', 0, app, threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield '127.0.0.1', http_server.port
+    finally:
+        http_server.shutdown()
+        thread.join()
+
+
+def measure_request(host, port, url, headers):
+    """发送一次请求，返回 (传输字节数, 首字节时间, 总耗时)，时间单位为秒"""
+    connection = http.client.HTTPConnection(host, port)
+    start = time.perf_counter()
+    connection.request('GET', url, headers=headers)
+    response = connection.getresponse()
+    first = response.read(1)
+    ttfb = time.perf_counter() - start
+    body = first + response.read()
+    total = time.perf_counter() - start
+    connection.close()
+    assert response.status == 200, (url, response.status)
+    return len(body), ttfb, total
+
+
+def bench_payload(args):
+    """测量 /api/history 在不同压缩方式和响应结构下的传输大小、首字节时间和总耗时"""
+    variants = [
+        ('未压缩', '/api/history', {}),
+        ('gzip', '/api/history', {'Accept-Encoding': 'gzip'}),
+    ]
+    if api_encoding.brotli is not None:
+        variants.append(('br', '/api/history', {'Accept-Encoding': 'br'}))
+    variants += [
+        ('normalized', '/api/history?shape=normalized', {}),
+        ('normalized+gzip', '/api/history?shape=normalized', {'Accept-Encoding': 'gzip'}),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'payload.db')
+        row_count = build_synthetic_db(db_file, args.years, args.titles, args.titles_per_day)
+        print(f"合成数据: {args.years} 年, {args.titles} 款游戏, {row_count} 条每日记录")
+        database.DB_FILE = db_file
+        database.close_all_connections()
+
+        legacy_size = len(legacy_history(db_file))
+        results = []
+        with running_server(server.app) as (host, port):
+            for label, url, headers in variants:
+                samples = []
+                for _ in range(args.repeat):
+                    # 每次都清空响应缓存，测量的是查询和编码的耗时
+                    api_cache.response_cache.clear()
+                    samples.append(measure_request(host, port, url, headers))
+                size = samples[0][0]
+                ttfb = min(sample[1] for sample in samples)
+                total = min(sample[2] for sample in samples)
+                results.append((label, size, ttfb, total))
+        database.close_all_connections()
+
+    print(f"旧版响应（json.dumps 整体输出，未压缩）: {legacy_size / 1024:.1f} KiB")
+    print(f"{'方式':<20}{'大小(KiB)':>12}{'压缩比':>10}{'首字节(ms)':>12}{'总耗时(ms)':>12}")
+    for label, size, ttfb, total in results:
+        print(f"{label:<20}{size / 1024:>12.1f}{legacy_size / size:>9.1f}x"
+              f"{ttfb * 1000:>12.1f}{total * 1000:>12.1f}")
+
+
+def load_routes(conn):
+    """压测的 /api 路由，覆盖 server.py 中所有查询分支"""
+    title_id, played_date = conn.execute(
+        'SELECT title_id, played_date FROM daily_play ORDER BY played_date DESC LIMIT 1'
+    ).fetchone()
+    return [
+        '/api/monthly_playtime',
+        '/api/accounts',
+        '/api/stats/period',
+        f'/api/stats/period?title_id={title_id}',
+        '/api/stats/period/day?limit=30',
+        f'/api/stats/period/week?title_id={title_id}',
+        '/api/stats/period/month?from=2000-01&to=2100-12',
+        '/api/games',
+        '/api/games?q=Game%201&sort=last_played&limit=10',
+        '/api/games?device_type=HAC&sort=days&offset=10&limit=10',
+        '/api/games?q=Ga&sort=name&offset=5&limit=5',
+        '/api/games?device_type=HAC&played_since=2000-01-01&sort=first_played&order=asc',
+        f'/api/game/{title_id}/daily',
+        f'/api/game/{title_id}/daily?from=2000-01-01&to={played_date}&bucket=week',
+        f'/api/game/{title_id}/daily?bucket=month&points=12',
+        '/api/history',
+        '/api/history?limit=31',
+        '/api/history?shape=normalized',
+        f'/api/history?limit=7&cursor={played_date}',
+        f'/api/history?from={played_date}&to={played_date}',
+        '/api/recent_activities',
+        '/api/calendar',
+        '/api/dashboard',
+        f'/api/day/{played_date}',
+        f'/api/calendar?year={played_date[:4]}&format=uint16',
+    ]
+
+
+def run_load(host, port, url, concurrency, requests_per_thread):
+    """concurrency 个线程各自发送 requests_per_thread 次请求，返回 (吞吐, 延迟列表, 错误数)"""
+    latencies = []
+    errors = []
+
+    def client():
+        # 每个线程复用一个 HTTP/1.1 长连接，与浏览器的行为一致
+        connection = http.client.HTTPConnection(host, port, timeout=30)
+        for _ in range(requests_per_thread):
+            start = time.perf_counter()
+            try:
+                connection.request('GET', url, headers={'Accept-Encoding': 'gzip'})
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    errors.append(response.status)
+                    continue
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(str(e))
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            latencies.append(time.perf_counter() - start)
+        connection.close()
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies, len(errors)
+
+
+def bench_load(args):
+    """对每个 /api 路由进行并发压测，报告 req/s 和 p50/p99 延迟"""
+    with ExitStack() as stack:
+        if args.url:
+            parsed = urllib.parse.urlsplit(args.url)
+            host, port = parsed.hostname, parsed.port or 80
+            conn = sqlite3.connect(database.DB_FILE)
+        else:
+            tmp_dir = stack.enter_context(tempfile.TemporaryDirectory())
+            db_file = os.path.join(tmp_dir, 'load.db')
+            row_count = build_synthetic_db(db_file, args.years, args.titles, args.titles_per_day)
+            print(f"合成数据: {args.years} 年, {args.titles} 款游戏, {row_count} 条每日记录")
+            database.DB_FILE = db_file
+            database.close_all_connections()
+            host, port = stack.enter_context(running_server(server.app))
+            conn = sqlite3.connect(db_file)
+        routes = load_routes(conn)
+        conn.close()
+
+        print(f"并发数 {args.concurrency}，每个线程 {args.requests} 次请求")
+        print(f"{'路由':<48}{'req/s':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'错误':>8}")
+        failures = 0
+        for url in routes:
+            rps, latencies, errors = run_load(host, port, url, args.concurrency, args.requests)
+            print(f"{url[:47]:<48}{rps:>10.1f}{percentile(latencies, 0.50) * 1000:>10.1f}"
+                  f"{percentile(latencies, 0.99) * 1000:>10.1f}{errors:>8}")
+            failures += errors
+    return 1 if failures else 0
+
+
+class MockNintendoApi:
+    """本地模拟的 play_histories 和访问令牌接口的状态"""
+
+    def __init__(self, latency, title_count):
+        self.latency = latency
+        self.title_ids = [f'0100{i:012X}' for i in range(title_count)]
+        self.issued = 0
+        self.lock = threading.Lock()
+
+    def issue_token(self):
+        with self.lock:
+            self.issued += 1
+            return {'token_type': 'Bearer', 'access_token': f'issued-{self.issued}', 'expires_in': 900}
+
+
+@contextmanager
+def mock_nintendo_api(latency, title_count=50, rate=None):
+    """启动模拟接口，并在期间把 get_switch_data 的接口地址和限流器指向它，产出 MockNintendoApi"""
+    api = MockNintendoApi(latency, title_count)
+
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            time.sleep(api.latency)
+            token = self.headers.get('Authorization', '').split(' ')[-1]
+            # 不同账号的令牌返回不同的数据
+            self.send_json(200, synthetic_payload(api.title_ids, sum(token.encode('utf-8'))))
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            time.sleep(api.latency)
+            self.send_json(200, api.issue_token())
+
+        def log_message(self, format, *args):
+            pass
+
+    mock_server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=mock_server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f'http://127.0.0.1:{mock_server.server_port}'
+    saved = {name: getattr(get_switch_data, name)
+             for name in ('PLAY_HISTORIES_URL', 'ACCESS_TOKEN_URL', 'host_rate_limiter')}
+    get_switch_data.PLAY_HISTORIES_URL = f'{base_url}/api/v1.1/users/me/play_histories'
+    get_switch_data.ACCESS_TOKEN_URL = f'{base_url}/connect/1.0.0/api/token'
+    get_switch_data.host_rate_limiter = get_switch_data.HostRateLimiter(rate)
+    try:
+        yield api
+    finally:
+        for name, value in saved.items():
+            setattr(get_switch_data, name, value)
+        mock_server.shutdown()
+        thread.join()
+
+
+@contextmanager
+def scratch_directory():
+    """收集过程会写入 history_data/、config/ 和指标文件，全部放在临时目录中"""
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        os.chdir(tmp_dir)
+        try:
+            yield tmp_dir
+        finally:
+            os.chdir(original_dir)
+            database.close_all_connections()
+
+
+def bench_accounts(args):
+    """多账号收集：对比逐个收集与线程池并发收集的总耗时"""
+    import daily_collect
+
+    results = []
+    with scratch_directory() as tmp_dir, mock_nintendo_api(args.latency, rate=args.rate):
+        for count in args.accounts:
+            row = [count]
+            for max_workers in (1, args.workers):
+                database.close_all_connections()
+                database.DB_FILE = os.path.join(tmp_dir, f'accounts_{count}_{max_workers}.db')
+                get_switch_data.init_database()
+                sessions = {}
+                for i in range(count):
+                    ns = get_switch_data.nsession(account_id=f'account{i}')
+                    ns.access_token = {'token_type': 'Bearer', 'access_token': f'token-{i}'}
+                    ns.expires_at = time.time() + 3600
+                    sessions[ns.account_id] = ns
+                start = time.perf_counter()
+                with redirect_stdout(io.StringIO()):
+                    metrics = daily_collect.collect_accounts(sessions, max_workers)
+                row.append(time.perf_counter() - start)
+                assert all(m['ok'] for m in metrics.values()), metrics
+            results.append(row)
+
+    print(f"模拟接口延迟 {args.latency * 1000:.0f} ms，线程池大小 {args.workers}，限流 {args.rate} 次/秒")
+    print(f"{'账号数':>8}{'逐个收集(s)':>14}{'并发收集(s)':>14}{'加速比':>10}")
+    for count, sequential, concurrent in results:
+        print(f"{count:>8}{sequential:>14.2f}{concurrent:>14.2f}{sequential / concurrent:>9.1f}x")
+
+
+def directory_size(directory):
+    return sum(os.path.getsize(os.path.join(root, name))
+               for root, _, names in os.walk(directory) for name in names)
+
+
+def bench_archive(args):
+    """对比旧的格式化 JSON 文件与压缩归档的磁盘占用，以及从归档重新导入的速度"""
+    title_ids = [f'0100{i:012X}' for i in range(args.titles)]
+    with scratch_directory() as tmp_dir:
+        # 模拟按间隔收集：每 changes_every 次采集中数据只变化一次
+        os.makedirs(history_archive.LEGACY_HISTORY_DIR)
+        start_time = datetime(2024, 1, 1)
+        for i in range(args.snapshots):
+            payload = synthetic_payload(title_ids, i // args.changes_every)
+            captured_at = start_time + timedelta(minutes=15 * i)
+            path = os.path.join(history_archive.LEGACY_HISTORY_DIR,
+                                captured_at.strftime('history_%Y%m%d_%H%M%S.json'))
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(payload, f, ensure_ascii=False, indent=2)
+        legacy_size = directory_size(history_archive.LEGACY_HISTORY_DIR)
+
+        start = time.perf_counter()
+        history_archive.import_history_files()
+        import_elapsed = time.perf_counter() - start
+        objects, archive_bytes = history_archive.archive_size()
+        index_bytes = os.path.getsize(os.path.join(history_archive.ARCHIVE_DIR, history_archive.INDEX_FILE))
+
+        start = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            replayed, skipped = history_archive.replay(os.path.join(tmp_dir, 'replay.db'))
+        replay_elapsed = time.perf_counter() - start
+
+    codec = 'zstd' if history_archive.zstandard is not None else 'lzma'
+    print(f"{args.snapshots} 次采集，{args.titles} 款游戏，每 {args.changes_every} 次变化一次")
+    print(f"旧格式 history_data/: {legacy_size / 1024 / 1024:.2f} MiB")
+    print(f"归档（{codec}）: {objects} 份不同的响应 {archive_bytes / 1024:.1f} KiB + 索引 {index_bytes / 1024:.1f} KiB，"
+          f"压缩比 {legacy_size / (archive_bytes + index_bytes):.0f}x，导入耗时 {import_elapsed:.2f}s")
+    print(f"replay: 导入 {replayed} 个快照，跳过 {skipped} 个重复快照，耗时 {replay_elapsed:.2f}s "
+          f"（{replayed / replay_elapsed:.1f} 快照/秒）")
+
+
+def archive_synthetic_snapshots(snapshots, titles, titles_per_day=20):
+    """把 snapshots 次合成采集写入归档：每次采集只有部分游戏变化，日期随采集推进"""
+    title_ids = [f'0100{i:012X}' for i in range(titles)]
+    start_time = datetime(2024, 1, 1)
+    for i in range(snapshots):
+        payload = synthetic_payload(title_ids, i, days=7, titles_per_day=titles_per_day)
+        payload['recentPlayHistories'] = [
+            dict(day, playedDate=(start_time + timedelta(days=i // 4 - offset)).date().isoformat())
+            for offset, day in enumerate(payload['recentPlayHistories'])
+        ]
+        raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+        history_archive.store(raw, captured_at=start_time + timedelta(hours=6 * i))
+
+
+def bench_rebuild(args):
+    """对比逐个快照 save_to_database 与并行解析、批量写入的 rebuild"""
+    with scratch_directory() as tmp_dir:
+        archive_synthetic_snapshots(args.snapshots, args.titles, args.titles_per_day)
+
+        results = []
+        for name, run in (
+            ('replay（逐个快照）', lambda db_file: history_archive.replay(db_file)),
+            ('rebuild（并行批量）', lambda db_file: history_archive.rebuild(db_file, workers=args.workers)),
+        ):
+            db_file = os.path.join(tmp_dir, f'{len(results)}.db')
+            start = time.perf_counter()
+            with redirect_stdout(io.StringIO()):
+                replayed, _ = run(db_file)
+            elapsed = time.perf_counter() - start
+            results.append(elapsed)
+            print(f"{name:<16}{replayed:>6} 个快照  {elapsed:>7.2f}s  {replayed / elapsed:>8.1f} 快照/秒")
+    print(f"rebuild 加速 {results[0] / results[1]:.1f}x")
+
+
+def legacy_save_to_database(data, account_id=database.DEFAULT_ACCOUNT):
+    """旧版入库：逐个游戏、逐条每日记录执行语句，最后对整个 games 表匹配中文名称"""
+    conn = database.get_connection()
+    cursor = conn.cursor()
+    collected_at = datetime.now().isoformat()
+    for game in data.get('playHistories', []):
+        cursor.execute('''
+        INSERT OR REPLACE INTO games (title_id, title_name, image_url, device_type)
+        VALUES (?, ?, ?, ?)
+        ''', (game.get('titleId'), game.get('titleName'), game.get('imageUrl'), game.get('deviceType')))
+        snapshot = (account_id, game.get('titleId'), game.get('firstPlayedAt'), game.get('lastPlayedAt'),
+                    game.get('totalPlayedDays'), game.get('totalPlayedMinutes'), collected_at)
+        cursor.execute('''
+        INSERT INTO game_history (
+            account_id, title_id, first_played_at, last_played_at,
+            total_played_days, total_played_minutes, collected_at
+        )
+        SELECT ?, ?, ?, ?, ?, ?, ?
+        WHERE NOT EXISTS (
+            SELECT 1 FROM game_latest
+            WHERE account_id = ? AND title_id = ?
+              AND total_played_days IS ? AND total_played_minutes IS ?
+        )
+        ''', snapshot + (account_id, game.get('titleId'), game.get('totalPlayedDays'), game.get('totalPlayedMinutes')))
+        cursor.execute('''
+        INSERT INTO game_latest (
+            account_id, title_id, first_played_at, last_played_at,
+            total_played_days, total_played_minutes, collected_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (account_id, title_id) DO UPDATE SET
+            first_played_at = excluded.first_played_at,
+            last_played_at = excluded.last_played_at,
+            total_played_days = excluded.total_played_days,
+            total_played_minutes = excluded.total_played_minutes,
+            collected_at = excluded.collected_at
+        ''', snapshot)
+    for day_record in data.get('recentPlayHistories', []):
+        played_date = day_record.get('playedDate')
+        for game in day_record.get('dailyPlayHistories', []):
+            if game.get('totalPlayedMinutes', 0) <= 0:
+                continue
+            title_id = game.get('titleId')
+            played_minutes = game.get('totalPlayedMinutes')
+            row = cursor.execute('''
+            SELECT played_minutes FROM daily_play
+            WHERE account_id = ? AND title_id = ? AND played_date = ?
+            ''', (account_id, title_id, played_date)).fetchone()
+            delta = played_minutes - (row[0] if row else 0)
+            if row and delta == 0:
+                continue
+            cursor.execute('''
+            INSERT INTO daily_play (account_id, title_id, played_date, played_minutes, collected_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (account_id, title_id, played_date) DO UPDATE SET
+                played_minutes = excluded.played_minutes,
+                collected_at = excluded.collected_at
+            ''', (account_id, title_id, played_date, played_minutes, collected_at))
+            cursor.executemany('''
+            INSERT INTO play_rollups (account_id, period, title_id, period_key, total_minutes)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (account_id, period, title_id, period_key) DO UPDATE SET
+                total_minutes = total_minutes + excluded.total_minutes
+            ''', [(account_id, period, rollup_title_id, period_key, delta)
+                  for period, period_key in database.rollup_periods(played_date)
+                  for rollup_title_id in (title_id, database.ROLLUP_ALL_TITLES)])
+    database.bump_data_version(conn)
+    conn.commit()
+    cursor.execute('''
+    UPDATE games
+    SET chinese_name = (SELECT t.chinese_name FROM game_translations t WHERE t.title_id = games.title_id)
+    WHERE EXISTS (SELECT 1 FROM game_translations t WHERE t.title_id = games.title_id)
+    ''')
+    database.bump_data_version(conn)
+    conn.commit()
+    conn.close()
+    return True
+
+
+def bench_ingest(args):
+    """对比逐行入库与暂存表批量合并在不同游戏数量下的耗时"""
+    implementations = [
+        ('旧版 逐行', legacy_save_to_database),
+        ('暂存表合并', lambda data: get_switch_data.save_to_database(data)),
+    ]
+    print(f"{'游戏数':>8}  {'实现':<12}{'首次入库(s)':>12}{'未变化(s)':>12}{'1%变化(s)':>12}")
+    with scratch_directory() as tmp_dir:
+        for size in args.sizes:
+            title_ids = [f'0100{i:012X}' for i in range(size)]
+            first = synthetic_payload(title_ids, 0, days=7, titles_per_day=max(20, size // 10))
+            changed = json.loads(json.dumps(first))
+            changed_count = max(1, size // 100)
+            for game in changed['playHistories'][:changed_count]:
+                game['totalPlayedMinutes'] += 30
+            for game in changed['recentPlayHistories'][0]['dailyPlayHistories'][:changed_count]:
+                game['totalPlayedMinutes'] += 30
+
+            for number, (label, save) in enumerate(implementations):
+                database.close_all_connections()
+                database.DB_FILE = os.path.join(tmp_dir, f'ingest_{size}_{number}.db')
+                get_switch_data.init_database()
+                timings = []
+                for payload in (first, first, changed):
+                    start = time.perf_counter()
+                    with redirect_stdout(io.StringIO()):
+                        if not save(payload):
+                            raise RuntimeError(f"{label} 入库失败")
+                    timings.append(time.perf_counter() - start)
+                print(f"{size:>8}  {label:<12}" + ''.join(f'{t:>12.3f}' for t in timings))
+    return 0
+
+
+def retained_memory(func):
+    """返回 (结果, 结果占用的内存字节数, 耗时)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, elapsed
+
+
+def bench_parse(args):
+    """对比直接保留 json.loads 的嵌套字典与解析为类型化记录的耗时和内存占用"""
+    title_ids = [f'0100{i:012X}' for i in range(args.titles)]
+    payload = synthetic_payload(title_ids, 0, days=7, titles_per_day=max(20, args.titles // 10))
+    # 注入几类错误：缺少名称、时长为字符串、日期格式错误
+    payload['playHistories'][0]['titleName'] = None
+    payload['playHistories'][1]['totalPlayedMinutes'] = '600'
+    payload['recentPlayHistories'].append({'playedDate': 'yesterday', 'dailyPlayHistories': []})
+    raw = json.dumps(payload).encode('utf-8')
+
+    decoder = 'orjson' if play_records.orjson is not None else 'json'
+    _, dict_memory, dict_elapsed = retained_memory(lambda: json.loads(raw))
+    records, record_memory, record_elapsed = retained_memory(lambda: play_records.parse_play_histories(raw))
+    print(f"{args.titles} 款游戏，{len(raw) / 1024:.0f} KiB 响应")
+    print(f"{'json.loads 嵌套字典':<24}{dict_elapsed * 1000:>8.1f} ms  {dict_memory / 1024:>8.0f} KiB")
+    print(f"{'类型化记录（' + decoder + '）':<24}{record_elapsed * 1000:>8.1f} ms  {record_memory / 1024:>8.0f} KiB")
+    print(f"保留 {len(records.games)} 款游戏、{len(records.daily)} 条每日记录，丢弃: {dict(records.errors)}")
+
+
+def bench_detail(args):
+    """单个游戏的时间序列：各粒度汇总、日期范围和降采样的点数、响应大小与耗时"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'detail.db')
+        build_synthetic_db(db_file, years=args.years, titles=args.titles, titles_per_day=args.titles_per_day)
+        conn = sqlite3.connect(db_file)
+        title_id, days = conn.execute(
+            'SELECT title_id, COUNT(*) FROM daily_play GROUP BY title_id ORDER BY COUNT(*) DESC LIMIT 1'
+        ).fetchone()
+        date_from, date_to = conn.execute(
+            'SELECT MIN(played_date), MAX(played_date) FROM daily_play WHERE title_id = ?', (title_id,)
+        ).fetchone()
+        conn.close()
+        # 取中间一段作为范围查询的区间
+        middle_from = (date.fromisoformat(date_from) + timedelta(days=100)).isoformat()
+        middle_to = (date.fromisoformat(date_to) - timedelta(days=100)).isoformat()
+
+        database.DB_FILE = db_file
+        database.close_all_connections()
+        client = server.app.test_client()
+
+        print(f"{args.years} 年合成数据，游戏 {title_id} 共 {days} 天有记录")
+        print(f"{'请求':<44}{'点数':>8}{'大小(KiB)':>12}{'耗时(ms)':>10}")
+        for query in ('', '?bucket=week', '?bucket=month', f'?points={args.points}',
+                      f'?from={middle_from}&to={middle_to}', f'?bucket=week&points={args.points}'):
+            elapsed, response = timed(lambda: client.get(f'/api/game/{title_id}/daily{query}'), repeat=1)
+            print(f"{query or '(全部)':<44}{len(response.get_json()['daily_data']):>8}"
+                  f"{len(response.data) / 1024:>12.1f}{elapsed * 1000:>10.1f}")
+        database.close_all_connections()
+
+
+def bench_calendar(args):
+    """日历数据：/api/calendar 与 /api/history 的传输大小和耗时对比"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'calendar.db')
+        build_synthetic_db(db_file, years=args.years, titles=args.titles, titles_per_day=args.titles_per_day)
+        year = date.today().year - 1
+
+        database.DB_FILE = db_file
+        database.close_all_connections()
+        game_names.name_cache.games()
+        client = server.app.test_client()
+
+        print(f"{args.years} 年合成数据，{args.titles_per_day} 款游戏/天，{year} 年的日历")
+        print(f"{'请求':<48}{'原始(KiB)':>12}{'gzip(KiB)':>12}{'耗时(ms)':>10}")
+        for url in ('/api/history', f'/api/history?from={year}-01-01&to={year}-12-31',
+                    f'/api/calendar?year={year}', f'/api/calendar?year={year}&format=uint16'):
+            plain_elapsed, plain = timed(lambda: client.get(url), repeat=1)
+            gzip_response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+            print(f"{url:<48}{len(plain.data) / 1024:>12.1f}{len(gzip_response.data) / 1024:>12.1f}"
+                  f"{plain_elapsed * 1000:>10.1f}")
+        database.close_all_connections()
+
+
+def bench_day(args):
+    """单日详情：/api/day 与 /api/history 的大小和首次、缓存后的耗时对比"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'day.db')
+        build_synthetic_db(db_file, years=args.years, titles=args.titles, titles_per_day=args.titles_per_day)
+        conn = sqlite3.connect(db_file)
+        played_date, title_count = conn.execute('''
+            SELECT played_date, COUNT(*) FROM daily_play
+            WHERE played_date = (SELECT MAX(played_date) FROM daily_play)
+        ''').fetchone()
+        conn.close()
+
+        database.DB_FILE = db_file
+        database.close_all_connections()
+        game_names.name_cache.games()
+        client = server.app.test_client()
+
+        print(f"{args.years} 年合成数据，{played_date} 共 {title_count} 款游戏")
+        print(f"{'请求':<48}{'大小(KiB)':>12}{'首次(ms)':>10}{'缓存(ms)':>10}")
+        for url in ('/api/history', f'/api/history?from={played_date}&to={played_date}', f'/api/day/{played_date}'):
+            api_cache.response_cache.clear()
+            first, response = timed(lambda: client.get(url), repeat=1)
+            cached, _ = timed(lambda: client.get(url), repeat=3)
+            print(f"{url:<48}{len(response.data) / 1024:>12.1f}{first * 1000:>10.1f}{cached * 1000:>10.1f}")
+        database.close_all_connections()
+
+
+def bench_dashboard(args):
+    """首屏数据：/api/dashboard 与原来的多个请求的请求数、传输大小和耗时对比"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        db_file = os.path.join(tmp_dir, 'dashboard.db')
+        build_synthetic_db(db_file, years=args.years, titles=args.titles, titles_per_day=args.titles_per_day)
+        database.DB_FILE = db_file
+        database.close_all_connections()
+        game_names.name_cache.games()
+        client = server.app.test_client()
+
+        # 改动前首屏发出的请求（/api/stats/period 和 /api/history 各有两处代码请求）
+        legacy_urls = ['/api/games', '/api/recent_activities', '/api/stats/period', '/api/stats/period',
+                       '/api/monthly_playtime', '/api/history', '/api/history']
+
+        def first_paint(urls):
+            api_cache.response_cache.clear()
+            start = time.perf_counter()
+            size = sum(len(client.get(url, headers={'Accept-Encoding': 'gzip'}).data) for url in urls)
+            return time.perf_counter() - start, size
+
+        print(f"{args.years} 年合成数据，{args.titles} 款游戏")
+        print(f"{'首屏':<24}{'请求数':>8}{'gzip(KiB)':>12}{'耗时(ms)':>10}")
+        for label, urls in (('改动前', legacy_urls), ('/api/dashboard', ['/api/dashboard'])):
+            elapsed, size = first_paint(urls)
+            print(f"{label:<24}{len(urls):>8}{size / 1024:>12.1f}{elapsed * 1000:>10.1f}")
+        cached, _ = timed(lambda: client.get('/api/dashboard'), repeat=3)
+        print(f"{'/api/dashboard（缓存）':<24}{1:>8}{'':>12}{cached * 1000:>10.1f}")
+        database.close_all_connections()
+
+
+KATAKANA = 'アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホマミムメモヤユヨラリルレロワン'
+HANZI = '星海龙剑光影风火山林岛城梦幻传说勇者之国天空大陆战记冒险'
+SERIES_VARIANTS = [
+    ('', ''), ('2', '2'), (' デラックス', ' 豪华版'), (' HD リマスター', ' HD 复刻版'),
+    (' for Nintendo Switch', ''), ('3 ～新たなる冒険～', '3 新的冒险'),
+]
+
+
+def synthetic_series(count, seed=7):
+    """生成 count 款游戏，每个系列由同一基础名称加不同后缀组成；返回 [(title_id, 日文名, 中文名, 系列编号)]"""
+    rng = random.Random(seed)
+    games = []
+    series = 0
+    while len(games) < count:
+        jp_base = ''.join(rng.choice(KATAKANA) for _ in range(rng.randint(4, 8)))
+        cn_base = ''.join(rng.choice(HANZI) for _ in range(rng.randint(2, 5)))
+        for jp_suffix, cn_suffix in rng.sample(SERIES_VARIANTS, rng.randint(2, 4)):
+            games.append((f'0100{len(games):012X}', jp_base + jp_suffix, cn_base + cn_suffix, series))
+        series += 1
+    return games[:count]
+
+
+def legacy_import_translations(translations, now):
+    """改动前的导入方式：逐行 INSERT OR REPLACE，再逐行 UPDATE games"""
+    conn = database.get_connection()
+    cursor = conn.cursor()
+    for title_id, jp_name, cn_name, en_name in translations:
+        cursor.execute('''
+        INSERT OR REPLACE INTO game_translations
+        (title_id, japanese_name, chinese_name, english_name, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ''', (title_id, jp_name, cn_name, en_name, now))
+    for title_id, _, cn_name, _ in translations:
+        if cn_name:
+            cursor.execute('UPDATE games SET chinese_name = ? WHERE title_id = ?', (cn_name, title_id))
+    database.bump_data_version(conn)
+    database.bump_names_version(conn)
+    conn.commit()
+    conn.close()
+
+
+def bench_translations(args):
+    """翻译导入、导出追加和名称建议的耗时，以及首选建议命中同一系列的比例"""
+    games = synthetic_series(args.count)
+    series_of = {title_id: series for title_id, _, _, series in games}
+    # 每个系列至少保留一款已翻译的游戏，其余按比例留作未翻译
+    rng = random.Random(11)
+    seen_series = set()
+    translated, untranslated = [], []
+    for game in games:
+        if game[3] not in seen_series or rng.random() >= args.untranslated:
+            translated.append(game)
+            seen_series.add(game[3])
+        else:
+            untranslated.append(game)
+
+    with scratch_directory() as tmp_dir, redirect_stdout(io.StringIO()):
+        import game_translation
+
+        def fresh_db(name):
+            database.close_all_connections()
+            database.DB_FILE = os.path.join(tmp_dir, name)
+            get_switch_data.init_database()
+            game_translation.init_translation_table()
+            conn = database.get_connection()
+            conn.executemany('INSERT INTO games (title_id, title_name, device_type) VALUES (?, ?, ?)',
+                             [(title_id, jp_name, 'HAC') for title_id, jp_name, _, _ in games])
+            conn.commit()
+            conn.close()
+
+        with open(game_translation.TRANSLATION_CSV, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(game_translation.CSV_HEADER)
+            writer.writerows([title_id, jp_name, cn_name, ''] for title_id, jp_name, cn_name, _ in translated)
+
+        fresh_db('legacy.db')
+        legacy_elapsed, _ = timed(lambda: legacy_import_translations(game_translation.read_translation_csv(),
+                                                                     datetime.now().isoformat()), repeat=1)
+
+        fresh_db('translations.db')
+        import_elapsed, _ = timed(game_translation.import_translations_from_csv, repeat=1)
+        reimport_elapsed, _ = timed(game_translation.import_translations_from_csv, repeat=1)
+
+        first_export, _ = timed(game_translation.export_untranslated_games, repeat=1)
+        second_export, _ = timed(game_translation.export_untranslated_games, repeat=1)
+
+        suggest_elapsed, _ = timed(game_translation.suggest_translations, repeat=1)
+        with open(game_translation.SUGGESTIONS_CSV, newline='', encoding='utf-8') as f:
+            top_match = {}
+            for row in csv.DictReader(f):
+                top_match.setdefault(row['title_id'], row['matched_title_id'])
+
+    hits = sum(series_of[title_id] == series_of[matched] for title_id, matched in top_match.items())
+    print(f"{len(games)} 款游戏，已翻译 {len(translated)}，未翻译 {len(untranslated)}")
+    print(f"{'旧版 逐行导入':<20}{legacy_elapsed * 1000:>10.1f} ms")
+    print(f"{'临时表合并导入':<20}{import_elapsed * 1000:>10.1f} ms")
+    print(f"{'重复导入（无变化）':<20}{reimport_elapsed * 1000:>10.1f} ms")
+    print(f"{'导出（追加）':<20}{first_export * 1000:>10.1f} ms")
+    print(f"{'再次导出':<20}{second_export * 1000:>10.1f} ms")
+    print(f"{'生成名称建议':<20}{suggest_elapsed * 1000:>10.1f} ms"
+          f"  ({len(untranslated) / suggest_elapsed:.0f} 款/秒)")
+    print(f"有建议 {len(top_match)}/{len(untranslated)}，首选建议来自同一系列 {hits}/{len(top_match)}")
+
+
+def bench_search(args):
+    """/api/games 的搜索和排序：服务器端筛选、分页与取回完整列表后在客户端筛选的耗时和传输大小对比"""
+    with scratch_directory() as tmp_dir, redirect_stdout(io.StringIO()):
+        import game_translation
+
+        db_file = os.path.join(tmp_dir, 'search.db')
+        build_synthetic_db(db_file, years=1, titles=args.titles, titles_per_day=args.titles_per_day)
+        conn = sqlite3.connect(db_file)
+        # 合成数据库没有首次/最近游玩时间和其他设备类型，按每日记录补上
+        conn.execute('''
+        UPDATE game_latest SET
+            first_played_at = (SELECT MIN(played_date) FROM daily_play d WHERE d.title_id = game_latest.title_id),
+            last_played_at = (SELECT MAX(played_date) FROM daily_play d WHERE d.title_id = game_latest.title_id)
+        ''')
+        conn.execute("UPDATE games SET device_type = 'BEE' WHERE rowid % 4 = 0")
+        conn.commit()
+        conn.close()
+        database.DB_FILE = db_file
+        database.close_all_connections()
+
+        # 每 10 款游戏有一款带中文翻译，通过 CSV 导入
+        game_translation.init_translation_table()
+        with open(game_translation.TRANSLATION_CSV, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(game_translation.CSV_HEADER)
+            writer.writerows([f'0100{i:012X}', f'Game {i}', f'塞尔达传说 {i}', ''] for i in range(0, args.titles, 10))
+        game_translation.import_translations_from_csv()
+        client = server.app.test_client()
+
+        # 改动前的做法：取回完整列表，在客户端筛选、排序后显示前 20 款
+        def client_side():
+            api_cache.response_cache.clear()
+            games = client.get('/api/games').get_json()
+            matched = [game for game in games if 'game 1' in game['name'].casefold()]
+            return sorted(matched, key=lambda game: game['last_played_at'] or '', reverse=True)[:20]
+
+        def server_side(url):
+            def request():
+                api_cache.response_cache.clear()
+                return client.get(url).get_json()
+            return request
+
+        search_url = '/api/games?q=Game%201&sort=last_played&limit=20'
+        full_size = len(client.get('/api/games', headers={'Accept-Encoding': 'gzip'}).data)
+        search_size = len(client.get(search_url, headers={'Accept-Encoding': 'gzip'}).data)
+        timings = [
+            ('完整列表 + 客户端筛选', timed(client_side, repeat=5)[0], full_size),
+            ('q=Game 1（FTS5）', timed(server_side(search_url), repeat=5)[0], search_size),
+            ('q=Ga（名称缓存）', timed(server_side('/api/games?q=Ga&limit=20'), repeat=5)[0], None),
+            ('sort=name', timed(server_side('/api/games?sort=name&limit=20'), repeat=5)[0], None),
+            ('sort=days&offset=100', timed(server_side('/api/games?sort=days&offset=100&limit=20'), repeat=5)[0], None),
+        ]
+        database.close_all_connections()
+
+    print(f"{args.titles} 款游戏")
+    print(f"{'请求':<24}{'gzip(KiB)':>12}{'耗时(ms)':>10}")
+    for label, elapsed, size in timings:
+        size_text = f'{size / 1024:.1f}' if size is not None else ''
+        print(f"{label:<24}{size_text:>12}{elapsed * 1000:>10.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Switch Tracker 性能基准测试')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    history_parser = subparsers.add_parser('history', help='对比 /api/history 新旧实现')
+    history_parser.add_argument('--years', type=int, default=5)
+    history_parser.add_argument('--titles', type=int, default=500)
+    history_parser.add_argument('--titles-per-day', type=int, default=20)
+    history_parser.add_argument('--repeat', type=int, default=3)
+    history_parser.set_defaults(func=bench_history)
+
+    concurrency_parser = subparsers.add_parser('concurrency', help='读写并发下的 /api/games 表现')
+    concurrency_parser.add_argument('--readers', type=int, default=8)
+    concurrency_parser.add_argument('--duration', type=float, default=10)
+    concurrency_parser.add_argument('--titles', type=int, default=500)
+    concurrency_parser.set_defaults(func=bench_concurrency)
+
+    payload_parser = subparsers.add_parser('payload', help='/api/history 的传输大小和首字节时间')
+    payload_parser.add_argument('--years', type=int, default=5)
+    payload_parser.add_argument('--titles', type=int, default=500)
+    payload_parser.add_argument('--titles-per-day', type=int, default=20)
+    payload_parser.add_argument('--repeat', type=int, default=3)
+    payload_parser.set_defaults(func=bench_payload)
+
+    load_parser = subparsers.add_parser('load', help='对每个 /api 路由进行并发压测')
+    load_parser.add_argument('--url', help='压测已运行的服务器，如 http://127.0.0.1:8000；默认在合成数据上启动')
+    load_parser.add_argument('--concurrency', type=int, default=16)
+    load_parser.add_argument('--requests', type=int, default=50, help='每个线程的请求数')
+    load_parser.add_argument('--years', type=int, default=2)
+    load_parser.add_argument('--titles', type=int, default=500)
+    load_parser.add_argument('--titles-per-day', type=int, default=20)
+    load_parser.set_defaults(func=bench_load)
+
+    accounts_parser = subparsers.add_parser('accounts', help='多账号并发收集（本地模拟接口）')
+    accounts_parser.add_argument('--accounts', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    accounts_parser.add_argument('--workers', type=int, default=4)
+    accounts_parser.add_argument('--latency', type=float, default=0.3, help='模拟接口的响应延迟（秒）')
+    accounts_parser.add_argument('--rate', type=float, default=20, help='每秒最多请求次数')
+    accounts_parser.set_defaults(func=bench_accounts)
+
+    archive_parser = subparsers.add_parser('archive', help='归档的磁盘占用与 replay 速度')
+    archive_parser.add_argument('--snapshots', type=int, default=500)
+    archive_parser.add_argument('--titles', type=int, default=200)
+    archive_parser.add_argument('--changes-every', type=int, default=4, help='每多少次采集数据变化一次')
+    archive_parser.set_defaults(func=bench_archive)
+
+    rebuild_parser = subparsers.add_parser('rebuild', help='逐个快照导入与并行批量重建的速度对比')
+    rebuild_parser.add_argument('--snapshots', type=int, default=1000)
+    rebuild_parser.add_argument('--titles', type=int, default=200)
+    rebuild_parser.add_argument('--titles-per-day', type=int, default=20)
+    rebuild_parser.add_argument('--workers', type=int)
+    rebuild_parser.set_defaults(func=bench_rebuild)
+
+    ingest_parser = subparsers.add_parser('ingest', help='逐行入库与暂存表批量合并的耗时对比')
+    ingest_parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    ingest_parser.set_defaults(func=bench_ingest)
+
+    parse_parser = subparsers.add_parser('parse', help='类型化记录与嵌套字典的耗时和内存对比')
+    parse_parser.add_argument('--titles', type=int, default=10000)
+    parse_parser.set_defaults(func=bench_parse)
+
+    detail_parser = subparsers.add_parser('detail', help='单个游戏时间序列的汇总粒度、范围和降采样')
+    detail_parser.add_argument('--years', type=int, default=5)
+    detail_parser.add_argument('--titles', type=int, default=50)
+    detail_parser.add_argument('--titles-per-day', type=int, default=20)
+    detail_parser.add_argument('--points', type=int, default=200)
+    detail_parser.set_defaults(func=bench_detail)
+
+    calendar_parser = subparsers.add_parser('calendar', help='日历数据与 /api/history 的传输大小对比')
+    calendar_parser.add_argument('--years', type=int, default=5)
+    calendar_parser.add_argument('--titles', type=int, default=500)
+    calendar_parser.add_argument('--titles-per-day', type=int, default=20)
+    calendar_parser.set_defaults(func=bench_calendar)
+
+    day_parser = subparsers.add_parser('day', help='单日详情与 /api/history 的大小和耗时对比')
+    day_parser.add_argument('--years', type=int, default=5)
+    day_parser.add_argument('--titles', type=int, default=500)
+    day_parser.add_argument('--titles-per-day', type=int, default=20)
+    day_parser.set_defaults(func=bench_day)
+
+    dashboard_parser = subparsers.add_parser('dashboard', help='首屏数据接口与原来多个请求的对比')
+    dashboard_parser.add_argument('--years', type=int, default=2)
+    dashboard_parser.add_argument('--titles', type=int, default=500)
+    dashboard_parser.add_argument('--titles-per-day', type=int, default=20)
+    dashboard_parser.set_defaults(func=bench_dashboard)
+
+    search_parser = subparsers.add_parser('search', help='/api/games 的搜索、筛选、排序和分页')
+    search_parser.add_argument('--titles', type=int, default=2000)
+    search_parser.add_argument('--titles-per-day', type=int, default=20)
+    search_parser.set_defaults(func=bench_search)
+
+    translations_parser = subparsers.add_parser('translations', help='翻译导入、导出追加与名称建议')
+    translations_parser.add_argument('--count', type=int, default=5000, help='游戏数量')
+    translations_parser.add_argument('--untranslated', type=float, default=0.2, help='未翻译游戏的比例')
+    translations_parser.set_defaults(func=bench_translations)
+
+    args = parser.parse_args()
+    return args.func(args) or 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
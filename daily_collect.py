@@ -4,15 +4,29 @@
 """
 Nintendo Switch 数据收集脚本
 用于定时任务自动收集游戏数据
+
+用法:
+    python daily_collect.py                      # 收集一次（适合 cron）
+    python daily_collect.py daemon [间隔秒数] [抖动秒数]
+        常驻进程，复用各账号的 nsession 及其 HTTP 连接，按间隔（加随机抖动）定时收集
+
+所有已登录的账号（python get_switch_data.py login <账号名>）都会并发收集
 """
 
 import os
 import sys
+import json
 import time
+import random
+import signal
 import logging
+import threading
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import subprocess
 
+import database
+
 # 设置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -24,60 +38,216 @@ logging.basicConfig(
 )
 logger = logging.getLogger("daily_collect")
 
+SERVER_PID_FILE = "server.pid"
+# 每次收集的指标，一行一个 JSON
+METRICS_FILE = "collect_metrics.jsonl"
+# 常驻模式默认每 15 分钟收集一次，实际间隔在 ±60 秒内随机抖动
+DAEMON_INTERVAL = 900
+DAEMON_JITTER = 60
+# 同时收集的账号数上限
+MAX_CONCURRENT_ACCOUNTS = 4
+
+def is_process_running(pid):
+    """检查进程是否存在"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def ensure_server_running():
+    """如果 Web 服务器没有运行则启动它，正在运行的服务器不会被重启"""
+    if os.path.exists(SERVER_PID_FILE):
+        with open(SERVER_PID_FILE, "r") as f:
+            pid = int(f.read().strip())
+        if is_process_running(pid):
+            logger.info(f"Web服务器正在运行 (PID: {pid})，新数据将在下一次请求时生效")
+            return
+        logger.info("旧的服务器进程已不存在")
+    
+    # serve.py 启动后会自行写入 server.pid
+    server_process = subprocess.Popen(
+        [sys.executable, "serve.py"],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL
+    )
+    logger.info(f"Web服务器已启动 (PID: {server_process.pid})")
+
+def log_data_version():
+    """记录当前数据版本号，服务器据此判断缓存是否失效"""
+    conn = database.get_connection()
+    try:
+        logger.info(f"当前数据版本: {database.get_data_version(conn)}")
+    finally:
+        conn.close()
+
+_metrics_lock = threading.Lock()
+
+def write_metrics(metrics):
+    """追加一条收集指标，多个账号并发收集时串行写入"""
+    with _metrics_lock:
+        with open(METRICS_FILE, "a", encoding="utf-8") as f:
+            f.write(json.dumps(metrics, ensure_ascii=False) + "\n")
+
+def collect_once(ns):
+    """使用已有的 nsession 收集一次数据，返回本次的指标"""
+    stats = {}
+    started_at = datetime.now().isoformat(timespec='seconds')
+    start = time.perf_counter()
+    ok = False
+    error = None
+    try:
+        # 访问令牌到期时才刷新，不再每次都额外请求一次接口来验证
+        if not ns.ensure_access_token():
+            raise RuntimeError("刷新访问令牌失败")
+        ok = ns.get_history(stats) is not None
+        if not ok:
+            error = stats.get('error') or f"获取游戏历史记录失败，状态码: {stats.get('status')}"
+    except Exception as e:
+        error = str(e)
+    
+    metrics = {
+        'account_id': ns.account_id,
+        'started_at': started_at,
+        'duration': round(time.perf_counter() - start, 3),
+        'ok': ok,
+        'status': stats.get('status'),
+        'unchanged': stats.get('unchanged', False),
+        'bytes': stats.get('bytes', 0),
+        'retries': stats.get('retries', 0),
+        'games': stats.get('games', 0),
+        'history_rows': stats.get('history_rows', 0),
+        'daily_rows': stats.get('daily_rows', 0),
+        'invalid': stats.get('invalid', 0),
+        'error': error,
+    }
+    write_metrics(metrics)
+    account = ns.account_id or '默认'
+    if ok and metrics['unchanged']:
+        logger.info(f"账号 {account} 数据没有变化: 耗时 {metrics['duration']} 秒, {metrics['bytes']} 字节")
+    elif ok:
+        logger.info(f"账号 {account} 收集完成: 耗时 {metrics['duration']} 秒, {metrics['bytes']} 字节, "
+                    f"写入历史 {metrics['history_rows']} 行, 每日记录 {metrics['daily_rows']} 行")
+    else:
+        logger.error(f"账号 {account} 收集失败: {error}")
+    return metrics
+
+def collect_accounts(sessions, max_workers=MAX_CONCURRENT_ACCOUNTS):
+    """并发收集多个账号，返回 {account_id: 指标}
+    
+    每个账号在线程池中独立运行，某个账号变慢或令牌失效不会阻塞其他账号；
+    对同一主机的请求频率由 get_switch_data.host_rate_limiter 统一限制
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(collect_once, ns): account_id for account_id, ns in sessions.items()}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+    return results
+
+def load_sessions():
+    """为每个已登录的账号创建 nsession，返回 {account_id: nsession}"""
+    import get_switch_data
+    
+    sessions = {}
+    for account_id in get_switch_data.list_accounts():
+        ns = get_switch_data.nsession(account_id=account_id)
+        if getattr(ns, 'session_token', None):
+            sessions[account_id] = ns
+        else:
+            logger.warning(f"账号 {account_id or '默认'} 没有会话令牌，已跳过")
+    return sessions
+
+def prepare_collection():
+    """初始化数据库并加载所有账号；常驻和定时模式都无法交互式登录"""
+    import get_switch_data
+    
+    if not get_switch_data.init_database():
+        logger.error("初始化数据库失败")
+        return None
+    sessions = load_sessions()
+    if not sessions:
+        logger.error("未找到会话令牌，请先运行 python get_switch_data.py 完成登录")
+        return None
+    return sessions
+
+def run_daemon(interval=DAEMON_INTERVAL, jitter=DAEMON_JITTER):
+    """常驻进程：只初始化一次数据库和各账号的 nsession，之后按间隔定时收集"""
+    sessions = prepare_collection()
+    if sessions is None:
+        return 1
+    
+    stop = threading.Event()
+    
+    def handle_signal(signum, frame):
+        logger.info(f"收到信号 {signum}，本次收集结束后退出")
+        stop.set()
+    
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+    
+    # 访问令牌在后台提前刷新，收集时不必等待刷新请求
+    for ns in sessions.values():
+        ns.start_background_refresh()
+    
+    logger.info(f"常驻收集已启动，{len(sessions)} 个账号，间隔 {interval} 秒，抖动 ±{jitter} 秒")
+    ensure_server_running()
+    while not stop.is_set():
+        results = collect_accounts(sessions)
+        if any(metrics['ok'] for metrics in results.values()):
+            ensure_server_running()
+        delay = max(0, interval + random.uniform(-jitter, jitter))
+        stop.wait(delay)
+    
+    for ns in sessions.values():
+        ns.stop_background_refresh()
+    logger.info("常驻收集已退出")
+    return 0
+
 def main():
     """主函数，运行数据收集过程"""
+    # 获取脚本所在目录
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(script_dir)
+    
+    if len(sys.argv) > 1:
+        command = sys.argv[1].lower()
+        if command == "daemon":
+            try:
+                interval = float(sys.argv[2]) if len(sys.argv) > 2 else DAEMON_INTERVAL
+                jitter = float(sys.argv[3]) if len(sys.argv) > 3 else DAEMON_JITTER
+                valid = interval > 0 and jitter >= 0 and len(sys.argv) <= 4
+            except ValueError:
+                valid = False
+            if not valid:
+                print("用法: python daily_collect.py daemon [间隔秒数] [抖动秒数]，间隔必须为正数，抖动不能为负数")
+                return 1
+            return run_daemon(interval, jitter)
+        print("未知命令。可用命令: daemon")
+        return 1
+    
     try:
         logger.info("开始执行每日数据收集")
         
-        # 获取脚本所在目录
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        os.chdir(script_dir)
-        
-        # 运行数据收集脚本
-        logger.info("运行 get_switch_data.py")
-        result = subprocess.run([sys.executable, "get_switch_data.py"], 
-                               capture_output=True, 
-                               text=True)
+        sessions = prepare_collection()
+        if sessions is None:
+            return 1
         
-        # 检查脚本运行结果
-        if result.returncode == 0:
+        results = collect_accounts(sessions)
+        if any(metrics['ok'] for metrics in results.values()):
             logger.info("数据收集完成")
-            logger.debug(f"输出: {result.stdout}")
+            log_data_version()
             
-            # 可选：启动或重启Web服务器
-            # 如果你已经设置了系统服务来运行服务器，这步可以省略
+            # 服务器每次请求都会检查数据库中的数据版本号，入库后缓存自动失效，
+            # 因此不需要重启服务器；只在服务器没有运行时启动它
             try:
-                # 检查服务器是否已在运行
-                server_pid_file = "server.pid"
-                if os.path.exists(server_pid_file):
-                    with open(server_pid_file, "r") as f:
-                        pid = int(f.read().strip())
-                    
-                    # 尝试终止现有进程
-                    try:
-                        os.kill(pid, 15)  # SIGTERM
-                        logger.info(f"已终止旧的服务器进程 (PID: {pid})")
-                        time.sleep(2)  # 给进程一些时间来关闭
-                    except ProcessLookupError:
-                        logger.info("旧的服务器进程已不存在")
-                
-                # 启动新的服务器进程
-                server_process = subprocess.Popen(
-                    [sys.executable, "server.py"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
-                )
-                
-                # 保存新的PID
-                with open(server_pid_file, "w") as f:
-                    f.write(str(server_process.pid))
-                
-                logger.info(f"Web服务器已启动 (PID: {server_process.pid})")
+                ensure_server_running()
             except Exception as e:
                 logger.error(f"启动Web服务器时出错: {str(e)}")
         else:
             logger.error("数据收集失败")
-            logger.error(f"错误: {result.stderr}")
         
         logger.info("每日数据收集任务完成")
     except Exception as e:
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Switch Tracker 数据库连接模块
+server.py、get_switch_data.py 和 game_translation.py 共用的 SQLite 连接层
+
+- 连接池：conn.close() 会把连接归还到池中，下次直接复用，
+  连接上的预编译语句缓存（cached_statements）也随之保留
+- WAL 日志模式：收集数据写入时，Web 服务器的读取不会被阻塞
+- busy_timeout：写锁被占用时等待而不是立即报 "database is locked"
+"""
+
+import queue
+import sqlite3
+import threading
+from datetime import datetime
+
+# 数据库配置
+DB_FILE = 'switch_tracker.db'
+
+# 等待写锁的最长时间（秒）
+BUSY_TIMEOUT = 10.0
+# 每个数据库文件最多保留的空闲连接数
+POOL_SIZE = 8
+# 每个连接缓存的预编译语句数量
+CACHED_STATEMENTS = 256
+
+# 每个新连接都会执行的 PRAGMA
+CONNECTION_PRAGMAS = (
+    'PRAGMA journal_mode = WAL',
+    # WAL 模式下 NORMAL 已能保证数据库不会损坏，只在断电时可能丢失最后一次提交
+    'PRAGMA synchronous = NORMAL',
+    # 负数表示 KiB，即 32 MiB 页缓存
+    'PRAGMA cache_size = -32768',
+    'PRAGMA mmap_size = 268435456',
+    'PRAGMA temp_store = MEMORY',
+    f'PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}',
+)
+
+# play_rollups 中表示所有游戏合计的 title_id
+ROLLUP_ALL_TITLES = ''
+# 单账号时代的数据（以及 config/tokens.json 对应的账号）使用的 account_id
+DEFAULT_ACCOUNT = ''
+
+
+class PooledConnection(sqlite3.Connection):
+    """close() 时归还连接池而不是真正关闭的连接"""
+
+    pool = None
+
+    def close(self):
+        if self.pool is None:
+            super().close()
+        else:
+            self.pool.release(self)
+
+
+class ConnectionPool:
+    """单个数据库文件的连接池，线程安全"""
+
+    def __init__(self, db_file, size=None):
+        self.db_file = db_file
+        self.size = POOL_SIZE if size is None else size
+        self._idle = queue.LifoQueue()
+
+    def _create(self):
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=BUSY_TIMEOUT,
+            factory=PooledConnection,
+            cached_statements=CACHED_STATEMENTS,
+            check_same_thread=False
+        )
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        conn.row_factory = sqlite3.Row
+        conn.pool = self
+        return conn
+
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._create()
+
+    def release(self, conn):
+        # 丢弃未提交的修改，保证下一个使用者拿到干净的连接
+        if conn.in_transaction:
+            conn.rollback()
+        if self._idle.qsize() < self.size:
+            self._idle.put(conn)
+        else:
+            sqlite3.Connection.close(conn)
+
+    def close_all(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            sqlite3.Connection.close(conn)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_connection(db_file=None):
+    """从连接池获取一个数据库连接，用完后调用 conn.close() 归还"""
+    db_file = db_file or DB_FILE
+    pool = _pools.get(db_file)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.setdefault(db_file, ConnectionPool(db_file))
+    return pool.acquire()
+
+
+def close_all_connections():
+    """关闭所有连接池中的空闲连接"""
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.close_all()
+        _pools.clear()
+
+
+def create_meta_table(conn):
+    """创建保存数据版本号等元数据的表"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+    )
+    ''')
+
+
+def _get_meta_value(conn, key):
+    try:
+        row = conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+    except sqlite3.OperationalError:
+        # 尚未执行迁移的数据库没有 meta 表
+        return 0
+    return row[0] if row else 0
+
+
+def _bump_meta_value(conn, key):
+    conn.execute('''
+    INSERT INTO meta (key, value) VALUES (?, 1)
+    ON CONFLICT (key) DO UPDATE SET value = value + 1
+    ''', (key,))
+
+
+def get_data_version(conn):
+    """读取数据版本号，每次入库或翻译变更都会加一"""
+    return _get_meta_value(conn, 'data_version')
+
+
+def bump_data_version(conn):
+    """在当前事务中把数据版本号加一，提交后 API 缓存即失效"""
+    _bump_meta_value(conn, 'data_version')
+
+
+def get_names_version(conn):
+    """读取游戏名称版本号，游戏信息或翻译变化时加一"""
+    return _get_meta_value(conn, 'names_version')
+
+
+def bump_names_version(conn):
+    """在当前事务中把游戏名称版本号加一，提交后服务器重新加载名称缓存"""
+    _bump_meta_value(conn, 'names_version')
+
+
+def rollup_periods(played_date):
+    """返回某一天所属的 (汇总周期, 周期键)：自然日、ISO 周、自然月"""
+    day = datetime.strptime(played_date[:10], '%Y-%m-%d').date()
+    iso_year, iso_week, _ = day.isocalendar()
+    return [
+        ('day', day.isoformat()),
+        ('week', f'{iso_year}-W{iso_week:02d}'),
+        ('month', day.strftime('%Y-%m')),
+    ]
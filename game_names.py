@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Switch Tracker 游戏名称缓存
+服务器在内存中保存 title_id -> 游戏信息（各语言的名称、图片、设备类型），
+API 查询只返回 title_id 和数字，名称在输出时从缓存中附加。
+
+入库新增或修改游戏、导入或应用翻译时会把 meta 表中的 names_version 加一，
+服务器下一次查询时发现版本变化就重新加载，翻译无需重启服务器即可生效。
+
+游戏名称另有一个 FTS5 全文索引（game_search），供 /api/games?q= 搜索；
+入库新增或修改游戏、导入或应用翻译时在同一个事务中更新对应游戏的索引。
+"""
+
+import sqlite3
+import threading
+
+import database
+
+# 支持的显示语言；接口的 title_name 来自日本任天堂，本身就是日文名称
+LOCALES = ('zh', 'ja', 'en')
+DEFAULT_LOCALE = 'zh'
+
+
+class GameInfo:
+    """一款游戏的显示信息"""
+
+    __slots__ = ('title_name', 'image_url', 'device_type', 'names')
+
+    def __init__(self, title_name, image_url, device_type, names):
+        self.title_name = title_name
+        self.image_url = image_url
+        self.device_type = device_type
+        # 语言 -> 名称，只包含有翻译的语言
+        self.names = names
+
+    def name(self, locale=DEFAULT_LOCALE):
+        """指定语言的名称，没有翻译时使用原始名称"""
+        return self.names.get(locale) or self.title_name
+
+
+def load_games(conn):
+    """读取所有游戏及其翻译，返回 {title_id: GameInfo}"""
+    # 服务器不执行迁移，尚未迁移的数据库中翻译表没有 english_name 列
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(game_translations)')}
+    english_column = 't.english_name' if 'english_name' in columns else 'NULL'
+    games = {}
+    for title_id, title_name, image_url, device_type, games_chinese, chinese, japanese, english in conn.execute(f'''
+        SELECT g.title_id, g.title_name, g.image_url, g.device_type, g.chinese_name,
+               t.chinese_name, t.japanese_name, {english_column}
+        FROM games g
+        LEFT JOIN game_translations t ON t.title_id = g.title_id
+    '''):
+        # 翻译表优先，不再依赖 game_translation.py apply 写入 games.chinese_name
+        names = {'zh': chinese or games_chinese, 'ja': japanese, 'en': english}
+        games[title_id] = GameInfo(title_name, image_url, device_type,
+                                   {locale: name for locale, name in names.items() if name})
+    return games
+
+
+# 游戏名称的全文索引；trigram 分词把名称切成连续的 3 个字符，中文、日文名称也能按任意子串搜索
+SEARCH_TABLE = 'game_search'
+# trigram 索引只能匹配至少 3 个字符的搜索词
+SEARCH_MIN_LENGTH = 3
+
+_SEARCH_ROWS = '''
+    SELECT g.title_id, g.title_name, COALESCE(NULLIF(t.chinese_name, ''), g.chinese_name),
+           t.japanese_name, t.english_name
+    FROM games g
+    LEFT JOIN game_translations t ON t.title_id = g.title_id
+'''
+
+
+def create_search_index(conn):
+    """创建并填充游戏名称的全文索引；SQLite 不支持 FTS5 或 trigram 分词时返回 False"""
+    try:
+        conn.execute(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(
+            title_id UNINDEXED, title_name, chinese_name, japanese_name, english_name,
+            tokenize = 'trigram'
+        )
+        ''')
+    except sqlite3.OperationalError:
+        return False
+    refresh_search_index(conn)
+    return True
+
+
+def has_search_index(conn):
+    """数据库中是否已有游戏名称的全文索引"""
+    # 与 load_games 一样用 PRAGMA table_info 检查，服务器不执行迁移，旧数据库中没有索引
+    return conn.execute(f'PRAGMA table_info({SEARCH_TABLE})').fetchone() is not None
+
+
+def refresh_search_index(conn, title_ids=None):
+    """重新索引游戏名称；title_ids 为返回 title_id 的子查询，None 表示全部游戏。没有索引时不做任何事"""
+    if not has_search_index(conn):
+        return
+    if title_ids is None:
+        conn.execute(f'DELETE FROM {SEARCH_TABLE}')
+        conn.execute(f'INSERT INTO {SEARCH_TABLE} {_SEARCH_ROWS}')
+    else:
+        conn.execute(f'DELETE FROM {SEARCH_TABLE} WHERE title_id IN ({title_ids})')
+        conn.execute(f'INSERT INTO {SEARCH_TABLE} {_SEARCH_ROWS} WHERE g.title_id IN ({title_ids})')
+
+
+def search_phrase(query):
+    """把搜索词转换为 FTS5 的短语查询，搜索词中的双引号需要转义"""
+    return '"' + query.replace('"', '""') + '"'
+
+
+def matches_name(info, query):
+    """名称缓存中的游戏是否有任一名称包含 query（不区分大小写）；用于短搜索词和没有 FTS5 的环境"""
+    query = query.casefold()
+    return any(query in name.casefold() for name in (info.title_name, *info.names.values()))
+
+
+class GameNameCache:
+    """按 names_version 失效的游戏信息缓存，重新加载时整体替换字典，读取无需加锁"""
+
+    def __init__(self):
+        self._games = {}
+        self._version = None
+        self._lock = threading.Lock()
+
+    def games(self):
+        """返回当前的 {title_id: GameInfo}，名称版本变化时先重新加载"""
+        conn = database.get_connection()
+        try:
+            # 基准测试等场景会切换数据库文件，版本号需要连同文件一起比较
+            version = (database.DB_FILE, database.get_names_version(conn))
+            if version != self._version:
+                with self._lock:
+                    if version != self._version:
+                        self._games = load_games(conn)
+                        self._version = version
+        finally:
+            conn.close()
+        return self._games
+
+    def clear(self):
+        with self._lock:
+            self._games = {}
+            self._version = None
+
+
+name_cache = GameNameCache()
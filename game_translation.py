@@ -1,5 +1,4 @@
 import csv
-import sqlite3
 import os
 import logging
 
@@ -14,14 +13,21 @@ logging.basicConfig(
 )
 logger = logging.getLogger("game_translation")
 
-# 数据库配置
-DB_FILE = 'switch_tracker.db'
+from database import get_connection, create_meta_table, bump_data_version, bump_names_version
+from game_names import refresh_search_index
+from title_matcher import TitleMatcher, DEFAULT_MIN_SCORE
+
 TRANSLATION_CSV = 'game_translations.csv'
+SUGGESTIONS_CSV = 'game_translation_suggestions.csv'
+SUGGESTIONS_HEADER = ['title_id', 'japanese_name', 'suggested_chinese_name', 'score',
+                      'matched_title_id', 'matched_japanese_name']
+# english_name 列可选，旧的三列翻译文件仍然可以导入
+CSV_HEADER = ['title_id', 'japanese_name', 'chinese_name', 'english_name']
 
 def init_translation_table():
     """初始化游戏翻译表结构"""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = get_connection()
         cursor = conn.cursor()
         
         # 检查游戏翻译表是否存在
@@ -37,6 +43,10 @@ def init_translation_table():
                 # 添加缺少的updated_at列
                 cursor.execute('ALTER TABLE game_translations ADD COLUMN updated_at TEXT')
                 logger.info("已向game_translations表添加updated_at字段")
+            
+            if 'english_name' not in columns:
+                cursor.execute('ALTER TABLE game_translations ADD COLUMN english_name TEXT')
+                logger.info("已向game_translations表添加english_name字段")
         else:
             # 创建游戏翻译表
             cursor.execute('''
@@ -44,7 +54,8 @@ def init_translation_table():
                 title_id TEXT PRIMARY KEY,
                 japanese_name TEXT NOT NULL,
                 chinese_name TEXT NOT NULL,
-                updated_at TEXT
+                updated_at TEXT,
+                english_name TEXT
             )
             ''')
             logger.info("已创建game_translations表")
@@ -57,6 +68,9 @@ def init_translation_table():
             cursor.execute('ALTER TABLE games ADD COLUMN chinese_name TEXT')
             logger.info("已向games表添加chinese_name字段")
         
+        # 翻译变更需要更新数据版本号，使服务器缓存失效
+        create_meta_table(conn)
+        
         conn.commit()
         conn.close()
         logger.info("游戏翻译表初始化成功")
@@ -71,7 +85,7 @@ def create_empty_translation_csv():
         try:
             with open(TRANSLATION_CSV, 'w', newline='', encoding='utf-8') as f:
                 writer = csv.writer(f)
-                writer.writerow(['title_id', 'japanese_name', 'chinese_name'])
+                writer.writerow(CSV_HEADER)
             logger.info(f"已创建空的翻译文件: {TRANSLATION_CSV}")
             return True
         except Exception as e:
@@ -79,10 +93,17 @@ def create_empty_translation_csv():
             return False
     return True
 
+def read_csv_title_ids():
+    """读取翻译文件中已经列出的 title_id"""
+    with open(TRANSLATION_CSV, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # 跳过标题行
+        return {row[0] for row in reader if row}
+
 def export_untranslated_games():
-    """导出未翻译的游戏到CSV文件"""
+    """把未翻译、且翻译文件中还没有的游戏追加到CSV文件末尾"""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = get_connection()
         cursor = conn.cursor()
         
         # 查找所有未翻译的游戏
@@ -100,112 +121,149 @@ def export_untranslated_games():
         if not untranslated_games:
             print("没有找到需要翻译的游戏")
             return True
-            
-        # 备份现有的翻译文件
-        if os.path.exists(TRANSLATION_CSV):
-            backup_file = f"{TRANSLATION_CSV}.bak"
-            try:
-                os.replace(TRANSLATION_CSV, backup_file)
-                logger.info(f"已将现有翻译文件备份为: {backup_file}")
-            except Exception as e:
-                logger.warning(f"备份翻译文件失败: {str(e)}")
         
-        # 读取现有翻译
-        existing_translations = {}
-        if os.path.exists(f"{TRANSLATION_CSV}.bak"):
-            try:
-                with open(f"{TRANSLATION_CSV}.bak", 'r', newline='', encoding='utf-8') as f:
-                    reader = csv.reader(f)
-                    next(reader)  # 跳过标题行
-                    for row in reader:
-                        if len(row) >= 3 and row[0] and row[2]:
-                            existing_translations[row[0]] = (row[1], row[2])
-            except Exception as e:
-                logger.warning(f"读取现有翻译失败: {str(e)}")
+        # 只追加新游戏，已有的行（包括正在编辑的翻译）保持原样，不再整体重写文件
+        create_empty_translation_csv()
+        listed = read_csv_title_ids()
+        new_games = [(title_id, jp_name) for title_id, jp_name in untranslated_games if title_id not in listed]
         
-        # 创建新的翻译文件
-        with open(TRANSLATION_CSV, 'w', newline='', encoding='utf-8') as f:
+        if not new_games:
+            print(f"所有未翻译的游戏都已在 {TRANSLATION_CSV} 中")
+            return True
+        
+        # 文件末尾没有换行时先补上，避免新行接在最后一行后面
+        needs_newline = False
+        if os.path.getsize(TRANSLATION_CSV) > 0:
+            with open(TRANSLATION_CSV, 'rb') as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) not in (b'\n', b'\r')
+        
+        with open(TRANSLATION_CSV, 'a', newline='', encoding='utf-8') as f:
+            if needs_newline:
+                f.write('\r\n')
             writer = csv.writer(f)
-            writer.writerow(['title_id', 'japanese_name', 'chinese_name'])
-            
-            # 先写入现有的翻译
-            for title_id, (jp_name, cn_name) in existing_translations.items():
-                writer.writerow([title_id, jp_name, cn_name])
-            
-            # 添加未翻译的游戏
-            untranslated_count = 0
-            for title_id, jp_name in untranslated_games:
-                if title_id not in existing_translations:
-                    writer.writerow([title_id, jp_name, ''])
-                    untranslated_count += 1
+            writer.writerows([title_id, jp_name, '', ''] for title_id, jp_name in new_games)
         
-        print(f"已导出 {untranslated_count} 个未翻译的游戏到 {TRANSLATION_CSV}")
-        print(f"请编辑该文件添加中文翻译，然后运行 'python game_translation.py import' 导入翻译")
+        print(f"已追加 {len(new_games)} 个未翻译的游戏到 {TRANSLATION_CSV}")
+        print("请编辑该文件添加中文翻译，然后运行 'python game_translation.py import' 导入翻译")
+        print("可以运行 'python game_translation.py suggest' 根据已有翻译生成名称建议")
         return True
     except Exception as e:
         logger.error(f"导出未翻译游戏失败: {str(e)}")
         print(f"导出未翻译游戏失败: {str(e)}")
         return False
 
+def read_translation_csv():
+    """读取CSV文件中的有效翻译，返回 (title_id, 日文名, 中文名, 英文名) 列表；同一游戏以最后一行为准"""
+    translations = {}
+    with open(TRANSLATION_CSV, 'r', newline='', encoding='utf-8') as f:
+        reader = csv.reader(f)
+        next(reader, None)  # 跳过标题行
+        for row in reader:
+            en_name = row[3] if len(row) > 3 else ''
+            if len(row) >= 3 and row[0] and (row[2] or en_name):  # 确保有title_id和中文或英文名称
+                translations[row[0]] = (row[0], row[1], row[2], en_name or None)
+    return list(translations.values())
+
 def import_translations_from_csv():
-    """从CSV文件导入游戏翻译"""
+    """从CSV文件导入游戏翻译
+
+    CSV 先用一次 executemany 载入临时表，再用集合式 SQL 合并：
+    只有内容发生变化的翻译才会被写入，games 表的中文名称也在同一条 UPDATE 中完成，
+    搜索索引只为名称变化的游戏重建
+    """
     if not os.path.exists(TRANSLATION_CSV):
         print(f"翻译文件 {TRANSLATION_CSV} 不存在")
         return False
         
     try:
-        # 读取CSV文件
-        translations = []
-        with open(TRANSLATION_CSV, 'r', newline='', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            next(reader)  # 跳过标题行
-            for row in reader:
-                if len(row) >= 3 and row[0] and row[2]:  # 确保有title_id和chinese_name
-                    translations.append((row[0], row[1], row[2]))
+        translations = read_translation_csv()
         
         if not translations:
             print("没有找到有效的翻译记录")
             return False
             
-        # 导入到数据库
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
+        conn = get_connection()
         
         # 当前时间
         import datetime
         now = datetime.datetime.now().isoformat()
         
-        # 检查updated_at列是否存在
-        cursor.execute("PRAGMA table_info(game_translations)")
-        columns = [col[1] for col in cursor.fetchall()]
-        
-        if 'updated_at' in columns:
-            # 如果有updated_at列，使用完整的SQL
-            for title_id, jp_name, cn_name in translations:
-                cursor.execute('''
-                INSERT OR REPLACE INTO game_translations 
-                (title_id, japanese_name, chinese_name, updated_at)
-                VALUES (?, ?, ?, ?)
-                ''', (title_id, jp_name, cn_name, now))
-        else:
-            # 如果没有updated_at列，跳过该字段
-            for title_id, jp_name, cn_name in translations:
-                cursor.execute('''
-                INSERT OR REPLACE INTO game_translations 
-                (title_id, japanese_name, chinese_name)
-                VALUES (?, ?, ?)
-                ''', (title_id, jp_name, cn_name))
-        
-        # 同时更新games表中的chinese_name
-        for title_id, _, cn_name in translations:
-            cursor.execute('''
-            UPDATE games SET chinese_name = ? WHERE title_id = ?
-            ''', (cn_name, title_id))
-        
-        conn.commit()
-        conn.close()
+        try:
+            conn.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS staging_translations (
+                title_id TEXT PRIMARY KEY,
+                japanese_name TEXT,
+                chinese_name TEXT,
+                english_name TEXT
+            ) WITHOUT ROWID
+            ''')
+            conn.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS changed_translations (
+                title_id TEXT PRIMARY KEY
+            ) WITHOUT ROWID
+            ''')
+            conn.execute('DELETE FROM temp.staging_translations')
+            conn.execute('DELETE FROM temp.changed_translations')
+            conn.executemany('INSERT INTO temp.staging_translations VALUES (?, ?, ?, ?)', translations)
+            
+            # 名称发生变化的游戏：翻译新增或变化，或 games 中的中文名称与翻译不同
+            conn.execute('''
+            INSERT INTO temp.changed_translations
+            SELECT s.title_id
+            FROM temp.staging_translations s
+            LEFT JOIN game_translations t ON t.title_id = s.title_id
+            WHERE t.title_id IS NULL
+               OR t.japanese_name IS NOT s.japanese_name
+               OR t.chinese_name IS NOT s.chinese_name
+               OR t.english_name IS NOT s.english_name
+            ''')
+            conn.execute('''
+            INSERT OR IGNORE INTO temp.changed_translations
+            SELECT s.title_id
+            FROM temp.staging_translations s
+            JOIN games g ON g.title_id = s.title_id
+            WHERE s.chinese_name != ''
+              AND g.chinese_name IS NOT s.chinese_name
+            ''')
+            
+            # 与现有翻译完全相同的行不写入，updated_at 只在内容变化时更新
+            changed = conn.execute('''
+            INSERT INTO game_translations (title_id, japanese_name, chinese_name, english_name, updated_at)
+            SELECT s.title_id, s.japanese_name, s.chinese_name, s.english_name, ?
+            FROM temp.staging_translations s
+            LEFT JOIN game_translations t ON t.title_id = s.title_id
+            WHERE t.title_id IS NULL
+               OR t.japanese_name IS NOT s.japanese_name
+               OR t.chinese_name IS NOT s.chinese_name
+               OR t.english_name IS NOT s.english_name
+            ON CONFLICT(title_id) DO UPDATE SET
+                japanese_name = excluded.japanese_name,
+                chinese_name = excluded.chinese_name,
+                english_name = excluded.english_name,
+                updated_at = excluded.updated_at
+            ''', (now,)).rowcount
+            
+            # 同时更新games表中的chinese_name（只更新有中文名称且发生变化的游戏）
+            updated_games = conn.execute('''
+            UPDATE games
+            SET chinese_name = s.chinese_name
+            FROM temp.staging_translations s
+            WHERE s.title_id = games.title_id
+              AND s.chinese_name != ''
+              AND games.chinese_name IS NOT s.chinese_name
+            ''').rowcount
+            
+            # 只重新索引名称变化的游戏，运行中的服务器在下一次请求时重新加载名称缓存
+            if changed or updated_games:
+                refresh_search_index(conn, 'SELECT title_id FROM temp.changed_translations')
+                bump_data_version(conn)
+                bump_names_version(conn)
+            conn.commit()
+        finally:
+            conn.close()
         
-        print(f"成功导入 {len(translations)} 条翻译记录")
+        print(f"成功导入 {len(translations)} 条翻译记录，其中 {changed} 条有变化")
         return True
     except Exception as e:
         logger.error(f"导入翻译失败: {str(e)}")
@@ -213,35 +271,99 @@ def import_translations_from_csv():
         return False
 
 def apply_translations():
-    """将已有翻译应用到games表"""
+    """将已有翻译应用到games表，只更新中文名称不同的游戏"""
+    try:
+        conn = get_connection()
+        try:
+            conn.execute('''
+            CREATE TEMP TABLE IF NOT EXISTS applied_titles (
+                title_id TEXT PRIMARY KEY
+            ) WITHOUT ROWID
+            ''')
+            conn.execute('DELETE FROM temp.applied_titles')
+            conn.execute('''
+            INSERT INTO temp.applied_titles
+            SELECT g.title_id
+            FROM games g
+            JOIN game_translations t ON t.title_id = g.title_id
+            WHERE g.chinese_name IS NOT t.chinese_name
+            ''')
+            
+            # 更新games表中的chinese_name
+            updated_count = conn.execute('''
+            UPDATE games
+            SET chinese_name = t.chinese_name
+            FROM game_translations t
+            WHERE t.title_id = games.title_id
+              AND games.title_id IN (SELECT title_id FROM temp.applied_titles)
+            ''').rowcount
+            
+            # 只重新索引名称变化的游戏，没有变化时不使服务器缓存失效
+            if updated_count:
+                refresh_search_index(conn, 'SELECT title_id FROM temp.applied_titles')
+                bump_data_version(conn)
+                bump_names_version(conn)
+            conn.commit()
+        finally:
+            conn.close()
+        
+        print(f"已将 {updated_count} 个游戏的中文名称应用到数据库")
+        return True
+    except Exception as e:
+        logger.error(f"应用翻译失败: {str(e)}")
+        print(f"应用翻译失败: {str(e)}")
+        return False
+
+def suggest_translations(limit=3, min_score=DEFAULT_MIN_SCORE):
+    """根据已翻译游戏的名称相似度，为未翻译的游戏生成中文名称建议"""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = get_connection()
         cursor = conn.cursor()
         
-        # 更新games表中的chinese_name
+        # 已翻译的游戏：翻译文件中的日文名称为空时使用 games 表中的原始名称
         cursor.execute('''
-        UPDATE games 
-        SET chinese_name = (
-            SELECT t.chinese_name 
-            FROM game_translations t 
-            WHERE t.title_id = games.title_id
-        )
-        WHERE EXISTS (
-            SELECT 1 
-            FROM game_translations t 
-            WHERE t.title_id = games.title_id
-        )
+        SELECT t.title_id, COALESCE(NULLIF(t.japanese_name, ''), g.title_name), t.chinese_name
+        FROM game_translations t
+        LEFT JOIN games g ON g.title_id = t.title_id
+        WHERE t.chinese_name != ''
         ''')
+        translated = cursor.fetchall()
         
-        updated_count = cursor.rowcount
-        conn.commit()
+        cursor.execute('''
+        SELECT g.title_id, g.title_name 
+        FROM games g
+        LEFT JOIN game_translations t ON g.title_id = t.title_id
+        WHERE t.title_id IS NULL
+        ORDER BY g.title_name
+        ''')
+        untranslated_games = cursor.fetchall()
         conn.close()
         
-        print(f"已将 {updated_count} 个游戏的中文名称应用到数据库")
+        if not untranslated_games:
+            print("没有找到需要翻译的游戏")
+            return True
+        if not translated:
+            print("还没有任何中文翻译，无法生成建议")
+            return True
+        
+        matcher = TitleMatcher((jp_name, (title_id, cn_name)) for title_id, jp_name, cn_name in translated)
+        
+        suggested = 0
+        with open(SUGGESTIONS_CSV, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(SUGGESTIONS_HEADER)
+            for title_id, jp_name in untranslated_games:
+                matches = matcher.suggest(jp_name, limit=limit, min_score=min_score)
+                for score, matched_name, (matched_id, cn_name) in matches:
+                    writer.writerow([title_id, jp_name, cn_name, score, matched_id, matched_name])
+                suggested += bool(matches)
+        
+        print(f"已为 {suggested}/{len(untranslated_games)} 个未翻译的游戏生成名称建议: {SUGGESTIONS_CSV}")
+        print(f"建议来自名称最相似的已翻译游戏，请核对后填入 {TRANSLATION_CSV} 再导入")
         return True
     except Exception as e:
-        logger.error(f"应用翻译失败: {str(e)}")
-        print(f"应用翻译失败: {str(e)}")
+        logger.error(f"生成翻译建议失败: {str(e)}")
+        print(f"生成翻译建议失败: {str(e)}")
         return False
 
 def main():
@@ -265,8 +387,10 @@ def main():
             import_translations_from_csv()
         elif command == "apply":
             apply_translations()
+        elif command == "suggest":
+            suggest_translations()
         else:
-            print("未知命令。可用命令: export, import, apply")
+            print("未知命令。可用命令: export, import, apply, suggest")
     else:
         # 默认操作：导出未翻译的游戏
         export_untranslated_games()
@@ -5,10 +5,11 @@ import hashlib
 import re
 import sys
 import os
-import sqlite3
-from datetime import datetime, timedelta
+from datetime import datetime
 import time
 import logging
+import threading
+from urllib.parse import urlsplit
 
 # 配置日志 - 仅保留关键日志
 logging.basicConfig(
@@ -21,13 +22,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger("switch_tracker")
 
-# 数据库配置
-DB_FILE = 'switch_tracker.db'
+import history_archive
+from game_names import create_search_index, refresh_search_index
+from play_records import PlayHistories, parse_play_histories
+from database import (
+    get_connection, create_meta_table, bump_data_version, bump_names_version, rollup_periods,
+    ROLLUP_ALL_TITLES, DEFAULT_ACCOUNT
+)
+
+PLAY_HISTORIES_URL = 'https://news-api.entry.nintendo.co.jp/api/v1.1/users/me/play_histories'
+ACCESS_TOKEN_URL = 'https://accounts.nintendo.com/connect/1.0.0/api/token'
+
+# 默认账号的令牌保存在 config/tokens.json，其他账号保存在 config/accounts/<account_id>.json
+CONFIG_DIR = 'config'
+ACCOUNTS_DIR = os.path.join(CONFIG_DIR, 'accounts')
+
+# 请求遇到超时、连接错误或 5xx 时的最大重试次数
+MAX_RETRIES = 3
+# 第 n 次重试前等待 RETRY_BACKOFF * 2^(n-1) 秒
+RETRY_BACKOFF = 2
+# 同一主机每秒最多发起的请求数（所有账号共享）
+MAX_REQUESTS_PER_SECOND = 5
+# 访问令牌在真正过期前多少秒就视为到期并刷新
+TOKEN_REFRESH_AHEAD = 300
+# 后台刷新两次之间的最短间隔（秒），刷新失败或令牌有效期过短时不会连续请求
+TOKEN_RETRY_INTERVAL = 60
+# 令牌响应中没有 expires_in 时使用的有效期（秒）
+DEFAULT_TOKEN_LIFETIME = 900
 
 def init_database():
     """初始化数据库表结构"""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = get_connection()
         cursor = conn.cursor()
         
         # 创建游戏表 - 存储游戏基本信息
@@ -77,132 +103,571 @@ def init_database():
         ''')
         
         conn.commit()
+        
+        # 执行尚未应用的数据库结构迁移
+        migrate_database(conn)
+        
         conn.close()
         return True
     except Exception as e:
         logger.error(f"初始化数据库失败: {str(e)}")
         return False
 
-def save_to_database(data):
-    """将游戏数据保存到数据库中"""
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # 当前时间作为数据收集时间
-        collected_at = datetime.now().isoformat()
-        
-        # 保存游戏基本信息
-        for game in data.get('playHistories', []):
-            # 插入或更新游戏记录
-            cursor.execute('''
-            INSERT OR REPLACE INTO games (title_id, title_name, image_url, device_type)
-            VALUES (?, ?, ?, ?)
-            ''', (
-                game.get('titleId'), 
-                game.get('titleName'), 
-                game.get('imageUrl'),
-                game.get('deviceType')
-            ))
-            
-            # 保存游戏历史记录
-            cursor.execute('''
-            INSERT INTO game_history (
-                title_id, first_played_at, last_played_at, 
-                total_played_days, total_played_minutes, collected_at
-            ) VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                game.get('titleId'),
-                game.get('firstPlayedAt'),
-                game.get('lastPlayedAt'),
-                game.get('totalPlayedDays'),
-                game.get('totalPlayedMinutes'),
-                collected_at
-            ))
-        
-        # 保存每日游玩记录
-        for day_record in data.get('recentPlayHistories', []):
-            played_date = day_record.get('playedDate')
-            
-            for game in day_record.get('dailyPlayHistories', []):
-                # 只保存有游玩时间的记录
-                if game.get('totalPlayedMinutes', 0) > 0:
-                    cursor.execute('''
-                    INSERT INTO daily_play (title_id, played_date, played_minutes, collected_at)
-                    VALUES (?, ?, ?, ?)
-                    ''', (
-                        game.get('titleId'),
-                        played_date,
-                        game.get('totalPlayedMinutes'),
-                        collected_at
-                    ))
-        
+def migrate_unique_daily_play(conn):
+    """迁移 1：每日游玩记录以 (title_id, played_date) 为唯一键，重复记录已由 migrate_database 预先合并"""
+    cursor = conn.execute('''
+    SELECT name FROM sqlite_master WHERE type='index' AND name='idx_daily_play_title_date'
+    ''')
+    if cursor.fetchone():
+        return
+    
+    conn.execute('''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_daily_play_title_date
+    ON daily_play (title_id, played_date)
+    ''')
+
+def migrate_secondary_indexes(conn):
+    """迁移 2：为 server.py 中的查询添加覆盖索引"""
+    # 按日期查询当天游玩的游戏，以及按月份汇总
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_daily_play_date_title
+    ON daily_play (played_date, title_id, played_minutes)
+    ''')
+    # 单个游戏的每日游玩曲线
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_daily_play_title_date_minutes
+    ON daily_play (title_id, played_date, played_minutes)
+    ''')
+    # 按游戏汇总历史记录
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_game_history_title_collected
+    ON game_history (title_id, collected_at)
+    ''')
+
+def migrate_game_latest(conn):
+    """迁移 3：创建游戏最新快照表，并用现有历史记录初始化"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS game_latest (
+        title_id TEXT PRIMARY KEY,
+        first_played_at TEXT,
+        last_played_at TEXT,
+        total_played_days INTEGER,
+        total_played_minutes INTEGER,
+        collected_at TEXT NOT NULL,
+        FOREIGN KEY (title_id) REFERENCES games (title_id)
+    )
+    ''')
+    # 游戏列表按总时长排序
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_game_latest_minutes
+    ON game_latest (total_played_minutes)
+    ''')
+    conn.execute('''
+    INSERT OR REPLACE INTO game_latest (
+        title_id, first_played_at, last_played_at,
+        total_played_days, total_played_minutes, collected_at
+    )
+    SELECT 
+        title_id,
+        MIN(first_played_at),
+        MAX(last_played_at),
+        MAX(total_played_days),
+        MAX(total_played_minutes),
+        MAX(collected_at)
+    FROM game_history
+    GROUP BY title_id
+    ''')
+
+def migrate_play_rollups(conn):
+    """迁移 4：创建日/周/月游玩时间汇总表，并用现有每日记录初始化"""
+    conn.execute('''
+    CREATE TABLE IF NOT EXISTS play_rollups (
+        period TEXT NOT NULL,
+        title_id TEXT NOT NULL,
+        period_key TEXT NOT NULL,
+        total_minutes INTEGER NOT NULL,
+        PRIMARY KEY (period, title_id, period_key)
+    ) WITHOUT ROWID
+    ''')
+    
+    totals = {}
+    for title_id, played_date, played_minutes in conn.execute(
+        'SELECT title_id, played_date, played_minutes FROM daily_play'
+    ):
+        for period, period_key in rollup_periods(played_date):
+            for rollup_title_id in (title_id, ROLLUP_ALL_TITLES):
+                key = (period, rollup_title_id, period_key)
+                totals[key] = totals.get(key, 0) + played_minutes
+    
+    conn.execute('DELETE FROM play_rollups')
+    conn.executemany('''
+    INSERT INTO play_rollups (period, title_id, period_key, total_minutes)
+    VALUES (?, ?, ?, ?)
+    ''', [key + (minutes,) for key, minutes in totals.items()])
+
+def migrate_meta(conn):
+    """迁移 5：创建元数据表，保存 API 缓存使用的数据版本号"""
+    create_meta_table(conn)
+
+def rebuild_play_rollups(conn):
+    """根据 daily_play 重新计算每个账号的日/周/月汇总"""
+    totals = {}
+    for account_id, title_id, played_date, played_minutes in conn.execute(
+        'SELECT account_id, title_id, played_date, played_minutes FROM daily_play'
+    ):
+        for period, period_key in rollup_periods(played_date):
+            for rollup_title_id in (title_id, ROLLUP_ALL_TITLES):
+                key = (account_id, period, rollup_title_id, period_key)
+                totals[key] = totals.get(key, 0) + played_minutes
+    
+    conn.execute('DELETE FROM play_rollups')
+    conn.executemany('''
+    INSERT INTO play_rollups (account_id, period, title_id, period_key, total_minutes)
+    VALUES (?, ?, ?, ?, ?)
+    ''', [key + (minutes,) for key, minutes in totals.items()])
+
+def migrate_account_id(conn):
+    """迁移 6：daily_play、game_history、game_latest 和 play_rollups 增加 account_id，现有数据归属默认账号"""
+    for table in ('daily_play', 'game_history'):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN account_id TEXT NOT NULL DEFAULT '{DEFAULT_ACCOUNT}'")
+    
+    # 索引以 account_id 开头，服务器按账号查询时仍然只读取索引
+    for index in ('idx_daily_play_title_date', 'idx_daily_play_date_title',
+                  'idx_daily_play_title_date_minutes', 'idx_game_history_title_collected'):
+        conn.execute(f'DROP INDEX IF EXISTS {index}')
+    conn.execute('''
+    CREATE UNIQUE INDEX idx_daily_play_account_title_date
+    ON daily_play (account_id, title_id, played_date)
+    ''')
+    conn.execute('''
+    CREATE INDEX idx_daily_play_account_date_title
+    ON daily_play (account_id, played_date, title_id, played_minutes)
+    ''')
+    conn.execute('''
+    CREATE INDEX idx_daily_play_account_title_minutes
+    ON daily_play (account_id, title_id, played_date, played_minutes)
+    ''')
+    conn.execute('''
+    CREATE INDEX idx_game_history_account_title_collected
+    ON game_history (account_id, title_id, collected_at)
+    ''')
+    
+    # 主键变化的表需要重建
+    conn.execute('ALTER TABLE game_latest RENAME TO game_latest_old')
+    conn.execute('DROP INDEX IF EXISTS idx_game_latest_minutes')
+    conn.execute(f'''
+    CREATE TABLE game_latest (
+        account_id TEXT NOT NULL DEFAULT '{DEFAULT_ACCOUNT}',
+        title_id TEXT NOT NULL,
+        first_played_at TEXT,
+        last_played_at TEXT,
+        total_played_days INTEGER,
+        total_played_minutes INTEGER,
+        collected_at TEXT NOT NULL,
+        PRIMARY KEY (account_id, title_id),
+        FOREIGN KEY (title_id) REFERENCES games (title_id)
+    )
+    ''')
+    conn.execute('''
+    INSERT INTO game_latest (
+        title_id, first_played_at, last_played_at,
+        total_played_days, total_played_minutes, collected_at
+    )
+    SELECT title_id, first_played_at, last_played_at,
+           total_played_days, total_played_minutes, collected_at
+    FROM game_latest_old
+    ''')
+    conn.execute('DROP TABLE game_latest_old')
+    conn.execute('''
+    CREATE INDEX idx_game_latest_account_minutes
+    ON game_latest (account_id, total_played_minutes)
+    ''')
+    
+    conn.execute('DROP TABLE play_rollups')
+    conn.execute(f'''
+    CREATE TABLE play_rollups (
+        account_id TEXT NOT NULL DEFAULT '{DEFAULT_ACCOUNT}',
+        period TEXT NOT NULL,
+        title_id TEXT NOT NULL,
+        period_key TEXT NOT NULL,
+        total_minutes INTEGER NOT NULL,
+        PRIMARY KEY (account_id, period, title_id, period_key)
+    ) WITHOUT ROWID
+    ''')
+    rebuild_play_rollups(conn)
+
+def migrate_fetch_state(conn):
+    """迁移 7：记录每个账号上次获取 play_histories 的 ETag、Last-Modified 和内容哈希，用于跳过未变化的数据"""
+    conn.execute(f'''
+    CREATE TABLE IF NOT EXISTS fetch_state (
+        account_id TEXT PRIMARY KEY DEFAULT '{DEFAULT_ACCOUNT}',
+        etag TEXT,
+        last_modified TEXT,
+        content_hash TEXT,
+        fetched_at TEXT,
+        changed_at TEXT
+    )
+    ''')
+
+def migrate_translation_locales(conn):
+    """迁移 8：翻译表增加英文名称，服务器可以按请求的语言显示游戏名称"""
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(game_translations)')]
+    if 'english_name' not in columns:
+        conn.execute('ALTER TABLE game_translations ADD COLUMN english_name TEXT')
+    create_meta_table(conn)
+    bump_names_version(conn)
+
+def migrate_game_search(conn):
+    """迁移 9：游戏名称的 FTS5 全文索引，以及 /api/games 按最近游玩筛选和排序用的索引"""
+    if not create_search_index(conn):
+        logger.warning("当前 SQLite 不支持 FTS5 trigram 分词，/api/games 的搜索将在内存中进行")
+    conn.execute('''
+    CREATE INDEX IF NOT EXISTS idx_game_latest_account_last_played
+    ON game_latest (account_id, last_played_at)
+    ''')
+
+# 数据库结构迁移，按顺序执行，已应用的版本号记录在 PRAGMA user_version 中
+SCHEMA_MIGRATIONS = [
+    migrate_unique_daily_play,
+    migrate_secondary_indexes,
+    migrate_game_latest,
+    migrate_play_rollups,
+    migrate_meta,
+    migrate_account_id,
+    migrate_fetch_state,
+    migrate_translation_locales,
+    migrate_game_search,
+]
+
+def migrate_database(conn):
+    """将数据库结构升级到最新版本"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version == 0:
+        # 合并重复记录可能要删除大量行，在迁移 1 的事务之前分批执行并逐批提交，
+        # 每批只短暂持有写锁，收集脚本和服务器不会被长时间挡住；中途中断时下次启动继续合并
+        removed = deduplicate_daily_play(conn)
+        if removed:
+            logger.warning(f"已合并 {removed} 条重复的每日游玩记录")
+    for target, migration in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        # sqlite3 不会在 DDL 前自动开启事务，每条 ALTER TABLE 都会单独提交；
+        # 显式开启事务，迁移中途失败时连同版本号一起回滚，重新运行时从头执行该迁移
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            migration(conn)
+            # PRAGMA 不支持参数绑定，版本号为内部整数
+            conn.execute(f'PRAGMA user_version = {target}')
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        logger.info(f"数据库结构已升级到版本 {target}: {migration.__doc__}")
+
+def deduplicate_daily_play(conn, batch_size=100):
+    """合并 daily_play 中重复的 (title_id, played_date) 记录，只保留最后采集的一条
+    
+    按 title_id 分批删除并逐批提交，每批只短暂持有写锁，服务器在合并期间仍可读取
+    """
+    title_ids = [row[0] for row in conn.execute('SELECT DISTINCT title_id FROM daily_play')]
+    
+    removed = 0
+    for i in range(0, len(title_ids), batch_size):
+        batch = title_ids[i:i + batch_size]
+        placeholders = ','.join('?' * len(batch))
+        cursor = conn.execute(f'''
+        DELETE FROM daily_play
+        WHERE title_id IN ({placeholders})
+          AND id NOT IN (
+              SELECT MAX(id)
+              FROM daily_play
+              WHERE title_id IN ({placeholders})
+              GROUP BY title_id, played_date
+          )
+        ''', batch + batch)
+        removed += cursor.rowcount
         conn.commit()
-        
-        # 检查game_translations表是否存在，不存在则创建
-        cursor.execute('''
-        SELECT name FROM sqlite_master WHERE type='table' AND name='game_translations'
+    
+    return removed
+
+# 入库使用的临时暂存表，每个连接各自一份（temp_store = MEMORY，不写磁盘）
+STAGING_TABLES = (
+    '''
+    CREATE TEMP TABLE IF NOT EXISTS staging_games (
+        title_id TEXT PRIMARY KEY,
+        title_name TEXT,
+        image_url TEXT,
+        device_type TEXT,
+        first_played_at TEXT,
+        last_played_at TEXT,
+        total_played_days INTEGER,
+        total_played_minutes INTEGER
+    )
+    ''',
+    '''
+    CREATE TEMP TABLE IF NOT EXISTS staging_daily (
+        title_id TEXT NOT NULL,
+        played_date TEXT NOT NULL,
+        played_minutes INTEGER NOT NULL,
+        delta INTEGER,
+        PRIMARY KEY (title_id, played_date)
+    )
+    ''',
+    '''
+    CREATE TEMP TABLE IF NOT EXISTS staging_periods (
+        played_date TEXT NOT NULL,
+        period TEXT NOT NULL,
+        period_key TEXT NOT NULL,
+        PRIMARY KEY (played_date, period)
+    )
+    ''',
+    '''
+    CREATE TEMP TABLE IF NOT EXISTS staging_changed_titles (
+        title_id TEXT PRIMARY KEY
+    )
+    ''',
+)
+
+def stage_play_histories(conn, records):
+    """把解析后的 PlayHistories 用 executemany 写入临时暂存表"""
+    for sql in STAGING_TABLES:
+        conn.execute(sql)
+    for table in ('staging_games', 'staging_daily', 'staging_periods', 'staging_changed_titles'):
+        conn.execute(f'DELETE FROM temp.{table}')
+    conn.executemany('INSERT INTO temp.staging_games VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                     [game.as_row() for game in records.games])
+    conn.executemany('''
+    INSERT INTO temp.staging_daily (title_id, played_date, played_minutes) VALUES (?, ?, ?)
+    ''', [day.as_row() for day in records.daily])
+    conn.executemany('INSERT INTO temp.staging_periods VALUES (?, ?, ?)', [
+        (played_date,) + period
+        for played_date in {day.played_date for day in records.daily}
+        for period in rollup_periods(played_date)
+    ])
+
+def merge_staged_play_histories(conn, account_id, collected_at, stats):
+    """用集合操作把暂存表合并到正式表，只写入与现有数据不同的行，返回是否有任何写入"""
+    # 新增或名称、图片、设备类型变化的游戏
+    conn.execute('''
+    INSERT INTO temp.staging_changed_titles (title_id)
+    SELECT s.title_id
+    FROM temp.staging_games s
+    LEFT JOIN games g ON g.title_id = s.title_id
+    WHERE g.title_id IS NULL
+       OR g.title_name IS NOT s.title_name
+       OR g.image_url IS NOT s.image_url
+       OR g.device_type IS NOT s.device_type
+    ''')
+    
+    # 保存游戏基本信息，保留已有的中文名称
+    stats['games'] = conn.execute('''
+    INSERT INTO games (title_id, title_name, image_url, device_type)
+    SELECT title_id, title_name, image_url, device_type
+    FROM temp.staging_games
+    WHERE title_id IN (SELECT title_id FROM temp.staging_changed_titles)
+    ON CONFLICT (title_id) DO UPDATE SET
+        title_name = excluded.title_name,
+        image_url = excluded.image_url,
+        device_type = excluded.device_type
+    ''').rowcount
+    
+    # 只有总天数或总时长变化时才追加历史记录
+    stats['history_rows'] = conn.execute('''
+    INSERT INTO game_history (
+        account_id, title_id, first_played_at, last_played_at, 
+        total_played_days, total_played_minutes, collected_at
+    )
+    SELECT ?, s.title_id, s.first_played_at, s.last_played_at,
+           s.total_played_days, s.total_played_minutes, ?
+    FROM temp.staging_games s
+    LEFT JOIN game_latest l ON l.account_id = ? AND l.title_id = s.title_id
+    WHERE l.title_id IS NULL
+       OR l.total_played_days IS NOT s.total_played_days
+       OR l.total_played_minutes IS NOT s.total_played_minutes
+    ''', (account_id, collected_at, account_id)).rowcount
+    
+    # 更新最新快照
+    latest_rows = conn.execute('''
+    INSERT INTO game_latest (
+        account_id, title_id, first_played_at, last_played_at, 
+        total_played_days, total_played_minutes, collected_at
+    )
+    SELECT ?, s.title_id, s.first_played_at, s.last_played_at,
+           s.total_played_days, s.total_played_minutes, ?
+    FROM temp.staging_games s
+    WHERE NOT EXISTS (
+        SELECT 1 FROM game_latest l
+        WHERE l.account_id = ?
+          AND l.title_id = s.title_id
+          AND l.first_played_at IS s.first_played_at
+          AND l.last_played_at IS s.last_played_at
+          AND l.total_played_days IS s.total_played_days
+          AND l.total_played_minutes IS s.total_played_minutes
+    )
+    ON CONFLICT (account_id, title_id) DO UPDATE SET
+        first_played_at = excluded.first_played_at,
+        last_played_at = excluded.last_played_at,
+        total_played_days = excluded.total_played_days,
+        total_played_minutes = excluded.total_played_minutes,
+        collected_at = excluded.collected_at
+    ''', (account_id, collected_at, account_id)).rowcount
+    
+    # 计算每条每日记录相对数据库的时长变化，去掉没有变化的记录
+    conn.execute('''
+    UPDATE temp.staging_daily
+    SET delta = played_minutes - COALESCE((
+        SELECT d.played_minutes FROM daily_play d
+        WHERE d.account_id = ?
+          AND d.title_id = staging_daily.title_id
+          AND d.played_date = staging_daily.played_date
+    ), 0)
+    ''', (account_id,))
+    conn.execute('DELETE FROM temp.staging_daily WHERE delta = 0')
+    
+    # 保存每日游玩记录
+    stats['daily_rows'] = conn.execute('''
+    INSERT INTO daily_play (account_id, title_id, played_date, played_minutes, collected_at)
+    SELECT ?, title_id, played_date, played_minutes, ?
+    FROM temp.staging_daily
+    WHERE true
+    ON CONFLICT (account_id, title_id, played_date) DO UPDATE SET
+        played_minutes = excluded.played_minutes,
+        collected_at = excluded.collected_at
+    ''', (account_id, collected_at)).rowcount
+    
+    # 把时长变化累加到日/周/月汇总（单个游戏及所有游戏合计）
+    conn.execute('''
+    INSERT INTO play_rollups (account_id, period, title_id, period_key, total_minutes)
+    SELECT ?, period, title_id, period_key, minutes FROM (
+        SELECT p.period, d.title_id, p.period_key, SUM(d.delta) AS minutes
+        FROM temp.staging_daily d
+        JOIN temp.staging_periods p ON p.played_date = d.played_date
+        GROUP BY p.period, d.title_id, p.period_key
+        UNION ALL
+        SELECT p.period, ?, p.period_key, SUM(d.delta)
+        FROM temp.staging_daily d
+        JOIN temp.staging_periods p ON p.played_date = d.played_date
+        GROUP BY p.period, p.period_key
+    )
+    WHERE true
+    ON CONFLICT (account_id, period, title_id, period_key) DO UPDATE SET
+        total_minutes = total_minutes + excluded.total_minutes
+    ''', (account_id, ROLLUP_ALL_TITLES))
+    
+    if stats['games']:
+        # 只为新增或变化的游戏匹配中文名称
+        conn.execute('''
+        UPDATE games
+        SET chinese_name = (
+            SELECT t.chinese_name
+            FROM game_translations t
+            WHERE t.title_id = games.title_id
+        )
+        WHERE title_id IN (SELECT title_id FROM temp.staging_changed_titles)
+          AND EXISTS (
+            SELECT 1
+            FROM game_translations t
+            WHERE t.title_id = games.title_id
+        )
         ''')
-        if not cursor.fetchone():
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS game_translations (
-                title_id TEXT PRIMARY KEY,
-                japanese_name TEXT,
-                chinese_name TEXT
-            )
-            ''')
-            conn.commit()
-            logger.info("创建了game_translations表")
+        refresh_search_index(conn, 'SELECT title_id FROM temp.staging_changed_titles')
+    
+    return bool(stats['games'] or stats['history_rows'] or latest_rows or stats['daily_rows'])
+
+def save_to_database(data, stats=None, account_id=DEFAULT_ACCOUNT, collected_at=None):
+    """将某个账号的游戏数据保存到数据库中，只写入与现有数据不同的游戏和日期
+    
+    data 可以是 parse_play_histories 的解析结果，也可以是原始响应或已解码的字典；
+    传入 stats 字典时写入各表实际写入的行数和被丢弃的无效记录数，
+    collected_at 默认为当前时间（重新导入归档时为采集时间）
+    
+    先把数据批量写入临时暂存表，再在一个写事务中用集合操作合并到正式表
+    """
+    if stats is None:
+        stats = {}
+    stats.update(games=0, history_rows=0, daily_rows=0, invalid=0)
+    try:
+        records = data if isinstance(data, PlayHistories) else parse_play_histories(data)
+        if records.errors:
+            stats['invalid'] = records.invalid
+            logger.warning(f"丢弃了 {records.invalid} 条无效记录: {dict(records.errors)}")
         
-        # 尝试更新中文名称，如果表存在
+        conn = get_connection()
+        collected_at = (collected_at or datetime.now()).isoformat()
         try:
-            cursor.execute('''
-            UPDATE games 
-            SET chinese_name = (
-                SELECT t.chinese_name 
-                FROM game_translations t 
-                WHERE t.title_id = games.title_id
-            )
-            WHERE EXISTS (
-                SELECT 1 
-                FROM game_translations t 
-                WHERE t.title_id = games.title_id
-            )
-            ''')
+            stage_play_histories(conn, records)
+            conn.commit()
             
-            # 检查是否有未翻译的游戏
-            cursor.execute('''
-            SELECT COUNT(*) 
-            FROM games 
-            WHERE chinese_name IS NULL OR chinese_name = ''
-            ''')
-            untranslated_count = cursor.fetchone()[0]
+            # 先读后写的事务需要一开始就持有写锁，否则其他账号同时提交时会升级失败
+            conn.execute('BEGIN IMMEDIATE')
+            if not merge_staged_play_histories(conn, account_id, collected_at, stats):
+                # 没有任何变化时数据版本号不变，服务器缓存继续有效
+                conn.rollback()
+                logger.info("数据没有变化，跳过写入")
+                return True
             
+            bump_data_version(conn)
+            if stats['games']:
+                # 游戏新增或改名，服务器需要重新加载名称缓存
+                bump_names_version(conn)
             conn.commit()
             
-            # 打印信息并检查未翻译的游戏
-            if untranslated_count > 0:
-                print(f"发现 {untranslated_count} 个未翻译的游戏，可以运行 'python game_translation.py' 导出并翻译")
-            
-        except Exception as e:
-            logger.warning(f"更新中文名称时出错: {str(e)}")
-            # 错误不中断程序流程，继续执行
+            if stats['games']:
+                untranslated_count = conn.execute('''
+                SELECT COUNT(*) 
+                FROM games 
+                WHERE chinese_name IS NULL OR chinese_name = ''
+                ''').fetchone()[0]
+                if untranslated_count > 0:
+                    print(f"发现 {untranslated_count} 个未翻译的游戏，可以运行 'python game_translation.py' 导出并翻译")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
         
-        conn.close()
         logger.info(f"数据已成功保存到数据库")
         return True
     except Exception as e:
         logger.error(f"保存数据到数据库失败: {str(e)}")
         return False
 
-def get_game_list_with_cn_names():
-    """获取游戏列表，优先使用中文名称"""
+def load_fetch_state(account_id=DEFAULT_ACCOUNT):
+    """读取账号上次获取数据时的 (etag, last_modified, content_hash)，没有记录时返回 None"""
+    conn = get_connection()
+    try:
+        return conn.execute(
+            'SELECT etag, last_modified, content_hash FROM fetch_state WHERE account_id = ?',
+            (account_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+
+def save_fetch_state(account_id, etag, last_modified, content_hash, changed):
+    """记录本次获取的校验信息；fetch_state 不影响 API 返回的数据，不更新数据版本号"""
+    now = datetime.now().isoformat()
+    conn = get_connection()
+    try:
+        conn.execute('''
+        INSERT INTO fetch_state (account_id, etag, last_modified, content_hash, fetched_at, changed_at)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT (account_id) DO UPDATE SET
+            etag = excluded.etag,
+            last_modified = excluded.last_modified,
+            content_hash = excluded.content_hash,
+            fetched_at = excluded.fetched_at,
+            changed_at = COALESCE(excluded.changed_at, fetch_state.changed_at)
+        ''', (account_id, etag, last_modified, content_hash, now, now if changed else None))
+        conn.commit()
+    finally:
+        conn.close()
+
+def get_game_list_with_cn_names(account_id=DEFAULT_ACCOUNT):
+    """获取某个账号的游戏列表，优先使用中文名称"""
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = get_connection()
         cursor = conn.cursor()
         
         # 确保表存在
-        tables_needed = ['games', 'game_history']
+        tables_needed = ['games', 'game_latest']
         for table in tables_needed:
             cursor.execute(f"SELECT name FROM sqlite_master WHERE type='table' AND name='{table}'")
             if not cursor.fetchone():
@@ -218,16 +683,13 @@ def get_game_list_with_cn_names():
                     THEN games.chinese_name 
                     ELSE games.title_name 
                END AS display_name,
-               h.total_played_days
+               l.total_played_days
         FROM games
-        JOIN (
-            SELECT title_id, MAX(total_played_days) as total_played_days
-            FROM game_history
-            GROUP BY title_id
-        ) h ON games.title_id = h.title_id
-        ORDER BY h.total_played_days DESC
+        JOIN game_latest l ON games.title_id = l.title_id
+        WHERE l.account_id = ?
+        ORDER BY l.total_played_days DESC
         LIMIT 10
-        ''')
+        ''', (account_id,))
         
         games = cursor.fetchall()
         conn.close()
@@ -237,15 +699,99 @@ def get_game_list_with_cn_names():
         logger.error(f"获取游戏列表失败: {str(e)}")
         return []
 
+def compact_game_history(batch_size=100):
+    """压缩 game_history：每个游戏只保留总天数或总时长发生变化的记录
+    
+    按 title_id 分批删除并逐批提交，避免长时间阻塞服务器读取
+    """
+    try:
+        conn = get_connection()
+        title_ids = [row[0] for row in conn.execute('SELECT DISTINCT title_id FROM game_history')]
+        
+        removed = 0
+        for i in range(0, len(title_ids), batch_size):
+            batch = title_ids[i:i + batch_size]
+            placeholders = ','.join('?' * len(batch))
+            cursor = conn.execute(f'''
+            DELETE FROM game_history
+            WHERE id IN (
+                SELECT id FROM (
+                    SELECT 
+                        id,
+                        total_played_days,
+                        total_played_minutes,
+                        LAG(total_played_days) OVER w AS prev_days,
+                        LAG(total_played_minutes) OVER w AS prev_minutes,
+                        ROW_NUMBER() OVER w AS row_num
+                    FROM game_history
+                    WHERE title_id IN ({placeholders})
+                    WINDOW w AS (PARTITION BY account_id, title_id ORDER BY id)
+                )
+                WHERE row_num > 1
+                  AND total_played_days IS prev_days
+                  AND total_played_minutes IS prev_minutes
+            )
+            ''', batch)
+            removed += cursor.rowcount
+            conn.commit()
+        
+        conn.close()
+        print(f"已从 game_history 中移除 {removed} 条未变化的记录")
+        return True
+    except Exception as e:
+        logger.error(f"压缩历史记录失败: {str(e)}")
+        print(f"压缩历史记录失败: {str(e)}")
+        return False
+
+class HostRateLimiter:
+    """按主机限流：同一主机的两次请求之间至少间隔 1/requests_per_second 秒，线程安全"""
+
+    def __init__(self, requests_per_second):
+        self.min_interval = 1.0 / requests_per_second if requests_per_second else 0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+# 所有账号的 nsession 共享同一个限流器
+host_rate_limiter = HostRateLimiter(MAX_REQUESTS_PER_SECOND)
+
+def token_file_for(account_id):
+    """账号的令牌文件路径"""
+    if account_id == DEFAULT_ACCOUNT:
+        return os.path.join(CONFIG_DIR, 'tokens.json')
+    return os.path.join(ACCOUNTS_DIR, f'{account_id}.json')
+
+def list_accounts():
+    """返回所有已保存令牌的账号"""
+    accounts = []
+    if os.path.exists(token_file_for(DEFAULT_ACCOUNT)):
+        accounts.append(DEFAULT_ACCOUNT)
+    if os.path.isdir(ACCOUNTS_DIR):
+        accounts += sorted(name[:-len('.json')] for name in os.listdir(ACCOUNTS_DIR) if name.endswith('.json'))
+    return accounts
+
 class nsession:
  
-    def __init__(self, client_id='5c38e31cd085304b') -> None:
+    def __init__(self, client_id='5c38e31cd085304b', account_id=DEFAULT_ACCOUNT) -> None:
         self.session = requests.Session()
         self.client_id = client_id
+        self.account_id = account_id
         self.ua = 'com.nintendo.znej/1.13.0 (Android/7.1.2)'
-        self.config_dir = 'config'
-        self.token_file = os.path.join(self.config_dir, 'tokens.json')
+        self.token_file = token_file_for(account_id)
+        self.config_dir = os.path.dirname(self.token_file)
         self.timeout = 30  # 请求超时时间（秒）
+        self.expires_at = 0
+        # 后台刷新、401 重试和收集线程可能同时刷新令牌
+        self._token_lock = threading.RLock()
+        self._refresh_stop = threading.Event()
         self.load_tokens()
  
     def load_tokens(self):
@@ -263,13 +809,11 @@ class nsession:
                     tokens = json.load(f)
                     self.session_token = tokens.get('session_token')
                     self.access_token = tokens.get('access_token')
+                    # expires_at 是保存时算好的刷新时间（已提前 TOKEN_REFRESH_AHEAD 秒）
+                    self.expires_at = tokens.get('expires_at', 0)
                     
-                    # 检查token是否过期
-                    if self.access_token and 'expires_in' in self.access_token:
-                        expires_at = tokens.get('expires_at', 0)
-                        if time.time() > expires_at:
-                            logger.warning("访问令牌已过期，将使用会话令牌刷新")
-                            return True
+                    if self.access_token_expired():
+                        logger.info("访问令牌已过期，将在使用前用会话令牌刷新")
                     return True
             except (json.JSONDecodeError, Exception) as e:
                 logger.error(f"读取token失败: {str(e)}")
@@ -281,8 +825,11 @@ class nsession:
         try:
             # 计算过期时间
             expires_at = 0
-            if hasattr(self, 'access_token') and self.access_token and 'expires_in' in self.access_token:
-                expires_at = time.time() + int(self.access_token['expires_in']) - 300  # 提前5分钟刷新
+            if hasattr(self, 'access_token') and self.access_token:
+                # 没有 expires_in 时按默认有效期计算，否则 expires_at 为 0，每次使用前都会重新刷新
+                expires_in = self.access_token.get('expires_in', DEFAULT_TOKEN_LIFETIME)
+                expires_at = time.time() + int(expires_in) - TOKEN_REFRESH_AHEAD
+            self.expires_at = expires_at
                 
             tokens = {
                 'session_token': getattr(self, 'session_token', None),
@@ -301,28 +848,72 @@ class nsession:
             logger.error(f"保存 token 失败: {str(e)}")
             return False
 
-    def check_tokens_valid(self):
-        """检查 token 是否有效"""
-        if not hasattr(self, 'access_token') or not self.access_token:
-            return False
-            
-        try:
-            url = 'https://news-api.entry.nintendo.co.jp/api/v1.1/users/me/play_histories'
-            header = {
-                'Authorization': f"{self.access_token['token_type']} {self.access_token['access_token']}",
-                'User-Agent': self.ua,
-            }
-            r = self.session.get(url, headers=header, timeout=self.timeout)
+    def request(self, method, url, stats=None, **kwargs):
+        """发送请求，遇到超时、连接错误或 5xx 时按指数退避重试"""
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(MAX_RETRIES + 1):
+            host_rate_limiter.wait(url)
+            try:
+                r = self.session.request(method, url, **kwargs)
+                if r.status_code < 500 or attempt == MAX_RETRIES:
+                    return r
+                reason = f"状态码 {r.status_code}"
+            except (requests.Timeout, requests.ConnectionError) as e:
+                if attempt == MAX_RETRIES:
+                    raise
+                reason = str(e)
             
-            return r.status_code == 200
-        except Exception as e:
-            logger.error(f"验证令牌失败: {str(e)}")
-            return False
+            delay = RETRY_BACKOFF * 2 ** attempt
+            logger.warning(f"请求 {url} 失败（{reason}），{delay} 秒后第 {attempt + 1} 次重试")
+            if stats is not None:
+                stats['retries'] = stats.get('retries', 0) + 1
+            time.sleep(delay)
+
+    def access_token_expired(self):
+        """访问令牌是否需要刷新，只根据保存的 expires_at 判断，不发起请求"""
+        return not getattr(self, 'access_token', None) or time.time() >= self.expires_at
+
+    def ensure_access_token(self):
+        """访问令牌到期时才刷新，返回是否持有可用的访问令牌"""
+        with self._token_lock:
+            if not self.access_token_expired():
+                return True
+            logger.info(f"账号 {self.account_id or '默认'} 的访问令牌已到期，正在刷新")
+            return self.get_access_token() is not None
+
+    def refresh_rejected_token(self, rejected_token):
+        """访问令牌被服务器拒绝（401）时刷新；其他线程已经刷新过则直接使用新令牌"""
+        with self._token_lock:
+            if self.access_token is not rejected_token:
+                return True
+            return self.get_access_token() is not None
+
+    def start_background_refresh(self):
+        """启动后台线程，在 expires_at 到达时提前刷新访问令牌（常驻模式使用）"""
+        def run():
+            last_attempt = None
+            while True:
+                delay = 0 if self.access_token_expired() else self.expires_at - time.time()
+                if last_attempt is not None:
+                    # 刷新失败或有效期短于 TOKEN_REFRESH_AHEAD 时令牌仍视为到期，
+                    # 两次刷新之间至少间隔 TOKEN_RETRY_INTERVAL 秒，避免空转
+                    delay = max(delay, last_attempt + TOKEN_RETRY_INTERVAL - time.monotonic())
+                if self._refresh_stop.wait(max(delay, 0)):
+                    return
+                last_attempt = time.monotonic()
+                if not self.ensure_access_token():
+                    logger.warning(f"后台刷新访问令牌失败，{TOKEN_RETRY_INTERVAL} 秒后重试")
+        
+        self._refresh_stop.clear()
+        threading.Thread(target=run, daemon=True).start()
+
+    def stop_background_refresh(self):
+        self._refresh_stop.set()
 
     def log_in(self):
         '''登录 Nintendo 账号并返回 session_token'''
-        # 如果已有有效的 token，直接返回
-        if hasattr(self, 'session_token') and self.check_tokens_valid():
+        # 如果已有未过期的 token，直接返回
+        if getattr(self, 'session_token', None) and not self.access_token_expired():
             return self.session_token
 
         print("注意：获取的链接有效期很短，请在 5 分钟内完成操作！")
@@ -467,14 +1058,14 @@ class nsession:
             "grant_type": "urn:ietf:params:oauth:grant-type:jwt-bearer-session-token"
         }
         
-        url = 'https://accounts.nintendo.com/connect/1.0.0/api/token'
+        url = ACCESS_TOKEN_URL
  
         try:
-            r = self.session.post(
+            r = self.request(
+                'POST',
                 url, 
                 headers={'Content-Type': 'application/json'}, 
-                data=json.dumps(body),
-                timeout=self.timeout
+                data=json.dumps(body)
             )
             
             if r.status_code != 200:
@@ -490,65 +1081,100 @@ class nsession:
             logger.error(f"获取访问令牌失败: {str(e)}")
             return None
  
-    def get_history(self):
-        '''获取游戏历史记录'''
+    def fetch_play_histories(self, stats=None, fetch_state=None):
+        '''请求 play_histories，返回 (响应, 本次使用的访问令牌)
+        
+        传入上次的 fetch_state 时带上 If-None-Match/If-Modified-Since，服务器支持时未变化的数据返回 304'''
+        access_token = self.access_token
+        header = {
+            'Authorization': f"{access_token['token_type']} {access_token['access_token']}",
+            'User-Agent': self.ua,
+        }
+        if fetch_state:
+            etag, last_modified, _ = fetch_state
+            if etag:
+                header['If-None-Match'] = etag
+            if last_modified:
+                header['If-Modified-Since'] = last_modified
+        return self.request('GET', PLAY_HISTORIES_URL, stats=stats, headers=header), access_token
+
+    def get_history(self, stats=None):
+        '''获取游戏历史记录；传入 stats 字典时记录响应大小、重试次数和写入行数'''
         if not hasattr(self, 'access_token') or not self.access_token:
             logger.error("缺少访问令牌，无法获取游戏历史记录")
             return None
             
-        url = 'https://news-api.entry.nintendo.co.jp/api/v1.1/users/me/play_histories'
-        header = {
-            'Authorization': f"{self.access_token['token_type']} {self.access_token['access_token']}",
-            'User-Agent': self.ua,
-        }
         try:
-            r = self.session.get(url, headers=header, timeout=self.timeout)
+            fetch_state = load_fetch_state(self.account_id)
+            r, used_token = self.fetch_play_histories(stats, fetch_state)
+            if r.status_code == 401:
+                # 令牌在到期前被服务器拒绝时，刷新一次后重试
+                logger.warning("访问令牌被拒绝，刷新后重试")
+                if self.refresh_rejected_token(used_token):
+                    r, _ = self.fetch_play_histories(stats, fetch_state)
+            if stats is not None:
+                stats['status'] = r.status_code
+                stats['bytes'] = len(r.content)
             
-            if r.status_code == 200:
-                # 创建保存目录
-                save_dir = 'history_data'
+            content_hash = hashlib.sha256(r.content).hexdigest() if r.status_code == 200 else None
+            unchanged = r.status_code == 304 or (
+                content_hash is not None and fetch_state is not None and fetch_state[2] == content_hash
+            )
+            if unchanged:
+                # 数据与上次相同：不保存 JSON 文件，也不开启数据库事务
+                if stats is not None:
+                    stats['unchanged'] = True
+                # 只有服务器返回了新的 ETag 或 Last-Modified 时才更新 fetch_state，轮询时不产生写事务
+                etag = r.headers.get('ETag') or fetch_state[0]
+                last_modified = r.headers.get('Last-Modified') or fetch_state[1]
+                if (etag, last_modified) != (fetch_state[0], fetch_state[1]):
+                    save_fetch_state(self.account_id, etag, last_modified, fetch_state[2], changed=False)
+                # 归档中只追加一条采集记录
+                if history_archive.find_object(fetch_state[2]):
+                    history_archive.record_capture(fetch_state[2], self.account_id)
+                print("游戏历史记录没有变化，跳过保存")
+            elif r.status_code == 200:
                 try:
-                    if not os.path.exists(save_dir):
-                        os.makedirs(save_dir)
+                    # 解析响应数据
+                    records = parse_play_histories(r.content)
                     
-                    # 生成文件名（使用时间戳）
-                    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                    filename = f'history_{timestamp}.json'
-                    filepath = os.path.join(save_dir, filename)
+                    # 原始响应按内容哈希压缩归档，相同内容只保存一份
+                    captured_at = datetime.now()
+                    history_archive.store(r.content, self.account_id, captured_at, content_hash)
+                    print(f"历史记录已归档: {content_hash[:12]}")
                     
-                    # 获取响应数据
-                    data = r.json()
-                    
-                    # 保存数据到JSON文件
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        json.dump(data, f, ensure_ascii=False, indent=2)
-                    print(f"历史记录已保存到: {filepath}")
-                    
-                    # 保存数据到数据库
-                    if save_to_database(data):
-                        print("数据已成功保存到数据库")
-                    else:
+                    # 保存数据到数据库，成功后才记录内容哈希，失败时下次仍会重新写入
+                    if not save_to_database(records, stats, self.account_id, captured_at):
                         print("保存数据到数据库失败")
+                        if stats is not None:
+                            stats['error'] = "保存数据到数据库失败"
+                        return None
+                    save_fetch_state(
+                        self.account_id,
+                        r.headers.get('ETag'),
+                        r.headers.get('Last-Modified'),
+                        content_hash,
+                        changed=True
+                    )
+                    print("数据已成功保存到数据库")
                     
                     # 打印简要信息（优先使用中文名称）
-                    games = get_game_list_with_cn_names()
+                    games = get_game_list_with_cn_names(self.account_id)
                     if games:
                         history_count = len(games)
                         print(f"\n共找到 {history_count} 条游戏记录")
                         for i, (title_id, display_name, days) in enumerate(games[:5]):  # 显示前5条记录
                             print(f"- {display_name}: {days} 天")
                 except Exception as e:
+                    # 解析、归档或入库失败时本次收集没有写入数据，返回 None 让调用方记录为失败
                     logger.error(f"保存历史记录失败: {str(e)}")
                     print(f"保存历史记录失败: {str(e)}")
-            elif r.status_code == 401:  # token 失效
+                    if stats is not None:
+                        stats['error'] = f"保存历史记录失败: {str(e)}"
+                    return None
+            elif r.status_code == 401:  # 刷新后仍然失效，会话令牌已被撤销
                 logger.warning("访问令牌已失效，需要重新登录")
-                print("token 已失效，需要重新登录")
-                # 删除失效的 token
-                if os.path.exists(self.token_file):
-                    try:
-                        os.remove(self.token_file)
-                    except OSError as e:
-                        logger.error(f"删除 token 文件失败: {str(e)}")
+                print("token 已失效，需要重新运行 python get_switch_data.py 登录")
                 return None
             else:
                 logger.error(f"获取历史记录失败，状态码: {r.status_code}")
@@ -561,6 +1187,32 @@ class nsession:
             print(f"请求失败: {str(e)}")
             return None
  
+def prepare_session(ns):
+    """确保 nsession 持有可用的访问令牌，需要时刷新或引导登录"""
+    # 修改逻辑：先检查是否有session_token（长期有效），无论access_token是否有效
+    if hasattr(ns, 'session_token') and ns.session_token:
+        # 有session_token时只根据保存的过期时间判断是否需要刷新access_token，
+        # 令牌被提前撤销的情况由 get_history 在收到 401 时刷新重试
+        if not ns.ensure_access_token():
+            print("刷新访问令牌失败")
+            return False
+    else:
+        # 没有session_token，需要完整登录流程
+        session_token = ns.log_in()
+        if not session_token:
+            print("登录失败")
+            return False
+            
+        if session_token == "skip":
+            print("已跳过登录")
+            return False
+            
+        access_token = ns.get_access_token()
+        if not access_token:
+            print("获取访问令牌失败")
+            return False
+    return True
+
 def main():
     try:
         print("Nintendo Switch 游戏记录追踪工具")
@@ -569,33 +1221,27 @@ def main():
         if not init_database():
             print("初始化数据库失败，程序将退出")
             return
-            
-        ns = nsession()
         
-        # 修改逻辑：先检查是否有session_token（长期有效），无论access_token是否有效
-        if hasattr(ns, 'session_token') and ns.session_token:
-            # 有session_token但access_token无效，直接刷新access_token
-            if not ns.check_tokens_valid():
-                print("访问令牌已过期，正在刷新...")
-                access_token = ns.get_access_token()
-                if not access_token:
-                    print("刷新访问令牌失败")
-                    return
-        else:
-            # 没有session_token，需要完整登录流程
-            session_token = ns.log_in()
-            if not session_token:
-                print("登录失败")
-                return
-                
-            if session_token == "skip":
-                print("已跳过登录")
+        # 处理命令行参数
+        if len(sys.argv) > 1:
+            command = sys.argv[1].lower()
+            if command == "compact":
+                compact_game_history()
                 return
-                
-            access_token = ns.get_access_token()
-            if not access_token:
-                print("获取访问令牌失败")
+            if command == "login" and len(sys.argv) > 2:
+                # 添加或重新登录其他账号，之后 daily_collect.py 会一并收集
+                if not re.fullmatch(r'[A-Za-z0-9_-]+', sys.argv[2]):
+                    print("账号名只能包含字母、数字、下划线和连字符")
+                    return
+                ns = nsession(account_id=sys.argv[2])
+            else:
+                print("未知命令。可用命令: compact, login <账号名>")
                 return
+        else:
+            ns = nsession()
+        
+        if not prepare_session(ns):
+            return
         
         # 获取游戏历史
         if hasattr(ns, 'access_token') and ns.access_token:
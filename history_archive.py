@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Switch Tracker 原始响应归档
+替代 history_data/ 中每次收集都写入一份的格式化 JSON 文件：
+
+- 按响应内容的 sha256 寻址，相同的响应只保存一份
+- 每份响应单独压缩（默认 lzma；安装 zstandard 后使用 zstd），任意一份都可以独立解压
+- index.jsonl 记录每次采集的时间、账号和对应的内容哈希，数据未变化的采集只追加一行索引
+- replay 命令把任意时间范围内的归档按采集时间顺序重新导入到一个新的数据库
+- rebuild 命令用进程池并行解析归档，合并后批量写入，用于结构变化或数据损坏后重建数据库
+
+用法:
+    python history_archive.py import [--remove]     # 把 history_data/ 中的旧文件导入归档
+    python history_archive.py list [--account kid]
+    python history_archive.py replay new.db [--from 2024-01-01] [--to 2024-12-31] [--account kid]
+    python history_archive.py rebuild new.db [--workers 4] [--from ...] [--to ...] [--account kid]
+"""
+
+import os
+import sys
+import json
+import lzma
+import glob
+import hashlib
+import time
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+import game_names
+from database import DEFAULT_ACCOUNT
+from play_records import parse_play_histories
+
+logger = logging.getLogger("history_archive")
+
+ARCHIVE_DIR = 'history_archive'
+OBJECTS_DIR = 'objects'
+INDEX_FILE = 'index.jsonl'
+# 旧版本保存的 JSON 文件目录，非默认账号保存在其子目录中
+LEGACY_HISTORY_DIR = 'history_data'
+
+ZSTD_LEVEL = 19
+LZMA_PRESET = 6
+
+# 扩展名对应的解压函数；读取时两种格式都支持，写入时使用当前环境可用的格式
+_DECOMPRESSORS = {'.xz': lzma.decompress}
+if zstandard is not None:
+    _DECOMPRESSORS['.zst'] = lambda data: zstandard.ZstdDecompressor().decompress(data)
+
+_index_lock = threading.Lock()
+
+
+def _compress(raw):
+    """返回 (扩展名, 压缩后的数据)"""
+    if zstandard is not None:
+        return '.zst', zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw)
+    return '.xz', lzma.compress(raw, preset=LZMA_PRESET)
+
+
+def _object_base(content_hash, archive_dir):
+    return os.path.join(archive_dir, OBJECTS_DIR, content_hash[:2], content_hash + '.json')
+
+
+def find_object(content_hash, archive_dir=ARCHIVE_DIR):
+    """返回内容哈希对应的归档文件路径，不存在时返回 None"""
+    base = _object_base(content_hash, archive_dir)
+    for extension in _DECOMPRESSORS:
+        if os.path.exists(base + extension):
+            return base + extension
+    return None
+
+
+def record_capture(content_hash, account_id=DEFAULT_ACCOUNT, captured_at=None, archive_dir=ARCHIVE_DIR):
+    """在索引中追加一次采集记录，内容本身需要已经归档"""
+    entry = {
+        'captured_at': (captured_at or datetime.now()).isoformat(timespec='seconds'),
+        'account_id': account_id,
+        'hash': content_hash,
+    }
+    with _index_lock:
+        os.makedirs(archive_dir, exist_ok=True)
+        with open(os.path.join(archive_dir, INDEX_FILE), 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+
+def store(raw, account_id=DEFAULT_ACCOUNT, captured_at=None, content_hash=None, archive_dir=ARCHIVE_DIR):
+    """归档一份原始响应并记录采集时间，内容已存在时只追加索引；返回内容哈希"""
+    if content_hash is None:
+        content_hash = hashlib.sha256(raw).hexdigest()
+    if find_object(content_hash, archive_dir) is None:
+        extension, compressed = _compress(raw)
+        path = _object_base(content_hash, archive_dir) + extension
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 先写临时文件再改名，中途失败不会留下不完整的归档
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(compressed)
+        os.replace(tmp_path, path)
+    record_capture(content_hash, account_id, captured_at, archive_dir)
+    return content_hash
+
+
+def load(content_hash, archive_dir=ARCHIVE_DIR):
+    """读取并解压一份归档的原始响应"""
+    path = find_object(content_hash, archive_dir)
+    if path is None:
+        raise FileNotFoundError(f"归档中不存在 {content_hash}")
+    with open(path, 'rb') as f:
+        data = f.read()
+    return _DECOMPRESSORS[os.path.splitext(path)[1]](data)
+
+
+def iter_captures(account_id=None, since=None, until=None, archive_dir=ARCHIVE_DIR):
+    """按采集时间顺序返回索引中的记录；since/until 为 ISO 格式的日期或时间（包含两端）"""
+    index_path = os.path.join(archive_dir, INDEX_FILE)
+    if not os.path.exists(index_path):
+        return []
+    entries = []
+    with open(index_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            if account_id is not None and entry['account_id'] != account_id:
+                continue
+            captured_at = entry['captured_at']
+            if since and captured_at < since:
+                continue
+            # 只给出日期时包含当天的所有采集
+            if until and captured_at[:len(until)] > until:
+                continue
+            entries.append(entry)
+    entries.sort(key=lambda entry: entry['captured_at'])
+    return entries
+
+
+def distinct_captures(entries):
+    """跳过同一账号连续多次采集到的相同内容，返回 (需要导入的记录, 跳过的数量)"""
+    previous = {}
+    distinct = []
+    for entry in entries:
+        if previous.get(entry['account_id']) == entry['hash']:
+            continue
+        previous[entry['account_id']] = entry['hash']
+        distinct.append(entry)
+    return distinct, len(entries) - len(distinct)
+
+
+def replay(db_file, account_id=None, since=None, until=None, archive_dir=ARCHIVE_DIR):
+    """把归档的快照按采集时间顺序逐个通过 save_to_database 导入到 db_file，
+    返回 (导入的快照数, 跳过的重复快照数)"""
+    import database
+    import get_switch_data
+
+    database.close_all_connections()
+    database.DB_FILE = db_file
+    if not get_switch_data.init_database():
+        raise RuntimeError(f"初始化数据库 {db_file} 失败")
+
+    entries, skipped = distinct_captures(iter_captures(account_id, since, until, archive_dir))
+    for entry in entries:
+        records = parse_play_histories(load(entry['hash'], archive_dir))
+        collected_at = datetime.fromisoformat(entry['captured_at'])
+        if not get_switch_data.save_to_database(records, account_id=entry['account_id'], collected_at=collected_at):
+            raise RuntimeError(f"导入 {entry['captured_at']} 的快照失败")
+    database.close_all_connections()
+    return len(entries), skipped
+
+
+def parse_snapshot(content_hash, archive_dir=ARCHIVE_DIR):
+    """解压并解析一份快照，返回 (游戏行列表, 每日记录行列表, 无效记录数)
+
+    在进程池中运行，返回元组而不是记录对象以减少进程间传输的数据量
+    """
+    records = parse_play_histories(load(content_hash, archive_dir))
+    return (
+        [game.as_row() for game in records.games],
+        [day.as_row() for day in records.daily],
+        records.invalid,
+    )
+
+
+def merge_snapshots(entries, parsed):
+    """按采集时间顺序合并快照，得到与逐个 save_to_database 相同的最终结果
+
+    返回 (games 行, game_history 行, game_latest 行, daily_play 行)
+    """
+    games = {}
+    latest = {}
+    history_rows = []
+    daily = {}
+    for entry in entries:
+        account_id = entry['account_id']
+        collected_at = entry['captured_at']
+        snapshot_games, snapshot_daily, _ = parsed[entry['hash']]
+        for title_id, title_name, image_url, device_type, *totals in snapshot_games:
+            games[title_id] = (title_name, image_url, device_type)
+            snapshot = tuple(totals)
+            previous = latest.get((account_id, title_id))
+            if previous is None or previous[0] != snapshot:
+                # 只有总天数或总时长变化时才追加历史记录
+                if previous is None or previous[0][2:] != snapshot[2:]:
+                    history_rows.append((account_id, title_id) + snapshot + (collected_at,))
+                latest[(account_id, title_id)] = (snapshot, collected_at)
+        for title_id, played_date, played_minutes in snapshot_daily:
+            key = (account_id, title_id, played_date)
+            previous = daily.get(key)
+            if previous is None or previous[0] != played_minutes:
+                daily[key] = (played_minutes, collected_at)
+
+    return (
+        [(title_id,) + info for title_id, info in games.items()],
+        history_rows,
+        [key + snapshot + (collected_at,) for key, (snapshot, collected_at) in latest.items()],
+        [key + value for key, value in daily.items()],
+    )
+
+
+def rebuild(db_file, account_id=None, since=None, until=None, workers=None, archive_dir=ARCHIVE_DIR):
+    """用进程池并行解析归档，合并后在一个事务中批量写入 db_file，返回 (导入的快照数, 跳过的重复快照数)
+
+    写入前先删除各表的二级索引，数据写完后再重新创建，比逐行维护索引快得多；
+    删除和重建索引与写入数据在同一个事务中，中途失败时索引和数据一并回滚
+    """
+    import database
+    import get_switch_data
+
+    database.close_all_connections()
+    database.DB_FILE = db_file
+    if not get_switch_data.init_database():
+        raise RuntimeError(f"初始化数据库 {db_file} 失败")
+
+    entries, skipped = distinct_captures(iter_captures(account_id, since, until, archive_dir))
+    hashes = list(dict.fromkeys(entry['hash'] for entry in entries))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunksize = max(1, len(hashes) // ((workers or os.cpu_count() or 1) * 4))
+        parsed = dict(zip(hashes, executor.map(
+            parse_snapshot, hashes, [archive_dir] * len(hashes), chunksize=chunksize
+        )))
+    invalid = sum(snapshot[2] for snapshot in parsed.values())
+    if invalid:
+        logger.warning(f"归档中共有 {invalid} 条无效记录被丢弃")
+    games, history_rows, latest_rows, daily_rows = merge_snapshots(entries, parsed)
+
+    conn = database.get_connection()
+    try:
+        # DROP INDEX 不会自动开启事务，需要显式开始，否则每条语句都会单独提交
+        conn.execute('BEGIN IMMEDIATE')
+        indexes = conn.execute('''
+        SELECT name, sql FROM sqlite_master
+        WHERE type = 'index' AND sql IS NOT NULL
+          AND tbl_name IN ('game_history', 'game_latest', 'daily_play')
+        ''').fetchall()
+        for name, _ in indexes:
+            conn.execute(f'DROP INDEX {name}')
+
+        conn.executemany('''
+        INSERT INTO games (title_id, title_name, image_url, device_type)
+        VALUES (?, ?, ?, ?)
+        ''', games)
+        conn.executemany('''
+        INSERT INTO game_history (
+            account_id, title_id, first_played_at, last_played_at,
+            total_played_days, total_played_minutes, collected_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', history_rows)
+        conn.executemany('''
+        INSERT INTO game_latest (
+            account_id, title_id, first_played_at, last_played_at,
+            total_played_days, total_played_minutes, collected_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', latest_rows)
+        conn.executemany('''
+        INSERT INTO daily_play (account_id, title_id, played_date, played_minutes, collected_at)
+        VALUES (?, ?, ?, ?, ?)
+        ''', daily_rows)
+
+        for _, sql in indexes:
+            conn.execute(sql)
+        get_switch_data.rebuild_play_rollups(conn)
+        game_names.refresh_search_index(conn)
+        database.bump_data_version(conn)
+        database.bump_names_version(conn)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+        database.close_all_connections()
+    return len(entries), skipped
+
+
+def import_history_files(directory=LEGACY_HISTORY_DIR, remove=False, archive_dir=ARCHIVE_DIR):
+    """把旧版本保存的 history_<时间>.json 文件导入归档，返回导入的文件数"""
+    imported = 0
+    paths = glob.glob(os.path.join(directory, 'history_*.json'))
+    paths += glob.glob(os.path.join(directory, '*', 'history_*.json'))
+    for path in sorted(paths):
+        parent = os.path.dirname(path)
+        account_id = DEFAULT_ACCOUNT if os.path.samefile(parent, directory) else os.path.basename(parent)
+        try:
+            captured_at = datetime.strptime(os.path.basename(path), 'history_%Y%m%d_%H%M%S.json')
+        except ValueError:
+            logger.warning(f"无法从文件名解析采集时间，跳过: {path}")
+            continue
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        # 原始响应已经无法还原，统一编码为紧凑 JSON 后归档
+        raw = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        store(raw, account_id, captured_at, archive_dir=archive_dir)
+        imported += 1
+        if remove:
+            os.remove(path)
+    return imported
+
+
+def archive_size(archive_dir=ARCHIVE_DIR):
+    """返回 (归档对象数, 占用字节数)"""
+    objects = glob.glob(os.path.join(archive_dir, OBJECTS_DIR, '*', '*'))
+    return len(objects), sum(os.path.getsize(path) for path in objects)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Switch Tracker 原始响应归档')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    import_parser = subparsers.add_parser('import', help='导入 history_data/ 中的旧文件')
+    import_parser.add_argument('--directory', default=LEGACY_HISTORY_DIR)
+    import_parser.add_argument('--remove', action='store_true', help='导入后删除旧文件')
+
+    list_parser = subparsers.add_parser('list', help='列出归档的采集记录')
+    list_parser.add_argument('--account')
+
+    replay_parser = subparsers.add_parser('replay', help='把归档重新导入到新的数据库')
+    replay_parser.add_argument('db_file')
+    replay_parser.add_argument('--from', dest='since', help='起始日期或时间，如 2024-01-01')
+    replay_parser.add_argument('--to', dest='until', help='结束日期或时间（包含）')
+    replay_parser.add_argument('--account')
+
+    rebuild_parser = subparsers.add_parser('rebuild', help='并行解析归档并批量重建数据库')
+    rebuild_parser.add_argument('db_file')
+    rebuild_parser.add_argument('--from', dest='since', help='起始日期或时间，如 2024-01-01')
+    rebuild_parser.add_argument('--to', dest='until', help='结束日期或时间（包含）')
+    rebuild_parser.add_argument('--account')
+    rebuild_parser.add_argument('--workers', type=int, help='解析归档的进程数，默认为 CPU 核数')
+
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        imported = import_history_files(args.directory, args.remove)
+        objects, size = archive_size()
+        print(f"已导入 {imported} 个文件，归档中共 {objects} 份不同的响应，占用 {size / 1024:.1f} KiB")
+    elif args.command == 'list':
+        for entry in iter_captures(args.account):
+            print(f"{entry['captured_at']}  {entry['account_id'] or '默认':<12}{entry['hash'][:12]}")
+    elif args.command in ('replay', 'rebuild'):
+        if os.path.exists(args.db_file):
+            print(f"{args.db_file} 已存在，请指定一个新的数据库文件")
+            return 1
+        start = time.perf_counter()
+        if args.command == 'replay':
+            replayed, skipped = replay(args.db_file, args.account, args.since, args.until)
+        else:
+            replayed, skipped = rebuild(args.db_file, args.account, args.since, args.until, args.workers)
+        elapsed = time.perf_counter() - start
+        print(f"已导入 {replayed} 个快照到 {args.db_file}，跳过 {skipped} 个重复快照，"
+              f"耗时 {elapsed:.2f} 秒（{replayed / elapsed:.1f} 快照/秒）")
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    sys.exit(main())
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Switch Tracker play_histories 数据解析
+把接口返回的 JSON 解析为紧凑的类型化记录，入库和归档重建都直接使用解析结果：
+
+- GameRecord / DailyRecord 使用 __slots__，不为每条记录保留完整的嵌套字典
+- 安装 orjson 时使用它解码 JSON，否则使用标准库 json
+- 类型不符合预期的记录会被丢弃，并按 "字段路径" 计数，而不是以 NULL 的形式进入数据库
+"""
+
+import re
+import json
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_PLAYED_DATE = re.compile(r'\d{4}-\d{2}-\d{2}')
+
+
+def loads(raw):
+    """解码 JSON，安装了 orjson 时使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+@dataclass
+class GameRecord:
+    """playHistories 中的一款游戏"""
+
+    __slots__ = (
+        'title_id', 'title_name', 'image_url', 'device_type',
+        'first_played_at', 'last_played_at', 'total_played_days', 'total_played_minutes',
+    )
+    title_id: str
+    title_name: str
+    image_url: str
+    device_type: str
+    first_played_at: str
+    last_played_at: str
+    total_played_days: int
+    total_played_minutes: int
+
+    def as_row(self):
+        """按 staging_games 的列顺序返回元组"""
+        return (
+            self.title_id, self.title_name, self.image_url, self.device_type,
+            self.first_played_at, self.last_played_at, self.total_played_days, self.total_played_minutes,
+        )
+
+
+@dataclass
+class DailyRecord:
+    """recentPlayHistories 中某一天某款游戏的游玩时长"""
+
+    __slots__ = ('title_id', 'played_date', 'played_minutes')
+    title_id: str
+    played_date: str
+    played_minutes: int
+
+    def as_row(self):
+        return (self.title_id, self.played_date, self.played_minutes)
+
+
+class PlayHistories:
+    """一次 play_histories 响应的解析结果"""
+
+    __slots__ = ('games', 'daily', 'errors')
+
+    def __init__(self, games, daily, errors):
+        self.games = games
+        self.daily = daily
+        # Counter：字段路径 -> 被丢弃的记录数
+        self.errors = errors
+
+    @property
+    def invalid(self):
+        return sum(self.errors.values())
+
+
+def _is_text(value, required=False):
+    if value is None:
+        return not required
+    return isinstance(value, str) and (value != '' or not required)
+
+
+def _is_count(value):
+    # bool 是 int 的子类，需要单独排除
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def _is_played_date(value):
+    """YYYY-MM-DD 开头（之后可以带时间和时区）且是真实存在的日期"""
+    if not isinstance(value, str) or not _PLAYED_DATE.match(value):
+        return False
+    try:
+        date.fromisoformat(value[:10])
+    except ValueError:
+        return False
+    return True
+
+
+def _parse_game(game, errors):
+    if not isinstance(game, dict):
+        errors['playHistories'] += 1
+        return None
+    title_id = game.get('titleId')
+    checks = (
+        ('titleId', _is_text(title_id, required=True)),
+        ('titleName', _is_text(game.get('titleName'), required=True)),
+        ('imageUrl', _is_text(game.get('imageUrl'))),
+        ('deviceType', _is_text(game.get('deviceType'))),
+        ('firstPlayedAt', _is_text(game.get('firstPlayedAt'))),
+        ('lastPlayedAt', _is_text(game.get('lastPlayedAt'))),
+        ('totalPlayedDays', _is_count(game.get('totalPlayedDays'))),
+        ('totalPlayedMinutes', _is_count(game.get('totalPlayedMinutes'))),
+    )
+    for field, ok in checks:
+        if not ok:
+            errors[f'playHistories.{field}'] += 1
+            return None
+    return GameRecord(
+        title_id,
+        game['titleName'],
+        game.get('imageUrl'),
+        game.get('deviceType'),
+        game.get('firstPlayedAt'),
+        game.get('lastPlayedAt'),
+        game['totalPlayedDays'],
+        game['totalPlayedMinutes'],
+    )
+
+
+def parse_play_histories(payload):
+    """解析 play_histories 响应（bytes/str 或已解码的字典），返回 PlayHistories
+
+    同一响应中重复的游戏或 (游戏, 日期) 以最后一条为准；游玩时长为 0 的每日记录不保留
+    """
+    if isinstance(payload, (bytes, bytearray, str)):
+        payload = loads(payload)
+    errors = Counter()
+    if not isinstance(payload, dict):
+        errors['root'] += 1
+        return PlayHistories([], [], errors)
+
+    games = {}
+    for game in payload.get('playHistories') or []:
+        record = _parse_game(game, errors)
+        if record is not None:
+            games[record.title_id] = record
+
+    daily = {}
+    for day_record in payload.get('recentPlayHistories') or []:
+        played_date = day_record.get('playedDate') if isinstance(day_record, dict) else None
+        if not _is_played_date(played_date):
+            errors['recentPlayHistories.playedDate'] += 1
+            continue
+        for game in day_record.get('dailyPlayHistories') or []:
+            if not isinstance(game, dict) or not _is_text(game.get('titleId'), required=True):
+                errors['dailyPlayHistories.titleId'] += 1
+                continue
+            played_minutes = game.get('totalPlayedMinutes', 0)
+            if not _is_count(played_minutes):
+                errors['dailyPlayHistories.totalPlayedMinutes'] += 1
+                continue
+            if played_minutes > 0:
+                daily[(game['titleId'], played_date)] = DailyRecord(game['titleId'], played_date, played_minutes)
+
+    return PlayHistories(list(games.values()), list(daily.values()), errors)
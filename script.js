@@ -1,6 +1,3 @@
-// 全局变量
-let gameData = null;
-
 // 页面加载完成后执行
 document.addEventListener('DOMContentLoaded', function() {
     // 初始化标签页切换
@@ -12,16 +9,17 @@ document.addEventListener('DOMContentLoaded', function() {
     // 绑定刷新按钮事件
     document.getElementById('refresh-data').addEventListener('click', function() {
         loadGameData(true);
+        loadDailyPlayData();
     });
     
     // 绑定游戏搜索事件
     document.getElementById('game-search').addEventListener('input', function() {
-        filterGames(this.value);
+        filterGames();
     });
     
     // 绑定游戏排序事件
     document.getElementById('sort-games').addEventListener('change', function() {
-        sortGames(this.value);
+        sortGames();
     });
     
     // 初始化游戏日历
@@ -63,73 +61,94 @@ function initTabSwitching() {
     });
 }
 
+// 获取JSON数据，HTTP状态码不是2xx时抛出错误
+function fetchJson(url) {
+    return fetch(url).then(response => {
+        if (!response.ok) {
+            throw new Error(`HTTP error! Status: ${response.status}`);
+        }
+        return response.json();
+    });
+}
+
+// 转换API返回的游戏数据格式以兼容旧代码
+function toPlayHistory(game) {
+    return {
+        titleId: game.title_id,
+        titleName: game.name,
+        originalName: game.original_name, 
+        imageUrl: game.image_url,
+        deviceType: game.device_type,
+        firstPlayedAt: game.first_played_at,
+        lastPlayedAt: game.last_played_at,
+        totalPlayedDays: game.total_played_days,
+        totalPlayedMinutes: game.total_played_minutes
+    };
+}
+
+// 用 /api/dashboard 的数据绘制首屏：汇总卡片、图表和最近活动
+function renderDashboard(dashboard) {
+    const topGames = dashboard.top_games.map(toPlayHistory);
+    updateOverview(dashboard.summary, topGames, dashboard.recentPlayHistories);
+    updatePeriodCards(dashboard.summary);
+    createMonthlyChart(dashboard.monthly);
+    createTopGamesChart(topGames);
+    updateRecentActivity(dashboard.recentPlayHistories);
+    updateRecentTab(dashboard.recentPlayHistories);
+}
+
+// 使用本地缓存的数据更新页面
+function renderCachedData(data) {
+    updateLastUpdated(data.lastUpdatedAt);
+    renderDashboard(data.dashboard);
+    updateGamesList(data.playHistories);
+}
+
 // 加载游戏数据
 function loadGameData(forceRefresh = false) {
     const lastUpdated = localStorage.getItem('lastUpdated');
     const cachedData = localStorage.getItem('gameData');
+    const cached = cachedData ? JSON.parse(cachedData) : null;
+    // 旧版本缓存的数据中没有 dashboard，视为没有缓存
+    const hasCache = cached && cached.dashboard;
     
     // 如果强制刷新，或者没有缓存数据，或者缓存已过期（24小时），则从服务器获取数据
-    if (forceRefresh || !cachedData || !lastUpdated || (Date.now() - parseInt(lastUpdated)) > 24 * 60 * 60 * 1000) {
+    if (forceRefresh || !hasCache || !lastUpdated || (Date.now() - parseInt(lastUpdated)) > 24 * 60 * 60 * 1000) {
         document.getElementById('loading-indicator').style.display = 'flex';
         
+        // 日历数据同样重新获取
+        calendarYearCache.clear();
+        
         // 确保API请求绝对路径
         const baseUrl = window.location.origin;
         
-        // 使用Promise.all同时获取游戏数据和最近活动
+        // 首屏需要的数据由 /api/dashboard 一次返回，收到后立即绘制；
+        // 完整的游戏列表只用于“游戏”标签页，同时请求但不阻塞首屏
         Promise.all([
-            fetch(`${baseUrl}/api/games`).then(response => {
-                if (!response.ok) {
-                    throw new Error(`HTTP error! Status: ${response.status}`);
-                }
-                return response.json();
+            fetchJson(`${baseUrl}/api/dashboard`).then(dashboard => {
+                renderDashboard(dashboard);
+                document.getElementById('loading-indicator').style.display = 'none';
+                return dashboard;
             }),
-            fetch(`${baseUrl}/api/recent_activities`).then(response => {
-                if (!response.ok) {
-                    throw new Error(`HTTP error! Status: ${response.status}`);
-                }
-                return response.json();
-            })
+            fetchJson(`${baseUrl}/api/games`)
         ])
-        .then(([gamesData, recentData]) => {
-            // 添加更多调试日志
-            console.log('原始API数据:', { gamesData, recentData });
-            
-            // 转换游戏数据格式以兼容旧代码
-            const playHistories = gamesData.map(game => ({
-                titleId: game.title_id,
-                titleName: game.name,
-                originalName: game.original_name, 
-                imageUrl: game.image_url,
-                deviceType: game.device_type,
-                firstPlayedAt: game.first_played_at,
-                lastPlayedAt: game.last_played_at,
-                totalPlayedDays: game.total_played_days,
-                totalPlayedMinutes: game.total_played_minutes
-            }));
-            
-            // 合并数据
+        .then(([dashboard, gamesData]) => {
             const combinedData = {
-                playHistories: playHistories,
-                recentPlayHistories: recentData.recentPlayHistories || [],
+                dashboard: dashboard,
+                playHistories: gamesData.map(toPlayHistory),
                 lastUpdatedAt: new Date().toISOString()
             };
             
-            console.log('处理后的数据:', combinedData);
-            console.log('游戏列表:', combinedData.playHistories.length, '条记录');
-            console.log('最近活动:', combinedData.recentPlayHistories.length, '条记录');
-            
             // 缓存数据
             localStorage.setItem('gameData', JSON.stringify(combinedData));
             localStorage.setItem('lastUpdated', Date.now().toString());
             
-            // 更新UI
             updateLastUpdated(combinedData.lastUpdatedAt);
-            updateOverview(combinedData);
-            updateRecentActivity(combinedData.recentPlayHistories);
-            updateRecentTab(combinedData.recentPlayHistories);
             updateGamesList(combinedData.playHistories);
-            
-            document.getElementById('loading-indicator').style.display = 'none';
+            // 刷新前设置了搜索或排序时，按当前条件重新获取游戏列表
+            if (isGamesListFiltered()) {
+                loadGamesList();
+            }
             console.log('数据加载成功', combinedData);
         })
         .catch(error => {
@@ -137,14 +156,9 @@ function loadGameData(forceRefresh = false) {
             document.getElementById('loading-indicator').style.display = 'none';
             
             // 如果API请求失败但有本地缓存数据，回退到本地缓存
-            if (cachedData) {
+            if (hasCache) {
                 console.log('使用缓存数据');
-                const data = JSON.parse(cachedData);
-                updateLastUpdated(data.lastUpdatedAt);
-                updateOverview(data);
-                updateRecentActivity(data.recentPlayHistories);
-                updateRecentTab(data.recentPlayHistories);
-                updateGamesList(data.playHistories);
+                renderCachedData(cached);
             } else {
                 // 显示一个错误消息
                 alert('无法加载游戏数据，请确保您已运行数据获取脚本');
@@ -152,12 +166,7 @@ function loadGameData(forceRefresh = false) {
         });
     } else {
         // 使用缓存数据
-        const data = JSON.parse(cachedData);
-        updateLastUpdated(data.lastUpdatedAt);
-        updateOverview(data);
-        updateRecentActivity(data.recentPlayHistories);
-        updateRecentTab(data.recentPlayHistories);
-        updateGamesList(data.playHistories);
+        renderCachedData(cached);
     }
 }
 
@@ -169,256 +178,149 @@ function updateLastUpdated(timestamp) {
 }
 
 // 更新概览页面
-function updateOverview(data) {
+function updateOverview(summary, topGames, recentHistories) {
     // 更新总游戏数
-    document.getElementById('total-games').textContent = data.playHistories.length;
+    document.getElementById('total-games').textContent = summary.game_count;
     
-    // 计算总游玩时间
-    const totalMinutes = data.playHistories.reduce((total, game) => total + game.totalPlayedMinutes, 0);
+    // 总游玩时间
+    const totalMinutes = summary.total_minutes;
     const totalHours = Math.floor(totalMinutes / 60);
     document.getElementById('total-playtime').textContent = `${totalHours}小时${totalMinutes % 60}分钟`;
     
-    // 找出游玩时间最长的游戏
-    const mostPlayedGame = data.playHistories.reduce((prev, current) => 
-        (prev.totalPlayedMinutes > current.totalPlayedMinutes) ? prev : current
-    );
-    
-    document.getElementById('most-played-game').textContent = mostPlayedGame.titleName;
-    const mostPlayedHours = Math.floor(mostPlayedGame.totalPlayedMinutes / 60);
-    document.getElementById('most-played-time').textContent = 
-        `${mostPlayedHours}小时${mostPlayedGame.totalPlayedMinutes % 60}分钟`;
+    // 游玩时间最长的游戏（服务器已按游玩时间排序）
+    const mostPlayedGame = topGames[0];
+    if (mostPlayedGame) {
+        document.getElementById('most-played-game').textContent = mostPlayedGame.titleName;
+        const mostPlayedHours = Math.floor(mostPlayedGame.totalPlayedMinutes / 60);
+        document.getElementById('most-played-time').textContent = 
+            `${mostPlayedHours}小时${mostPlayedGame.totalPlayedMinutes % 60}分钟`;
+    }
     
     // 创建游玩时间分布图表
-    createPlaytimeChart(data.playHistories);
-    
-    // 加载每周和每月游玩时间以及相关图表
-    loadPeriodStats(data);
+    createPlaytimeChart(recentHistories, topGames);
 }
 
-// 新增函数：加载周期性统计数据和图表
-function loadPeriodStats(data) {
-    // 确保API请求绝对路径
-    const baseUrl = window.location.origin;
-    
-    // 请求每日游玩时间数据
-    fetch(`${baseUrl}/api/history`)
-        .then(response => response.json())
-        .then(historyData => {
-            // 添加调试信息
-            console.log('历史数据详情:', historyData);
-            
-            // 计算本周和本月游玩时间
-            const now = new Date();
-            
-            // 计算本周开始日期（周日为一周的开始）
-            const startOfWeek = new Date(now);
-            startOfWeek.setDate(now.getDate() - now.getDay());
-            startOfWeek.setHours(0, 0, 0, 0);
-            
-            // 计算本月开始日期
-            const startOfMonth = new Date(now.getFullYear(), now.getMonth(), 1);
-            
-            // 初始化统计数据
-            let weeklyMinutes = 0;
-            let monthlyMinutes = 0;
-            
-            // 统计每一天的游玩时间
-            historyData.forEach(day => {
-                const dayDate = new Date(day.date);
-                const totalMinutes = day.games ? day.games.reduce((sum, game) => sum + game.minutes, 0) : day.total_minutes || 0;
-                
-                // 统计本周时间
-                if (dayDate >= startOfWeek) {
-                    weeklyMinutes += totalMinutes;
-                }
-                
-                // 统计本月时间
-                if (dayDate >= startOfMonth) {
-                    monthlyMinutes += totalMinutes;
-                }
-            });
-            
-            // 更新本周游玩时间
-            const weeklyHours = Math.floor(weeklyMinutes / 60);
-            const weeklyRemainingMinutes = weeklyMinutes % 60;
-            document.getElementById('current-week-time').textContent = 
-                `${weeklyHours}小时${weeklyRemainingMinutes > 0 ? weeklyRemainingMinutes + '分钟' : ''}`;
-            
-            // 更新本月游玩时间
-            const monthlyHours = Math.floor(monthlyMinutes / 60);
-            const monthlyRemainingMinutes = monthlyMinutes % 60;
-            document.getElementById('current-month-time').textContent = 
-                `${monthlyHours}小时${monthlyRemainingMinutes > 0 ? monthlyRemainingMinutes + '分钟' : ''}`;
-            
-            // 创建月度游玩时间图表
-            createMonthlyChart(historyData);
-            
-            // 创建游玩时间最长的游戏图表
-            createTopGamesChart(data.playHistories);
-        })
-        .catch(error => {
-            console.error('加载统计数据失败:', error);
-            // 提供默认值
-            document.getElementById('current-week-time').textContent = '数据加载失败';
-            document.getElementById('current-month-time').textContent = '数据加载失败';
-        });
+// 更新本周（ISO周，周一为一周的开始）和本月游玩时间
+function updatePeriodCards(summary) {
+    const weeklyMinutes = summary.week.minutes;
+    const weeklyHours = Math.floor(weeklyMinutes / 60);
+    const weeklyRemainingMinutes = weeklyMinutes % 60;
+    document.getElementById('current-week-time').textContent = 
+        `${weeklyHours}小时${weeklyRemainingMinutes > 0 ? weeklyRemainingMinutes + '分钟' : ''}`;
+    
+    const monthlyMinutes = summary.month.minutes;
+    const monthlyHours = Math.floor(monthlyMinutes / 60);
+    const monthlyRemainingMinutes = monthlyMinutes % 60;
+    document.getElementById('current-month-time').textContent = 
+        `${monthlyHours}小时${monthlyRemainingMinutes > 0 ? monthlyRemainingMinutes + '分钟' : ''}`;
 }
 
 // 创建游玩时间分布图表
-function createPlaytimeChart(games) {
-    // 确保API请求绝对路径
-    const baseUrl = window.location.origin;
-    
-    // 请求最近活动数据获取最近一周的游戏数据
-    fetch(`${baseUrl}/api/recent_activities`)
-        .then(response => response.json())
-        .then(recentData => {
-            // 添加调试日志
-            console.log('最近游玩数据原始格式:', recentData);
-            
-            // 处理最近一周的游戏数据
-            let recentGames = [];
-            let gamePlaytimes = {};
-            
-            // 检查数据格式
-            if (Array.isArray(recentData)) {
-                // 标准格式：数组中包含每天的记录
-                recentData.forEach(day => {
-                    if (day.dailyPlayHistories && Array.isArray(day.dailyPlayHistories)) {
-                        day.dailyPlayHistories.forEach(game => {
-                            if (gamePlaytimes[game.titleId]) {
-                                gamePlaytimes[game.titleId].totalPlayedMinutes += game.totalPlayedMinutes;
-                            } else {
-                                gamePlaytimes[game.titleId] = {
-                                    titleId: game.titleId,
-                                    titleName: game.titleName,
-                                    imageUrl: game.imageUrl,
-                                    totalPlayedMinutes: game.totalPlayedMinutes
-                                };
-                            }
-                        });
-                    }
-                });
-            } else if (recentData && recentData.recentPlayHistories && Array.isArray(recentData.recentPlayHistories)) {
-                // 兼容旧格式
-                recentData.recentPlayHistories.forEach(day => {
-                    if (day.dailyPlayHistories && Array.isArray(day.dailyPlayHistories)) {
-                        day.dailyPlayHistories.forEach(game => {
-                            if (gamePlaytimes[game.titleId]) {
-                                gamePlaytimes[game.titleId].totalPlayedMinutes += game.totalPlayedMinutes;
-                            } else {
-                                gamePlaytimes[game.titleId] = {
-                                    titleId: game.titleId,
-                                    titleName: game.titleName,
-                                    imageUrl: game.imageUrl,
-                                    totalPlayedMinutes: game.totalPlayedMinutes
-                                };
-                            }
-                        });
-                    }
-                });
-            }
-            
-            // 转换为数组并排序
-            recentGames = Object.values(gamePlaytimes);
-            
-            console.log('处理后的游戏数据:', recentGames);
-            
-            // 检查是否有数据
-            if (recentGames.length === 0) {
-                console.log('没有找到最近游玩数据，使用全部游戏数据回退');
-                fallbackToAllGamesChart(games);
-                return;
-            }
-            
-            // 按游玩时间排序
-            recentGames.sort((a, b) => b.totalPlayedMinutes - a.totalPlayedMinutes);
-            
-            // 只取前5个游戏用于图表展示
-            const topGames = recentGames.slice(0, 5);
-            
-            const ctx = document.getElementById('playtime-chart').getContext('2d');
-            
-            // 销毁已存在的图表
-            if (window.playtimeChart) {
-                window.playtimeChart.destroy();
+function createPlaytimeChart(recentHistories, games) {
+    // 汇总最近一周每个游戏的游玩时间
+    const gamePlaytimes = {};
+    (recentHistories || []).forEach(day => {
+        (day.dailyPlayHistories || []).forEach(game => {
+            if (gamePlaytimes[game.titleId]) {
+                gamePlaytimes[game.titleId].totalPlayedMinutes += game.totalPlayedMinutes;
+            } else {
+                gamePlaytimes[game.titleId] = {
+                    titleId: game.titleId,
+                    titleName: game.titleName,
+                    imageUrl: game.imageUrl,
+                    totalPlayedMinutes: game.totalPlayedMinutes
+                };
             }
-            
-            // 获取游戏名和游戏时间
-            const gameNames = topGames.map(game => {
-                // 截断过长的游戏名，限制在12个字符
-                let name = game.titleName;
-                if (name.length > 12) {
-                    name = name.substring(0, 12) + '...';
-                }
-                return name;
-            });
-            
-            const gameTimes = topGames.map(game => Math.round(game.totalPlayedMinutes / 60 * 10) / 10);
-            
-            console.log('图表数据:', { gameNames, gameTimes });
-            
-            // 更改图表标题
-            document.querySelector('.chart-wrapper h3').innerHTML = '<i class="fas fa-chart-pie"></i> 最近游玩时间分布';
-            
-            window.playtimeChart = new Chart(ctx, {
-                type: 'bar',
-                data: {
-                    labels: gameNames,
-                    datasets: [{
-                        label: '游玩时间（小时）',
-                        data: gameTimes,
-                        backgroundColor: '#e60012', // Switch红色
-                        borderColor: '#e60012',
-                        borderWidth: 1,
-                        borderRadius: 4
-                    }]
+        });
+    });
+    
+    const recentGames = Object.values(gamePlaytimes);
+    
+    // 检查是否有数据
+    if (recentGames.length === 0) {
+        console.log('没有找到最近游玩数据，使用全部游戏数据回退');
+        fallbackToAllGamesChart(games);
+        return;
+    }
+    
+    // 按游玩时间排序
+    recentGames.sort((a, b) => b.totalPlayedMinutes - a.totalPlayedMinutes);
+    
+    // 只取前5个游戏用于图表展示
+    const topGames = recentGames.slice(0, 5);
+    
+    const ctx = document.getElementById('playtime-chart').getContext('2d');
+    
+    // 销毁已存在的图表
+    if (window.playtimeChart) {
+        window.playtimeChart.destroy();
+    }
+    
+    // 获取游戏名和游戏时间
+    const gameNames = topGames.map(game => {
+        // 截断过长的游戏名，限制在12个字符
+        let name = game.titleName;
+        if (name.length > 12) {
+            name = name.substring(0, 12) + '...';
+        }
+        return name;
+    });
+    
+    const gameTimes = topGames.map(game => Math.round(game.totalPlayedMinutes / 60 * 10) / 10);
+    
+    // 更改图表标题
+    document.querySelector('.chart-wrapper h3').innerHTML = '<i class="fas fa-chart-pie"></i> 最近游玩时间分布';
+    
+    window.playtimeChart = new Chart(ctx, {
+        type: 'bar',
+        data: {
+            labels: gameNames,
+            datasets: [{
+                label: '游玩时间（小时）',
+                data: gameTimes,
+                backgroundColor: '#e60012', // Switch红色
+                borderColor: '#e60012',
+                borderWidth: 1,
+                borderRadius: 4
+            }]
+        },
+        options: {
+            indexAxis: 'y',
+            plugins: {
+                legend: {
+                    display: false
                 },
-                options: {
-                    indexAxis: 'y',
-                    plugins: {
-                        legend: {
-                            display: false
-                        },
-                        tooltip: {
-                            callbacks: {
-                                title: function(context) {
-                                    // 在提示中显示完整游戏名
-                                    const gameIndex = context[0].dataIndex;
-                                    return topGames[gameIndex].titleName;
-                                },
-                                label: function(context) {
-                                    const value = context.raw;
-                                    const hours = Math.floor(value);
-                                    const minutes = Math.round((value - hours) * 60);
-                                    return `${hours}小时${minutes > 0 ? minutes + '分钟' : ''}`;
-                                }
-                            }
-                        }
-                    },
-                    scales: {
-                        x: {
-                            beginAtZero: true,
-                            grid: {
-                                display: false
-                            }
+                tooltip: {
+                    callbacks: {
+                        title: function(context) {
+                            // 在提示中显示完整游戏名
+                            const gameIndex = context[0].dataIndex;
+                            return topGames[gameIndex].titleName;
                         },
-                        y: {
-                            grid: {
-                                display: false
-                            }
+                        label: function(context) {
+                            const value = context.raw;
+                            const hours = Math.floor(value);
+                            const minutes = Math.round((value - hours) * 60);
+                            return `${hours}小时${minutes > 0 ? minutes + '分钟' : ''}`;
                         }
                     }
                 }
-            });
-        })
-        .catch(error => {
-            console.error('获取最近游玩数据失败:', error);
-            
-            // 失败时回退到使用所有游戏数据
-            console.log('API请求失败，使用全部游戏数据回退');
-            fallbackToAllGamesChart(games);
-        });
+            },
+            scales: {
+                x: {
+                    beginAtZero: true,
+                    grid: {
+                        display: false
+                    }
+                },
+                y: {
+                    grid: {
+                        display: false
+                    }
+                }
+            }
+        }
+    });
 }
 
 // 添加回退方法，使用所有游戏数据
@@ -779,79 +681,70 @@ function createGameItem(game) {
     return gameItem;
 }
 
-// 更新游戏列表
+// 更新游戏列表，按服务器返回的顺序显示
 function updateGamesList(games) {
     const gamesGrid = document.getElementById('games-grid');
     
     // 清空当前游戏列表
     gamesGrid.innerHTML = '';
     
-    // 默认按游玩时间排序
-    const sortedGames = [...games].sort((a, b) => b.totalPlayedMinutes - a.totalPlayedMinutes);
-    
     // 渲染游戏列表
-    sortedGames.forEach(game => {
+    games.forEach(game => {
         const gameItem = createGameItem(game);
         gamesGrid.appendChild(gameItem);
     });
-    
-    // 保存为全局变量以便后续操作
-    gameData = [...games];
 }
 
-// 游戏搜索过滤
-function filterGames(searchTerm) {
-    if (!gameData) return;
-    
-    // 如果搜索词为空，则显示所有游戏
-    if (!searchTerm.trim()) {
-        updateGamesList(gameData);
-        return;
+// 游戏标签页的排序选项对应 /api/games 的 sort 参数
+const GAME_SORT_OPTIONS = {
+    playtime: 'minutes',
+    recent: 'last_played',
+    name: 'name'
+};
+
+// 搜索框输入停顿后再请求，避免每个按键都发出请求
+const GAME_SEARCH_DELAY = 200;
+let gameSearchTimer = null;
+// 最近一次游戏列表请求的序号，较早的请求晚于新请求返回时丢弃其结果
+let gamesListRequest = 0;
+
+// 是否设置了搜索词或非默认的排序
+function isGamesListFiltered() {
+    return document.getElementById('game-search').value.trim() !== '' ||
+        document.getElementById('sort-games').value !== 'playtime';
+}
+
+// 按当前的搜索词和排序方式从服务器获取游戏列表，搜索、排序都在服务器端完成
+function loadGamesList() {
+    const searchTerm = document.getElementById('game-search').value.trim();
+    const sortOption = document.getElementById('sort-games').value;
+    const params = new URLSearchParams({ sort: GAME_SORT_OPTIONS[sortOption] || 'minutes' });
+    if (searchTerm) {
+        params.set('q', searchTerm);
     }
     
-    // 过滤游戏
-    const filteredGames = gameData.filter(game => 
-        game.titleName.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        (game.originalName && game.originalName.toLowerCase().includes(searchTerm.toLowerCase()))
-    );
-    
-    // 更新游戏列表
-    updateGamesList(filteredGames);
+    const requestId = ++gamesListRequest;
+    fetchJson(`${window.location.origin}/api/games?${params}`)
+        .then(games => {
+            if (requestId === gamesListRequest) {
+                updateGamesList(games.map(toPlayHistory));
+            }
+        })
+        .catch(error => {
+            console.error('获取游戏列表失败:', error);
+        });
+}
+
+// 游戏搜索过滤
+function filterGames() {
+    clearTimeout(gameSearchTimer);
+    gameSearchTimer = setTimeout(loadGamesList, GAME_SEARCH_DELAY);
 }
 
 // 游戏排序
-function sortGames(sortOption) {
-    if (!gameData) return;
-    
-    let sortedGames;
-    
-    switch (sortOption) {
-        case 'playtime':
-            sortedGames = [...gameData].sort((a, b) => b.totalPlayedMinutes - a.totalPlayedMinutes);
-            break;
-        case 'recent':
-            sortedGames = [...gameData].sort((a, b) => {
-                // 确保日期字符串格式一致进行比较
-                const dateA = a.lastPlayedAt ? new Date(a.lastPlayedAt) : new Date(0);
-                const dateB = b.lastPlayedAt ? new Date(b.lastPlayedAt) : new Date(0);
-                return dateB - dateA;
-            });
-            break;
-        case 'name':
-            sortedGames = [...gameData].sort((a, b) => a.titleName.localeCompare(b.titleName));
-            break;
-        default:
-            sortedGames = [...gameData];
-    }
-    
-    // 更新游戏列表显示
-    const gamesGrid = document.getElementById('games-grid');
-    gamesGrid.innerHTML = '';
-    
-    sortedGames.forEach(game => {
-        const gameItem = createGameItem(game);
-        gamesGrid.appendChild(gameItem);
-    });
+function sortGames() {
+    clearTimeout(gameSearchTimer);
+    loadGamesList();
 }
 
 // 更新统计页面
@@ -870,35 +763,12 @@ function updateStatistics(data) {
     // 计算本周游戏时间（基于API数据）
     const baseUrl = window.location.origin;
     
-    // 请求每日游玩时间数据，计算本周时间
-    fetch(`${baseUrl}/api/history`)
+    // 请求本周和本月的汇总游玩时间
+    fetch(`${baseUrl}/api/stats/period`)
         .then(response => response.json())
-        .then(historyData => {
-            // 计算本周和本月游玩时间
-            const now = new Date();
-            const startOfWeek = new Date(now);
-            startOfWeek.setDate(now.getDate() - now.getDay()); // 设置为本周日
-            startOfWeek.setHours(0, 0, 0, 0);
-            
-            const startOfMonth = new Date(now.getFullYear(), now.getMonth(), 1);
-            
-            // 计算本周游戏时间
-            let weeklyMinutes = 0;
-            let monthlyMinutes = 0;
-            
-            historyData.forEach(day => {
-                const dayDate = new Date(day.date);
-                
-                // 统计本周时间
-                if (dayDate >= startOfWeek) {
-                    weeklyMinutes += day.total_minutes || 0;
-                }
-                
-                // 统计本月时间
-                if (dayDate >= startOfMonth) {
-                    monthlyMinutes += day.total_minutes || 0;
-                }
-            });
+        .then(periodStats => {
+            const weeklyMinutes = periodStats.week.minutes;
+            const monthlyMinutes = periodStats.month.minutes;
             
             // 更新UI
             const weeklyHours = Math.floor(weeklyMinutes / 60);
@@ -912,7 +782,7 @@ function updateStatistics(data) {
                 `${monthlyHours}小时${monthlyRemainingMinutes > 0 ? monthlyRemainingMinutes + '分钟' : ''}`;
             
             // 创建月度游玩时间图表
-            createMonthlyChart(historyData);
+            createMonthlyChart();
             
             // 创建游玩时间最长的游戏图表
             createTopGamesChart(data.playHistories);
@@ -921,21 +791,16 @@ function updateStatistics(data) {
             createGameMilestones(data.playHistories);
         })
         .catch(error => {
-            console.error('获取历史数据失败:', error);
+            console.error('获取周期统计数据失败:', error);
         });
 }
 
 // 修改createMonthlyChart函数，解决图表显示问题
-function createMonthlyChart(games) {
-    // 仅从API获取实际数据，不使用估算
+function createMonthlyChart(monthlyData) {
+    // 仅使用实际数据，不使用估算；没有传入仪表盘中的月度数据时从API获取
     const baseUrl = window.location.origin;
-    fetch(`${baseUrl}/api/monthly_playtime`)
-        .then(response => {
-            if (!response.ok) {
-                throw new Error(`HTTP error! Status: ${response.status}`);
-            }
-            return response.json();
-        })
+    const request = monthlyData ? Promise.resolve(monthlyData) : fetchJson(`${baseUrl}/api/monthly_playtime`);
+    request
         .then(monthlyData => {
             console.log('月度数据加载成功:', monthlyData);
             
@@ -1354,16 +1219,55 @@ function navigateCalendar(months) {
     loadDailyPlayData();
 }
 
+// 按年份缓存的每日总游玩分钟数（Uint16Array），切换月份时不再重复请求
+const calendarYearCache = new Map();
+
+// 获取某一年每天的游玩分钟数
+function loadCalendarYear(year) {
+    if (!calendarYearCache.has(year)) {
+        const baseUrl = window.location.origin;
+        const request = fetch(`${baseUrl}/api/calendar?year=${year}&format=uint16`)
+            .then(response => {
+                if (!response.ok) {
+                    throw new Error(`HTTP error! Status: ${response.status}`);
+                }
+                return response.arrayBuffer();
+            })
+            .then(buffer => {
+                // 服务器按小端序输出，用 DataView 读取以免受浏览器字节序影响
+                const view = new DataView(buffer);
+                const totals = new Uint16Array(buffer.byteLength / 2);
+                for (let i = 0; i < totals.length; i++) {
+                    totals[i] = view.getUint16(i * 2, true);
+                }
+                return totals;
+            })
+            .catch(error => {
+                // 请求失败时不缓存，下次切换月份时重试
+                calendarYearCache.delete(year);
+                throw error;
+            });
+        calendarYearCache.set(year, request);
+    }
+    return calendarYearCache.get(year);
+}
+
+// 日期字符串（YYYY-MM-DD）在当年中的序号，1月1日为0
+function dayOfYear(dateString) {
+    const [year, month, day] = dateString.split('-').map(Number);
+    return (Date.UTC(year, month - 1, day) - Date.UTC(year, 0, 1)) / (24 * 60 * 60 * 1000);
+}
+
 // 加载每日游玩数据
 function loadDailyPlayData() {
-    const baseUrl = window.location.origin;
+    // 日历上可见的日期可能跨越两个年份（如12月和1月）
+    const visibleDates = Array.from(document.querySelectorAll('.day-hours[data-date]'))
+        .map(el => el.dataset.date);
+    const years = [...new Set(visibleDates.map(dateString => Number(dateString.slice(0, 4))))];
     
-    // 获取每日历史数据
-    fetch(`${baseUrl}/api/history`)
-        .then(response => response.json())
-        .then(historyData => {
-            // 添加调试信息
-            console.log('历史数据:', historyData);
+    Promise.all(years.map(year => loadCalendarYear(year)))
+        .then(yearTotals => {
+            const totalsByYear = new Map(years.map((year, index) => [year, yearTotals[index]]));
             
             // 清空日历上的游玩时间
             document.querySelectorAll('.day-hours').forEach(el => {
@@ -1371,21 +1275,16 @@ function loadDailyPlayData() {
                 el.parentElement.style.background = 'rgba(220, 220, 220, 0.5)';
             });
             
-            // 修复日期格式问题：API返回的日期格式是带时间的ISO字符串
-            // 更新日历上的游玩时间
-            historyData.forEach(day => {
-                // 提取日期部分 (YYYY-MM-DD)
-                const dateString = day.date.split('T')[0];
-                console.log('处理日期:', dateString);
-                
-                const hourElements = document.querySelectorAll(`.day-hours[data-date="${dateString}"]`);
-                console.log(`找到${hourElements.length}个匹配元素`);
-                
-                // 计算当天总游玩分钟数
-                let totalMinutes = 0;
-                day.games.forEach(game => {
-                    totalMinutes += game.minutes;
-                });
+            // 更新日历上的游玩时间，同时记录最后一个有数据的日期
+            let lastDataDay = null;
+            visibleDates.forEach(dateString => {
+                const totalMinutes = totalsByYear.get(Number(dateString.slice(0, 4)))[dayOfYear(dateString)];
+                if (!totalMinutes) {
+                    return;
+                }
+                if (!lastDataDay || dateString > lastDataDay) {
+                    lastDataDay = dateString;
+                }
                 
                 // 转换为小时
                 const hours = Math.floor(totalMinutes / 60);
@@ -1395,7 +1294,7 @@ function loadDailyPlayData() {
                     `${minutes}分钟`;
                 
                 // 更新日历单元格
-                hourElements.forEach(el => {
+                document.querySelectorAll(`.day-hours[data-date="${dateString}"]`).forEach(el => {
                     el.textContent = timeText;
                     
                     // 设置颜色深浅
@@ -1412,21 +1311,16 @@ function loadDailyPlayData() {
                 });
             });
             
-            // 如果当前月份有数据，默认选中今天或第一个有数据的日期
+            // 如果当前月份有数据，默认选中今天或最后一个有数据的日期
             const today = new Date().toISOString().split('T')[0];
             const todayElement = document.querySelector(`.calendar-day[data-date="${today}"]`);
             
             if (todayElement && todayElement.querySelector('.day-hours').textContent !== '--') {
                 todayElement.click();
-            } else {
-                // 找到第一个有数据的日期（修复日期格式问题）
-                const firstDataDay = historyData[0]?.date.split('T')[0];
-                if (firstDataDay) {
-                    const firstDataElement = document.querySelector(`.calendar-day[data-date="${firstDataDay}"]`);
-                    console.log('选择日期元素:', firstDataDay, firstDataElement);
-                    if (firstDataElement) {
-                        firstDataElement.click();
-                    }
+            } else if (lastDataDay) {
+                const lastDataElement = document.querySelector(`.calendar-day[data-date="${lastDataDay}"]`);
+                if (lastDataElement) {
+                    lastDataElement.click();
                 }
             }
         })
@@ -1449,40 +1343,22 @@ function showDayDetails(dateString) {
     // 清空游戏列表
     detailGames.innerHTML = '';
     
-    // 加载指定日期的游戏数据
-    fetch(`${baseUrl}/api/history`)
-        .then(response => response.json())
-        .then(historyData => {
-            // 查找对应日期的数据（修复日期格式问题）
-            const dayData = historyData.find(day => day.date.split('T')[0] === dateString);
-            
-            if (!dayData || !dayData.games || dayData.games.length === 0) {
+    // 加载指定日期的游戏数据（服务器已按游戏合并并排序）
+    fetch(`${baseUrl}/api/day/${dateString}`)
+        .then(response => {
+            if (!response.ok) {
+                throw new Error(`HTTP error! Status: ${response.status}`);
+            }
+            return response.json();
+        })
+        .then(dayData => {
+            if (!dayData.games || dayData.games.length === 0) {
                 detailGames.innerHTML = '<div class="no-games-message">当日无游戏记录</div>';
                 return;
             }
             
-            // 合并相同游戏的记录（按title_id分组并累加游玩时间）
-            const gameMap = new Map();
-            
+            // 显示游戏列表
             dayData.games.forEach(game => {
-                const key = game.title_id || game.name; // 如果没有title_id，使用name作为key
-                
-                if (gameMap.has(key)) {
-                    // 已有相同游戏，累加游玩时间
-                    const existingGame = gameMap.get(key);
-                    existingGame.minutes += game.minutes;
-                } else {
-                    // 添加新游戏
-                    gameMap.set(key, {...game});
-                }
-            });
-            
-            // 将Map转换回数组并按游玩时间排序
-            const mergedGames = Array.from(gameMap.values())
-                .sort((a, b) => b.minutes - a.minutes);
-            
-            // 显示游戏列表（使用合并后的数据）
-            mergedGames.forEach(game => {
                 const hours = Math.floor(game.minutes / 60);
                 const minutes = game.minutes % 60;
                 const timeText = hours > 0 ? 
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Switch Tracker 生产环境启动脚本
+替代 Flask 自带的调试服务器（单进程、开启重载器和调试器）
+
+- 多线程：每个工作进程使用线程处理并发请求
+- 多进程：--workers 大于 1 时预先 fork 多个工作进程，共享同一个监听端口（仅 POSIX）
+- 优雅退出：收到 SIGTERM/SIGINT 后停止接受新连接，等待正在处理的请求完成再退出
+- 模板只在 build 时复制一次，启动时不再改写 templates/index.html
+
+用法:
+    python serve.py build                       # 把 index.html 复制到 templates/
+    python serve.py [--host 0.0.0.0] [--port 8000] [--workers 1]
+"""
+
+import os
+import sys
+import signal
+import shutil
+import socket
+import logging
+import argparse
+import threading
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+import database
+
+logger = logging.getLogger("serve")
+
+DEFAULT_HOST = '0.0.0.0'
+DEFAULT_PORT = 8000
+DEFAULT_WORKERS = 1
+# 监听队列长度
+LISTEN_BACKLOG = 128
+# 空闲长连接的超时时间（秒），也是优雅退出时等待空闲连接的上限
+KEEPALIVE_TIMEOUT = 5
+
+TEMPLATE_SOURCE = 'index.html'
+TEMPLATE_FILE = os.path.join('templates', 'index.html')
+PID_FILE = 'server.pid'
+
+
+class RequestHandler(WSGIRequestHandler):
+    """为连接设置超时，避免空闲的长连接一直占用线程"""
+
+    timeout = KEEPALIVE_TIMEOUT
+
+
+def build_templates():
+    """把 index.html 复制到 templates/，内容未变化时不改写文件"""
+    os.makedirs(os.path.dirname(TEMPLATE_FILE), exist_ok=True)
+    with open(TEMPLATE_SOURCE, 'rb') as f:
+        content = f.read()
+    if os.path.exists(TEMPLATE_FILE):
+        with open(TEMPLATE_FILE, 'rb') as f:
+            if f.read() == content:
+                return False
+    shutil.copyfile(TEMPLATE_SOURCE, TEMPLATE_FILE)
+    return True
+
+
+def create_listen_socket(host, port):
+    """创建监听套接字，多个工作进程共享"""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(LISTEN_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def serve_forever(app, host, port, fd=None):
+    """在当前进程中运行多线程服务器，直到收到 SIGTERM/SIGINT"""
+    http_server = make_server(host, port, app, threaded=True, request_handler=RequestHandler, fd=fd)
+    # 请求线程不设为守护线程，退出时 server_close() 会等待它们处理完
+    http_server.daemon_threads = False
+
+    def handle_signal(signum, frame):
+        logger.info(f"进程 {os.getpid()} 收到信号 {signum}，停止接受新请求")
+        # shutdown() 会等待 serve_forever 退出，不能在主线程（信号处理函数）中直接调用
+        threading.Thread(target=http_server.shutdown).start()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    try:
+        http_server.serve_forever()
+    finally:
+        http_server.server_close()
+        database.close_all_connections()
+        logger.info(f"进程 {os.getpid()} 已退出")
+
+
+def run_workers(app, host, port, workers):
+    """预先 fork workers 个工作进程，主进程负责转发退出信号并等待子进程结束"""
+    sock = create_listen_socket(host, port)
+    children = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                serve_forever(app, host, port, fd=sock.fileno())
+            finally:
+                os._exit(0)
+        children.append(pid)
+    sock.close()
+    logger.info(f"已启动 {workers} 个工作进程: {children}")
+
+    def handle_signal(signum, frame):
+        for pid in children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    for pid in children:
+        while True:
+            try:
+                os.waitpid(pid, 0)
+                break
+            except InterruptedError:
+                continue
+            except ChildProcessError:
+                break
+
+
+def run(app, host=DEFAULT_HOST, port=DEFAULT_PORT, workers=DEFAULT_WORKERS):
+    """启动服务器，并在 server.pid 中记录主进程 PID"""
+    if workers > 1 and not hasattr(os, 'fork'):
+        logger.warning("当前平台不支持多进程，使用单进程多线程模式")
+        workers = 1
+
+    with open(PID_FILE, 'w') as f:
+        f.write(str(os.getpid()))
+    logger.info(f"服务器监听 http://{host}:{port}，工作进程数: {workers}")
+    try:
+        if workers > 1:
+            run_workers(app, host, port, workers)
+        else:
+            serve_forever(app, host, port)
+    finally:
+        if os.path.exists(PID_FILE):
+            os.remove(PID_FILE)
+
+
+def main(app=None):
+    parser = argparse.ArgumentParser(description='Switch Tracker Web 服务器')
+    parser.add_argument('command', nargs='?', choices=['build', 'run'], default='run')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS)
+    args = parser.parse_args()
+
+    # 切换到脚本所在目录，模板和静态文件都使用相对路径
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    if args.command == 'build':
+        if build_templates():
+            print(f"已更新 {TEMPLATE_FILE}")
+        else:
+            print(f"{TEMPLATE_FILE} 已是最新")
+        return 0
+
+    if not os.path.exists(database.DB_FILE):
+        print(f"数据库文件 {database.DB_FILE} 不存在，请先运行 get_switch_data.py 获取数据")
+        return 1
+    if not os.path.exists(TEMPLATE_FILE):
+        print(f"{TEMPLATE_FILE} 不存在，请先运行 python serve.py build")
+        return 1
+
+    if app is None:
+        from server import app
+    run(app, args.host, args.port, args.workers)
+    return 0
+
+
+if __name__ == '__main__':
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    sys.exit(main())
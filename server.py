@@ -1,19 +1,235 @@
-import os
+import sys
 import json
-import sqlite3
-from datetime import datetime
+from array import array
+from datetime import date, MINYEAR, MAXYEAR
+from functools import wraps
+from itertools import groupby, islice
 from flask import Flask, jsonify, send_from_directory, render_template, request
-from calendar import monthrange
+from calendar import isleap
+
+import database
+from api_cache import cached_response
+from api_encoding import dumps, json_array_chunks
+from database import rollup_periods, ROLLUP_ALL_TITLES, DEFAULT_ACCOUNT
+from game_names import (name_cache, GameInfo, LOCALES, DEFAULT_LOCALE, SEARCH_TABLE, SEARCH_MIN_LENGTH,
+                        has_search_index, search_phrase, matches_name)
 
 app = Flask(__name__)
 
-# 数据库配置
-DB_FILE = 'switch_tracker.db'
+# play_rollups 的汇总周期
+ROLLUP_PERIODS = ('day', 'week', 'month')
+
+# /api/games 的排序方式 -> game_latest 列；按名称排序时名称来自名称缓存，在内存中排序
+GAME_SORT_COLUMNS = {
+    'minutes': 'l.total_played_minutes',
+    'days': 'l.total_played_days',
+    'last_played': 'l.last_played_at',
+    'first_played': 'l.first_played_at',
+    'name': None,
+}
+# /api/games 每页最多返回的游戏数
+GAMES_MAX_LIMIT = 500
 
 def get_db_connection():
-    conn = sqlite3.connect(DB_FILE)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """从共享连接池获取连接，conn.close() 会将其归还"""
+    return database.get_connection()
+
+def current_account():
+    """请求的账号，所有 API 都可以用 ?account= 指定，默认为单账号时代的默认账号"""
+    return request.args.get('account', DEFAULT_ACCOUNT)
+
+def current_locale():
+    """请求的显示语言，返回游戏名称的 API 都可以用 ?lang=zh|ja|en 指定，默认中文"""
+    return request.args.get('lang', DEFAULT_LOCALE)
+
+def localized(view):
+    """返回游戏名称的 API 检查 ?lang=，不支持的语言返回 400；页面、静态文件和不含名称的 API 不受影响"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if current_locale() not in LOCALES:
+            return jsonify({'error': f"不支持的语言: {current_locale()}，可用: {', '.join(LOCALES)}"}), 400
+        return view(*args, **kwargs)
+    return wrapper
+
+def game_display(games, title_id, locale):
+    """从名称缓存中取 (显示名称, 图片地址)；缓存中没有的游戏以 title_id 作为名称"""
+    info = games.get(title_id)
+    if info is None:
+        return title_id, None
+    return info.name(locale), info.image_url
+
+def current_period_keys():
+    """返回今天、本周（ISO 周）和本月在 play_rollups 中的周期键"""
+    return dict(rollup_periods(date.today().isoformat()))
+
+def period_start_ordinal(period_key, bucket):
+    """周期键对应的起始日期序数，作为降采样时的横坐标"""
+    if bucket == 'week':
+        year, week = period_key.split('-W')
+        return date.fromisocalendar(int(year), int(week), 1).toordinal()
+    if bucket == 'month':
+        return date.fromisoformat(f'{period_key}-01').toordinal()
+    return date.fromisoformat(period_key).toordinal()
+
+def downsample_lttb(series, threshold, bucket):
+    """Largest-Triangle-Three-Buckets 降采样：保留首尾两点，其余每个桶选出与相邻桶构成最大三角形的点
+
+    series 为按时间排序的 [(周期键, 分钟数)]，返回其中至多 threshold 个点
+    """
+    xs = [period_start_ordinal(key, bucket) for key, _ in series]
+    ys = [minutes for _, minutes in series]
+    size = len(series)
+    every = (size - 2) / (threshold - 2)
+    sampled = [series[0]]
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        # 下一个桶的平均点（最后一个桶用末尾的点）
+        next_start, next_end = end, min(int((i + 2) * every) + 1, size)
+        if next_start >= next_end:
+            next_start, next_end = size - 1, size
+        avg_x = sum(xs[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(ys[next_start:next_end]) / (next_end - next_start)
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(series[best])
+        a = best
+    sampled.append(series[-1])
+    return sampled
+
+def query_monthly_totals(conn, account_id):
+    """读取入库时维护的月度汇总，返回 {YYYY-MM: 分钟数}"""
+    cursor = conn.execute('''
+    SELECT period_key AS month, total_minutes
+    FROM play_rollups
+    WHERE account_id = ? AND period = 'month' AND title_id = ?
+    ORDER BY period_key
+    ''', (account_id, ROLLUP_ALL_TITLES))
+    return {row['month']: row['total_minutes'] for row in cursor}
+
+def query_period_totals(conn, account_id, title_id=ROLLUP_ALL_TITLES):
+    """今天、本周（ISO 周）和本月的游玩时间：{周期: {'key': 周期键, 'minutes': 分钟数}}"""
+    keys = current_period_keys()
+    cursor = conn.execute('''
+        SELECT period, total_minutes
+        FROM play_rollups
+        WHERE account_id = ?
+          AND period IN ('day', 'week', 'month')
+          AND title_id = ?
+          AND period_key IN (?, ?, ?)
+    ''', (account_id, title_id, keys['day'], keys['week'], keys['month']))
+    totals = {row['period']: row['total_minutes'] for row in cursor}
+    return {
+        period: {'key': keys[period], 'minutes': totals.get(period, 0)}
+        for period in ROLLUP_PERIODS
+    }
+
+def query_recent_activities(conn, account_id, games, locale, days=7):
+    """最近 days 个有记录的日期的游玩记录，格式与 play_histories 接口的 recentPlayHistories 相同"""
+    # 一次查询取出这几天的所有记录（daily_play 中每个游戏每天只有一条记录），名称从名称缓存中附加
+    cursor = conn.execute('''
+    SELECT played_date, title_id, played_minutes
+    FROM daily_play
+    WHERE account_id = ? AND played_date IN (
+        SELECT DISTINCT played_date
+        FROM daily_play
+        WHERE account_id = ?
+        ORDER BY played_date DESC
+        LIMIT ?
+    )
+    ORDER BY played_date DESC, played_minutes DESC
+    ''', (account_id, account_id, days))
+    
+    recent = []
+    for played_date, rows in iter_history_days(cursor):
+        daily_games = []
+        for row in rows:
+            name, image_url = game_display(games, row['title_id'], locale)
+            daily_games.append({
+                'titleId': row['title_id'],
+                'titleName': name,
+                'imageUrl': image_url,
+                'totalPlayedMinutes': row['played_minutes']
+            })
+        recent.append({
+            'playedDate': played_date,
+            'dailyPlayHistories': daily_games
+        })
+    return recent
+
+def game_summary(row, info, locale):
+    """/api/games 中一款游戏的输出，row 为 game_latest 的查询结果"""
+    return {
+        'title_id': row['title_id'],
+        'name': info.name(locale),
+        'original_name': info.title_name,
+        'image_url': info.image_url,
+        'device_type': info.device_type,
+        'total_played_days': row['total_played_days'],
+        'total_played_minutes': row['total_played_minutes'],
+        'last_played_at': row['last_played_at'],
+        'first_played_at': row['first_played_at']
+    }
+
+def stream_json(chunks, conn):
+    """以流式响应输出已编码的 JSON 块，全部发送后归还数据库连接"""
+    def generate():
+        try:
+            yield from chunks
+        finally:
+            conn.close()
+    return app.response_class(generate(), mimetype='application/json')
+
+def iter_history_days(cursor):
+    """按日期分组查询结果（已按日期排序），逐天产出 (日期, 当天的记录列表)"""
+    for played_date, rows in groupby(cursor, key=lambda row: row['played_date']):
+        yield played_date, list(rows)
+
+def history_chunks(days, games, locale):
+    """/api/history 的默认结构：每天的记录中包含完整的游戏信息"""
+    def game_entry(row):
+        name, image_url = game_display(games, row['title_id'], locale)
+        return {
+            'title_id': row['title_id'],
+            'name': name,
+            'image_url': image_url,
+            'minutes': row['played_minutes']
+        }
+    
+    return json_array_chunks({
+        'date': played_date,
+        'games': [game_entry(row) for row in rows]
+    } for played_date, rows in days)
+
+def normalized_history_chunks(days, games, locale):
+    """/api/history?shape=normalized：游戏信息只在 games 中出现一次，每天的记录为 [游戏下标, 分钟数]"""
+    used_games = []
+    game_index = {}
+    
+    def day_items():
+        for played_date, rows in days:
+            entries = []
+            for row in rows:
+                title_id = row['title_id']
+                if title_id not in game_index:
+                    game_index[title_id] = len(used_games)
+                    name, image_url = game_display(games, title_id, locale)
+                    used_games.append({
+                        'title_id': title_id,
+                        'name': name,
+                        'image_url': image_url
+                    })
+                entries.append([game_index[title_id], row['played_minutes']])
+            yield {'date': played_date, 'games': entries}
+    
+    # games 在输出 days 的过程中收集，因此放在最后
+    yield b'{"days":'
+    yield from json_array_chunks(day_items())
+    yield f',"games":{dumps(used_games)}}}'.encode('utf-8')
 
 @app.route('/')
 def index():
@@ -25,226 +241,418 @@ def static_files(path):
     return send_from_directory('.', path)
 
 @app.route('/api/monthly_playtime')
+@cached_response
 def monthly_playtime():
     """获取每月游玩时间统计数据"""
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        
-        # 查询每日游玩记录，按月份汇总
-        cursor.execute('''
-        SELECT 
-            strftime('%Y-%m', played_date) as month,
-            SUM(played_minutes) as total_minutes
-        FROM daily_play
-        GROUP BY month
-        ORDER BY month
-        ''')
-        
-        monthly_data = {}
-        for row in cursor.fetchall():
-            month, minutes = row
-            monthly_data[month] = minutes
+        conn = get_db_connection()
         
-        # 移除对当前月份的估算处理，只使用实际数据
+        # 直接读取入库时维护的月度汇总，只使用实际数据
+        monthly_data = query_monthly_totals(conn, current_account())
         
         conn.close()
         return jsonify(monthly_data)
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/stats/period')
+@cached_response
+def period_stats():
+    """获取今天、本周（ISO 周）和本月的游玩时间，可用 title_id 指定单个游戏"""
+    conn = get_db_connection()
+    totals = query_period_totals(conn, current_account(), request.args.get('title_id', ROLLUP_ALL_TITLES))
+    conn.close()
+    return jsonify(totals)
+
+@app.route('/api/stats/period/<period>')
+@cached_response
+def period_series(period):
+    """获取按日/周/月汇总的游玩时间序列
+
+    支持以下查询参数（均可选）：
+    - from / to: 周期键范围（如 2024-03-01、2024-W09、2024-03，包含两端）
+    - limit: 只返回最近的若干个周期
+    - title_id: 只统计单个游戏
+    """
+    if period not in ROLLUP_PERIODS:
+        return jsonify({'error': f'未知的汇总周期: {period}'}), 404
+    
+    limit = request.args.get('limit', type=int)
+    if limit is not None and limit <= 0:
+        return jsonify({'error': 'limit 必须为正整数'}), 400
+    
+    conditions = ['account_id = ?', 'period = ?', 'title_id = ?']
+    params = [current_account(), period, request.args.get('title_id', ROLLUP_ALL_TITLES)]
+    if request.args.get('from'):
+        conditions.append('period_key >= ?')
+        params.append(request.args['from'])
+    if request.args.get('to'):
+        conditions.append('period_key <= ?')
+        params.append(request.args['to'])
+    query = f'''
+        SELECT period_key, total_minutes
+        FROM play_rollups
+        WHERE {' AND '.join(conditions)}
+        ORDER BY period_key DESC
+    '''
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    
+    conn = get_db_connection()
+    series = [{'key': row['period_key'], 'minutes': row['total_minutes']}
+              for row in conn.execute(query, params)]
+    conn.close()
+    
+    series.reverse()
+    return jsonify(series)
+
+@app.route('/api/accounts')
+@cached_response
+def get_accounts():
+    """列出已有数据的账号，默认账号为空字符串"""
+    conn = get_db_connection()
+    accounts = [row['account_id'] for row in conn.execute(
+        'SELECT DISTINCT account_id FROM game_latest ORDER BY account_id'
+    )]
+    conn.close()
+    return jsonify(accounts)
+
 @app.route('/api/games')
+@localized
+@cached_response
 def get_games():
+    """获取游戏列表
+
+    支持以下查询参数（均可选）：
+    - q: 按名称搜索，匹配原始名称和中文、日文、英文翻译中的任意子串，不区分大小写
+    - sort: minutes（默认）、days、last_played、first_played 或 name（按当前语言的名称）
+    - order: asc 或 desc；按名称排序时默认 asc，其余默认 desc
+    - device_type: 只返回该设备类型的游戏
+    - played_since: 只返回该日期（YYYY-MM-DD）及之后玩过的游戏
+    - limit / offset: 分页，limit 为 1~500；分页时在 X-Total-Count 中返回符合条件的游戏总数
+    - lang: 游戏名称的语言（zh、ja、en）
+    """
+    sort = request.args.get('sort', 'minutes')
+    if sort not in GAME_SORT_COLUMNS:
+        return jsonify({'error': f"未知的排序方式: {sort}，可用: {', '.join(GAME_SORT_COLUMNS)}"}), 400
+    order = request.args.get('order', 'asc' if sort == 'name' else 'desc')
+    if order not in ('asc', 'desc'):
+        return jsonify({'error': 'order 必须为 asc 或 desc'}), 400
+    limit = request.args.get('limit', type=int)
+    if limit is not None and not 1 <= limit <= GAMES_MAX_LIMIT:
+        return jsonify({'error': f'limit 必须为 1~{GAMES_MAX_LIMIT} 的整数'}), 400
+    offset = request.args.get('offset', 0, type=int)
+    if offset < 0:
+        return jsonify({'error': 'offset 必须为非负整数'}), 400
+    played_since = request.args.get('played_since')
+    if played_since:
+        try:
+            played_since = date.fromisoformat(played_since).isoformat()
+        except ValueError:
+            return jsonify({'error': 'played_since 必须为 YYYY-MM-DD 格式的日期'}), 400
+    
+    names = name_cache.games()
+    locale = current_locale()
     conn = get_db_connection()
     
-    # 获取游戏列表，优先使用中文名称
-    cursor = conn.execute('''
-        SELECT 
-            g.title_id, 
-            CASE 
-                WHEN g.chinese_name IS NOT NULL AND g.chinese_name != '' 
-                THEN g.chinese_name 
-                ELSE g.title_name 
-            END AS display_name,
-            g.title_name AS original_name,
+    # 筛选条件都在 SQL 中完成，名称从名称缓存中附加；
+    # 总数和每一页都只包含 games 中有记录的游戏，两者始终一致
+    conditions = ['l.account_id = ?']
+    params = [current_account()]
+    device_type = request.args.get('device_type')
+    if device_type:
+        conditions.append('g.device_type = ?')
+        params.append(device_type)
+    if played_since:
+        conditions.append('l.last_played_at >= ?')
+        params.append(played_since)
+    q = request.args.get('q', '').strip()
+    if q:
+        if len(q) >= SEARCH_MIN_LENGTH and has_search_index(conn):
+            conditions.append(f'l.title_id IN (SELECT title_id FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH ?)')
+            params.append(search_phrase(q))
+        else:
+            # trigram 索引无法匹配不足 3 个字符的搜索词，直接在名称缓存中查找
+            matched = [title_id for title_id, info in names.items() if matches_name(info, q)]
+            conditions.append('l.title_id IN (SELECT value FROM json_each(?))')
+            params.append(json.dumps(matched))
+    
+    column = GAME_SORT_COLUMNS[sort]
+    direction = order.upper()
+    where = ' AND '.join(conditions)
+    query = f'''
+        SELECT
+            l.title_id,
+            l.total_played_days,
+            l.total_played_minutes,
+            l.last_played_at,
+            l.first_played_at,
+            g.title_name,
             g.image_url,
-            g.device_type,
-            MAX(h.total_played_days) AS total_played_days,
-            MAX(h.total_played_minutes) AS total_played_minutes,
-            MAX(h.last_played_at) AS last_played_at,
-            MIN(h.first_played_at) AS first_played_at
-        FROM games g
-        JOIN game_history h ON g.title_id = h.title_id
-        GROUP BY g.title_id
-        ORDER BY total_played_minutes DESC
-    ''')
+            g.device_type
+        FROM game_latest l
+        JOIN games g ON g.title_id = l.title_id
+        WHERE {where}
+    '''
+    total = None
+    if column is not None:
+        # title_id 作为次要排序键，分页时每一页的顺序都是确定的
+        query += f' ORDER BY {column} {direction}, l.title_id'
+        if limit is not None:
+            # 按列排序时分页在 SQL 中完成，符合条件的总数单独计数
+            total = conn.execute(f'''
+            SELECT COUNT(*) FROM game_latest l JOIN games g ON g.title_id = l.title_id WHERE {where}
+            ''', params).fetchone()[0]
+            query += ' LIMIT ? OFFSET ?'
+            params = params + [limit, offset]
+    cursor = conn.execute(query, params)
+    # 名称缓存加载之后才入库的游戏暂时使用 games 中的原始名称
+    rows = ((row, names.get(row['title_id']) or GameInfo(row['title_name'], row['image_url'], row['device_type'], {}))
+            for row in cursor)
     
-    games = []
-    for row in cursor:
-        games.append({
-            'title_id': row['title_id'],
-            'name': row['display_name'],
-            'original_name': row['original_name'],
-            'image_url': row['image_url'],
-            'device_type': row['device_type'],
-            'total_played_days': row['total_played_days'],
-            'total_played_minutes': row['total_played_minutes'],
-            'last_played_at': row['last_played_at'],
-            'first_played_at': row['first_played_at']
-        })
+    if column is None:
+        rows = sorted(rows, key=lambda item: item[0]['title_id'])
+        rows.sort(key=lambda item: item[1].name(locale).casefold(), reverse=order == 'desc')
     
+    # 不分页时边读取游标边输出
+    if limit is None:
+        return stream_json(json_array_chunks(game_summary(row, info, locale) for row, info in rows), conn)
+    
+    rows = list(rows)
     conn.close()
-    return jsonify(games)
+    if total is None:
+        # 名称来自名称缓存，按名称排序只能在内存中排序后切片
+        total = len(rows)
+        rows = rows[offset:offset + limit]
+    response = app.response_class(
+        b''.join(json_array_chunks(game_summary(row, info, locale) for row, info in rows)),
+        mimetype='application/json'
+    )
+    response.headers['X-Total-Count'] = str(total)
+    return response
 
 @app.route('/api/game/<title_id>/daily')
+@localized
+@cached_response
 def get_game_daily(title_id):
+    """获取单个游戏的游玩时间序列
+
+    支持以下查询参数（均可选）：
+    - from / to: 日期范围（YYYY-MM-DD，包含两端）；按周、月汇总时包含两端日期所在的周期
+    - bucket: day（默认）、week（ISO 周）或 month，对应 play_rollups 中该游戏的汇总
+    - points: 最多返回的点数（至少 3），超出时用 LTTB 算法降采样，保留曲线的峰谷形状
+    """
+    game = name_cache.games().get(title_id)
+    if game is None:
+        return jsonify({'error': 'Game not found'}), 404
+    
+    bucket = request.args.get('bucket', 'day')
+    if bucket not in ROLLUP_PERIODS:
+        return jsonify({'error': f"未知的汇总粒度: {bucket}，可用: {', '.join(ROLLUP_PERIODS)}"}), 400
+    points = request.args.get('points', type=int)
+    if points is not None and points < 3:
+        return jsonify({'error': 'points 必须为不小于 3 的整数'}), 400
+    
+    # 日期换算为对应粒度的周期键，直接按 play_rollups 的主键范围读取
+    conditions = ['account_id = ?', 'period = ?', 'title_id = ?']
+    params = [current_account(), bucket, title_id]
+    for arg, operator in (('from', '>='), ('to', '<=')):
+        value = request.args.get(arg)
+        if not value:
+            continue
+        try:
+            period_key = dict(rollup_periods(value))[bucket]
+        except ValueError:
+            return jsonify({'error': f'{arg} 必须为 YYYY-MM-DD 格式的日期'}), 400
+        conditions.append(f'period_key {operator} ?')
+        params.append(period_key)
+    
     conn = get_db_connection()
+    cursor = conn.execute(f'''
+        SELECT period_key, total_minutes
+        FROM play_rollups
+        WHERE {' AND '.join(conditions)}
+        ORDER BY period_key ASC
+    ''', params)
+    series = [(row['period_key'], row['total_minutes']) for row in cursor]
+    conn.close()
     
-    # 获取游戏信息，优先使用中文名称
+    total_points = len(series)
+    if points is not None and total_points > points:
+        series = downsample_lttb(series, points, bucket)
+    
+    return jsonify({
+        'title_id': title_id,
+        'name': game.name(current_locale()),
+        'image_url': game.image_url,
+        'bucket': bucket,
+        'total_points': total_points,
+        # 按周、月汇总时 date 为周期键（如 2024-W09、2024-03）
+        'daily_data': [{'date': key, 'minutes': minutes} for key, minutes in series]
+    })
+
+@app.route('/api/calendar')
+@cached_response
+def calendar_year():
+    """获取某一年每天的总游玩分钟数，用于日历和热力图
+
+    支持以下查询参数（均可选）：
+    - year: 年份，默认今年
+    - format: json（默认）返回数组；uint16 返回小端序的 uint16 二进制，每天 2 字节
+    数组长度为当年天数，第 i 项为 1 月 1 日之后第 i 天的分钟数，没有记录的日期为 0
+    """
+    year = request.args.get('year', str(date.today().year))
+    if not year.isdigit() or not MINYEAR <= int(year) <= MAXYEAR:
+        return jsonify({'error': f'无效的年份: {year}'}), 400
+    output_format = request.args.get('format', 'json')
+    if output_format not in ('json', 'uint16'):
+        return jsonify({'error': f'未知的格式: {output_format}，可用: json, uint16'}), 400
+    
+    year = int(year)
+    start = date(year, 1, 1)
+    totals = [0] * (366 if isleap(year) else 365)
+    
+    # 每日总时长直接读取 play_rollups 中所有游戏的每日汇总
+    conn = get_db_connection()
     cursor = conn.execute('''
-        SELECT 
-            title_id, 
-            CASE 
-                WHEN chinese_name IS NOT NULL AND chinese_name != '' 
-                THEN chinese_name 
-                ELSE title_name 
-            END AS display_name,
-            image_url
-        FROM games
-        WHERE title_id = ?
-    ''', (title_id,))
-    
-    game = cursor.fetchone()
-    if not game:
-        conn.close()
-        return jsonify({'error': 'Game not found'}), 404
+        SELECT period_key, total_minutes
+        FROM play_rollups
+        WHERE account_id = ? AND period = 'day' AND title_id = ?
+          AND period_key BETWEEN ? AND ?
+    ''', (current_account(), ROLLUP_ALL_TITLES, start.isoformat(), f'{year}-12-31'))
+    for row in cursor:
+        totals[(date.fromisoformat(row['period_key']) - start).days] = row['total_minutes']
+    conn.close()
+    
+    if output_format == 'json':
+        return app.response_class(dumps(totals), mimetype='application/json')
+    
+    # 一天最多 1440 分钟，uint16 足够；异常的大数值截断到上限
+    body = array('H', (min(minutes, 0xFFFF) for minutes in totals))
+    if sys.byteorder == 'big':
+        body.byteswap()
+    return app.response_class(body.tobytes(), mimetype='application/octet-stream')
+
+@app.route('/api/day/<played_date>')
+@localized
+@cached_response
+def get_day(played_date):
+    """获取某一天的游玩记录：每个游戏一条，按游玩时间从多到少排列"""
+    try:
+        played_date = date.fromisoformat(played_date).isoformat()
+    except ValueError:
+        return jsonify({'error': '日期必须为 YYYY-MM-DD 格式'}), 400
+    
+    names = name_cache.games()
+    locale = current_locale()
+    conn = get_db_connection()
     
-    # 获取每日游玩数据
+    # 收集脚本按接口原样保存 playedDate（可能带时间和时区），与 /api/history 一样按日期范围读取覆盖索引
     cursor = conn.execute('''
-        SELECT played_date, played_minutes
+        SELECT title_id, played_minutes AS minutes
         FROM daily_play
-        WHERE title_id = ?
-        ORDER BY played_date ASC
-    ''', (title_id,))
+        WHERE account_id = ? AND played_date >= ? AND played_date < date(?, '+1 day')
+        ORDER BY played_minutes DESC
+    ''', (current_account(), played_date, played_date))
     
-    daily_data = []
+    games = []
     for row in cursor:
-        daily_data.append({
-            'date': row['played_date'],
-            'minutes': row['played_minutes']
+        name, image_url = game_display(names, row['title_id'], locale)
+        games.append({
+            'title_id': row['title_id'],
+            'name': name,
+            'image_url': image_url,
+            'minutes': row['minutes']
         })
-    
-    result = {
-        'title_id': game['title_id'],
-        'name': game['display_name'],
-        'image_url': game['image_url'],
-        'daily_data': daily_data
-    }
-    
     conn.close()
-    return jsonify(result)
+    
+    return jsonify({
+        'date': played_date,
+        'total_minutes': sum(game['minutes'] for game in games),
+        'games': games
+    })
 
 @app.route('/api/history')
+@localized
+@cached_response
 def get_history():
-    conn = get_db_connection()
+    """获取每日游玩历史
+
+    支持以下查询参数（均可选）：
+    - from / to: 日期范围（YYYY-MM-DD，包含两端）
+    - limit: 最多返回的天数
+    - cursor: 上一页返回的 X-Next-Cursor，只返回早于该日期的记录
+    - shape=normalized: 游戏信息只出现一次，每日记录通过下标引用
+    - lang: 游戏名称的语言（zh、ja、en）
+    """
+    date_from = request.args.get('from')
+    date_to = request.args.get('to')
+    cursor_date = request.args.get('cursor')
+    limit = request.args.get('limit', type=int)
     
-    # 获取所有历史记录的日期（从每日游玩记录中）
-    cursor = conn.execute('''
-        SELECT DISTINCT played_date
-        FROM daily_play
-        ORDER BY played_date DESC
-    ''')
+    if limit is not None and limit <= 0:
+        return jsonify({'error': 'limit 必须为正整数'}), 400
     
-    dates = [row['played_date'] for row in cursor]
+    conditions = ['d.account_id = ?']
+    params = [current_account()]
+    if date_from:
+        conditions.append('d.played_date >= ?')
+        params.append(date_from)
+    if date_to:
+        conditions.append("d.played_date < date(?, '+1 day')")
+        params.append(date_to)
+    if cursor_date:
+        conditions.append('d.played_date < ?')
+        params.append(cursor_date)
+    where_clause = f"WHERE {' AND '.join(conditions)}"
     
-    history = []
-    for date in dates:
-        # 获取当天玩的游戏，优先使用中文名称
-        cursor = conn.execute('''
-            SELECT 
-                d.title_id,
-                CASE 
-                    WHEN g.chinese_name IS NOT NULL AND g.chinese_name != '' 
-                    THEN g.chinese_name 
-                    ELSE g.title_name 
-                END AS display_name,
-                g.image_url,
-                d.played_minutes
-            FROM daily_play d
-            JOIN games g ON d.title_id = g.title_id
-            WHERE d.played_date = ?
-            ORDER BY d.played_minutes DESC
-        ''', (date,))
-        
-        games = []
-        for row in cursor:
-            games.append({
-                'title_id': row['title_id'],
-                'name': row['display_name'],
-                'image_url': row['image_url'],
-                'minutes': row['played_minutes']
-            })
-        
-        if games:  # 只添加有游戏记录的日期
-            history.append({
-                'date': date,
-                'games': games
-            })
+    # 一次查询取出窗口内所有日期的记录，多取一天用于判断是否还有下一页；
+    # 只读取 daily_play 的覆盖索引，游戏名称和图片在输出时从名称缓存中附加
+    query = f'''
+        SELECT 
+            d.played_date,
+            d.title_id,
+            d.played_minutes,
+            DENSE_RANK() OVER (ORDER BY d.played_date DESC) AS day_rank
+        FROM daily_play d
+        {where_clause}
+    '''
+    if limit is not None:
+        query = f'SELECT * FROM ({query}) WHERE day_rank <= ?'
+        params.append(limit + 1)
+    query += ' ORDER BY played_date DESC, played_minutes DESC'
+    
+    names = name_cache.games()
+    locale = current_locale()
+    conn = get_db_connection()
+    cursor = conn.execute(query, params)
+    days = iter_history_days(cursor)
+    encode = normalized_history_chunks if request.args.get('shape') == 'normalized' else history_chunks
     
+    # 不分页时边读取游标边输出
+    if limit is None:
+        return stream_json(encode(days, names, locale), conn)
+    
+    # 分页时多取了一天，用于判断是否还有下一页
+    window = list(islice(days, limit))
+    has_more = next(days, None) is not None
     conn.close()
-    return jsonify(history)
+    
+    response = app.response_class(b''.join(encode(window, names, locale)), mimetype='application/json')
+    if has_more:
+        response.headers['X-Next-Cursor'] = window[-1][0]
+    return response
 
 @app.route('/api/recent_activities')
+@localized
+@cached_response
 def recent_activities():
     """获取最近几天的游玩记录"""
     try:
+        names = name_cache.games()
         conn = get_db_connection()
-        
-        # 获取最近7天有记录的日期
-        cursor = conn.execute('''
-        SELECT DISTINCT played_date
-        FROM daily_play
-        ORDER BY played_date DESC
-        LIMIT 7
-        ''')
-        
-        dates = [row['played_date'] for row in cursor]
-        
-        recent_activities = []
-        for date in dates:
-            # 获取该日期的游玩记录，优先使用中文名称，并使用GROUP BY title_id去重
-            cursor = conn.execute('''
-            SELECT 
-                d.title_id,
-                CASE 
-                    WHEN g.chinese_name IS NOT NULL AND g.chinese_name != '' 
-                    THEN g.chinese_name 
-                    ELSE g.title_name 
-                END AS display_name,
-                g.image_url,
-                SUM(d.played_minutes) as total_minutes
-            FROM daily_play d
-            JOIN games g ON d.title_id = g.title_id
-            WHERE d.played_date = ?
-            GROUP BY d.title_id
-            ORDER BY total_minutes DESC
-            ''', (date,))
-            
-            daily_games = []
-            for row in cursor:
-                daily_games.append({
-                    'titleId': row['title_id'],
-                    'titleName': row['display_name'],
-                    'imageUrl': row['image_url'],
-                    'totalPlayedMinutes': row['total_minutes']
-                })
-            
-            if daily_games:  # 只添加有游戏记录的日期
-                recent_activities.append({
-                    'playedDate': date,
-                    'dailyPlayHistories': daily_games
-                })
-        
+        recent_activities = query_recent_activities(conn, current_account(), names, current_locale())
         conn.close()
         
         # 调试返回数据结构
@@ -255,6 +663,61 @@ def recent_activities():
         print(f"recent_activities API错误: {str(e)}")
         return jsonify({'error': str(e), 'recentPlayHistories': []}), 500
 
+@app.route('/api/dashboard')
+@localized
+@cached_response
+def dashboard():
+    """首页首屏需要的全部数据：汇总卡片、游玩时间最长的游戏、最近 7 天的记录和月度序列
+
+    所有查询在同一个读事务中完成，各部分来自同一个数据快照；响应按数据版本缓存。
+    可选参数 top 指定返回的游戏数量（默认 8）
+    """
+    top = request.args.get('top', 8, type=int)
+    if top <= 0:
+        return jsonify({'error': 'top 必须为正整数'}), 400
+    
+    account_id = current_account()
+    names = name_cache.games()
+    locale = current_locale()
+    conn = get_db_connection()
+    try:
+        # WAL 模式下读事务看到的是开始时的快照，入库不会让各部分的数据互相矛盾
+        conn.execute('BEGIN')
+        data_version = database.get_data_version(conn)
+        totals = conn.execute('''
+            SELECT COUNT(*) AS game_count, COALESCE(SUM(total_played_minutes), 0) AS total_minutes
+            FROM game_latest
+            WHERE account_id = ?
+        ''', (account_id,)).fetchone()
+        top_games = [
+            game_summary(row, names[row['title_id']], locale)
+            for row in conn.execute('''
+                SELECT title_id, total_played_days, total_played_minutes, last_played_at, first_played_at
+                FROM game_latest
+                WHERE account_id = ?
+                ORDER BY total_played_minutes DESC
+                LIMIT ?
+            ''', (account_id, top))
+            if row['title_id'] in names
+        ]
+        periods = query_period_totals(conn, account_id)
+        recent = query_recent_activities(conn, account_id, names, locale)
+        monthly = query_monthly_totals(conn, account_id)
+    finally:
+        conn.close()
+    
+    return jsonify({
+        'data_version': data_version,
+        'summary': {
+            'game_count': totals['game_count'],
+            'total_minutes': totals['total_minutes'],
+            **periods
+        },
+        'top_games': top_games,
+        'recentPlayHistories': recent,
+        'monthly': monthly
+    })
+
 @app.route('/test')
 def test_page():
     """测试页面，显示原始数据"""
@@ -266,6 +729,7 @@ def test_page():
             SELECT 
                 title_id, title_name, chinese_name, image_url
             FROM games
+            ORDER BY title_id
             LIMIT 20
         ''')
         
@@ -275,10 +739,11 @@ def test_page():
         cursor = conn.execute('''
             SELECT played_date, COUNT(*) as game_count, SUM(played_minutes) as total_minutes
             FROM daily_play
+            WHERE account_id = ?
             GROUP BY played_date
             ORDER BY played_date DESC
             LIMIT 10
-        ''')
+        ''', (current_account(),))
         
         daily_stats = [dict(row) for row in cursor]
         
@@ -349,16 +814,6 @@ def test_page():
         return f"<h1>错误</h1><p>{str(e)}</p>"
 
 if __name__ == '__main__':
-    # 确保数据库文件存在
-    if not os.path.exists(DB_FILE):
-        print(f"数据库文件 {DB_FILE} 不存在，请先运行 get_switch_data.py 获取数据")
-    else:
-        # 确保模板目录存在
-        if not os.path.exists('templates'):
-            os.makedirs('templates')
-        
-        # 创建或更新index.html
-        with open('templates/index.html', 'w') as f:
-            f.write(open('index.html').read())
-        
-        app.run(host='0.0.0.0', port=8000, debug=True) 
\ No newline at end of file
+    # 开发调试请使用 flask --app server run --debug；这里使用 serve.py 中的生产服务器
+    import serve
+    sys.exit(serve.main(app))
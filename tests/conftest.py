@@ -0,0 +1,246 @@
+"""
+测试的公共夹具
+每个测试在独立的临时目录中运行，使用各自的合成数据库；
+database 的连接池、响应缓存和名称缓存都是模块级状态，在测试前后重置
+"""
+
+import hashlib
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import threading
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 各脚本导入时用 basicConfig 把日志写入当前目录的文件，根日志器已有处理器时 basicConfig 不做任何事
+logging.getLogger().addHandler(logging.NullHandler())
+
+import api_cache  # noqa: E402
+import database  # noqa: E402
+import game_names  # noqa: E402
+import get_switch_data  # noqa: E402
+import history_archive  # noqa: E402
+import server  # noqa: E402
+
+
+def synthetic_title_ids(count):
+    return [f'0100{i:012X}' for i in range(count)]
+
+
+def synthetic_payload(title_ids, round_no, days=7, titles_per_day=20):
+    """与 play_histories 接口结构相同的数据：最近 days 天每天前 titles_per_day 款游戏各玩 30 + round_no 分钟"""
+    today = date.today()
+    return {
+        'playHistories': [{
+            'titleId': title_id,
+            'titleName': f'Game {i}',
+            'imageUrl': f'https://example.com/images/{title_id}.jpg',
+            'deviceType': 'HAC',
+            'totalPlayedDays': 10 + round_no,
+            'totalPlayedMinutes': 600 + i + round_no,
+        } for i, title_id in enumerate(title_ids)],
+        'recentPlayHistories': [{
+            'playedDate': (today - timedelta(days=offset)).isoformat(),
+            'dailyPlayHistories': [{
+                'titleId': title_id,
+                'totalPlayedMinutes': 30 + round_no,
+            } for title_id in title_ids[:titles_per_day]],
+        } for offset in range(days)],
+    }
+
+
+def reset_shared_state():
+    database.close_all_connections()
+    api_cache.response_cache.clear()
+    api_cache.data_version.close()
+    game_names.name_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def workdir(tmp_path, monkeypatch):
+    """切换到临时目录，收集和导入脚本写入的 history_data/、CSV 等文件都留在其中"""
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(database, 'DB_FILE', str(tmp_path / database.DB_FILE))
+    reset_shared_state()
+    yield tmp_path
+    reset_shared_state()
+
+
+@pytest.fixture
+def make_db(workdir):
+    """生成合成数据库并设为当前数据库：titles 款游戏，截至昨天 years 年的每日记录，返回数据库文件路径"""
+    def make(years=1, titles=50, titles_per_day=5, seed=42):
+        rng = random.Random(seed)
+        get_switch_data.init_database()
+        conn = sqlite3.connect(database.DB_FILE)
+        title_ids = synthetic_title_ids(titles)
+        conn.executemany('INSERT INTO games (title_id, title_name, image_url, device_type) VALUES (?, ?, ?, ?)', [
+            (title_id, f'Game {i}', f'https://example.com/images/{title_id}.jpg', 'HAC')
+            for i, title_id in enumerate(title_ids)
+        ])
+        game_names.refresh_search_index(conn)
+
+        start = date.today() - timedelta(days=365 * years)
+        collected_at = date.today().isoformat()
+        conn.executemany('''
+        INSERT INTO daily_play (title_id, played_date, played_minutes, collected_at)
+        VALUES (?, ?, ?, ?)
+        ''', [
+            (title_id, (start + timedelta(days=offset)).isoformat(), rng.randint(1, 180), collected_at)
+            for offset in range(365 * years)
+            for title_id in rng.sample(title_ids, min(titles_per_day, titles))
+        ])
+        get_switch_data.rebuild_play_rollups(conn)
+        conn.executemany('''
+        INSERT INTO game_latest (title_id, total_played_days, total_played_minutes, collected_at)
+        VALUES (?, ?, ?, ?)
+        ''', [(title_id, 10, rng.randint(60, 6000), collected_at) for title_id in title_ids])
+        conn.commit()
+        conn.close()
+        database.close_all_connections()
+        return database.DB_FILE
+    return make
+
+
+@pytest.fixture
+def make_payload():
+    """生成 play_histories 响应的函数，参数与 synthetic_payload 相同"""
+    return synthetic_payload
+
+
+@pytest.fixture
+def make_archive(workdir):
+    """把 snapshots 次采集写入响应归档：每次采集只有部分游戏变化，日期每 4 次推进一天"""
+    def make(snapshots, titles, titles_per_day=5):
+        title_ids = synthetic_title_ids(titles)
+        start_time = datetime(2024, 1, 1)
+        for i in range(snapshots):
+            payload = synthetic_payload(title_ids, i, days=7, titles_per_day=titles_per_day)
+            payload['recentPlayHistories'] = [
+                dict(day, playedDate=(start_time + timedelta(days=i // 4 - offset)).date().isoformat())
+                for offset, day in enumerate(payload['recentPlayHistories'])
+            ]
+            raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+            history_archive.store(raw, captured_at=start_time + timedelta(hours=6 * i))
+        return title_ids
+    return make
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+@pytest.fixture
+def live_server():
+    """在后台线程中启动真实的 HTTP 服务器，产出 (host, port)"""
+    from werkzeug.serving import make_server
+
+    http_server = make_server('127.0.0.1', 0, server.app, threaded=True)
+    thread = threading.Thread(target=http_server.serve_forever, daemon=True)
+    thread.start()
+    yield '127.0.0.1', http_server.port
+    http_server.shutdown()
+    thread.join()
+
+
+class MockNintendoApi:
+    """本地模拟的 play_histories 和访问令牌接口的状态"""
+
+    def __init__(self, title_count):
+        self.title_ids = synthetic_title_ids(title_count)
+        # 每个路径收到的请求数
+        self.requests = {}
+        # 为 None 时接受任何访问令牌，否则只接受集合中的令牌
+        self.valid_tokens = None
+        # 是否返回 ETag 并对匹配的 If-None-Match 返回 304
+        self.send_etag = False
+        # 第一个游戏今天额外增加的游玩分钟数，用于模拟部分数据变化
+        self.extra_minutes = 0
+        # 签发的令牌的有效期（秒），为 None 时响应中没有 expires_in
+        self.expires_in = 900
+        self.issued = 0
+        self.lock = threading.Lock()
+
+    def count(self, path):
+        with self.lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+
+    def count_of(self, suffix):
+        with self.lock:
+            return sum(n for path, n in self.requests.items() if path.split('?')[0].endswith(suffix))
+
+    def issue_token(self):
+        with self.lock:
+            self.issued += 1
+            token = f'issued-{self.issued}'
+            if self.valid_tokens is not None:
+                self.valid_tokens.add(token)
+        response = {'token_type': 'Bearer', 'access_token': token}
+        if self.expires_in is not None:
+            response['expires_in'] = self.expires_in
+        return response
+
+
+@pytest.fixture
+def nintendo_api(workdir, monkeypatch):
+    """启动模拟接口，并把 get_switch_data 的接口地址和限流器指向它，产出 MockNintendoApi"""
+    api = MockNintendoApi(title_count=50)
+
+    class Handler(BaseHTTPRequestHandler):
+        def send_json(self, status, payload, etag=None):
+            body = json.dumps(payload).encode('utf-8')
+            if etag is not None and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.send_header('ETag', etag)
+                self.end_headers()
+                return
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            if etag is not None:
+                self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            api.count(self.path)
+            token = self.headers.get('Authorization', '').split(' ')[-1]
+            if api.valid_tokens is not None and token not in api.valid_tokens:
+                self.send_json(401, {'error': 'invalid_token'})
+                return
+            # 不同账号的令牌返回不同的数据
+            payload = synthetic_payload(api.title_ids, sum(token.encode('utf-8')))
+            if api.extra_minutes:
+                payload['playHistories'][0]['totalPlayedMinutes'] += api.extra_minutes
+                payload['recentPlayHistories'][0]['dailyPlayHistories'][0]['totalPlayedMinutes'] += api.extra_minutes
+            etag = None
+            if api.send_etag:
+                etag = '"%s"' % hashlib.sha1(json.dumps(payload).encode('utf-8')).hexdigest()
+            self.send_json(200, payload, etag)
+
+        def do_POST(self):
+            api.count(self.path)
+            self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            self.send_json(200, api.issue_token())
+
+        def log_message(self, format, *args):
+            pass
+
+    mock_server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    thread = threading.Thread(target=mock_server.serve_forever, daemon=True)
+    thread.start()
+    base_url = f'http://127.0.0.1:{mock_server.server_port}'
+    monkeypatch.setattr(get_switch_data, 'PLAY_HISTORIES_URL', f'{base_url}/api/v1.1/users/me/play_histories')
+    monkeypatch.setattr(get_switch_data, 'ACCESS_TOKEN_URL', f'{base_url}/connect/1.0.0/api/token')
+    monkeypatch.setattr(get_switch_data, 'host_rate_limiter', get_switch_data.HostRateLimiter(None))
+    yield api
+    mock_server.shutdown()
+    thread.join()
@@ -0,0 +1,83 @@
+"""多账号：令牌按账号分别保存，并发收集时一个账号失败不影响其他账号，API 按 ?account= 只返回该账号的数据"""
+
+import time
+
+import pytest
+
+import daily_collect
+import database
+import get_switch_data
+
+ACCOUNTS = [database.DEFAULT_ACCOUNT, 'alice', 'bob']
+
+
+def token_for(account_id):
+    return f'token-{account_id or "default"}'
+
+
+def round_for(account_id):
+    """模拟接口按访问令牌生成不同的数据"""
+    return sum(token_for(account_id).encode('utf-8'))
+
+
+def stored_session(account_id):
+    ns = get_switch_data.nsession(account_id=account_id)
+    ns.session_token = f'session-{account_id}'
+    ns.access_token = {'token_type': 'Bearer', 'access_token': token_for(account_id)}
+    ns.expires_at = time.time() + 3600
+    return ns
+
+
+@pytest.fixture
+def collected(nintendo_api):
+    """并发收集三个账号"""
+    get_switch_data.init_database()
+    sessions = {account_id: stored_session(account_id) for account_id in ACCOUNTS}
+    results = daily_collect.collect_accounts(sessions, max_workers=2)
+    assert all(metrics['ok'] for metrics in results.values())
+    return nintendo_api
+
+
+def test_token_files_per_account(workdir):
+    for account_id in ACCOUNTS:
+        ns = stored_session(account_id)
+        ns.access_token['expires_in'] = 900
+        assert ns.save_tokens()
+    assert get_switch_data.token_file_for('alice') != get_switch_data.token_file_for(database.DEFAULT_ACCOUNT)
+    assert get_switch_data.list_accounts() == ACCOUNTS
+    # 重新加载时每个账号读取自己的令牌
+    assert get_switch_data.nsession(account_id='bob').session_token == 'session-bob'
+    assert get_switch_data.nsession().access_token['access_token'] == token_for(database.DEFAULT_ACCOUNT)
+
+
+def test_failing_account_does_not_block_others(nintendo_api, monkeypatch):
+    get_switch_data.init_database()
+    sessions = {account_id: stored_session(account_id) for account_id in ACCOUNTS}
+    monkeypatch.setattr(sessions['alice'], 'ensure_access_token', lambda: False)
+    results = daily_collect.collect_accounts(sessions)
+    assert sorted(results) == sorted(ACCOUNTS)
+    assert not results['alice']['ok']
+    assert results['bob']['ok'] and results[database.DEFAULT_ACCOUNT]['ok']
+
+
+def test_games_are_isolated(collected, client):
+    assert client.get('/api/accounts').get_json() == ACCOUNTS
+    for account_id in ACCOUNTS:
+        games = client.get('/api/games', query_string={'account': account_id}).get_json()
+        totals = {game['title_id']: game['total_played_minutes'] for game in games}
+        assert totals == {title_id: 600 + i + round_for(account_id)
+                          for i, title_id in enumerate(collected.title_ids)}
+    assert client.get('/api/games?account=nobody').get_json() == []
+
+
+def test_history_is_isolated(collected, client):
+    for account_id in ACCOUNTS:
+        days = client.get('/api/history', query_string={'account': account_id}).get_json()
+        assert len(days) == 7
+        assert {game['minutes'] for day in days for game in day['games']} == {30 + round_for(account_id)}
+    assert client.get('/api/history?account=nobody').get_json() == []
+
+
+def test_default_account_is_used_without_parameter(collected, client):
+    assert client.get('/api/games').get_json() == client.get('/api/games?account=').get_json()
+    assert client.get('/api/history').get_json() != client.get('/api/history?account=alice').get_json()
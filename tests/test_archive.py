@@ -0,0 +1,75 @@
+"""原始响应归档：导入旧文件时按内容去重，rebuild 与逐个快照 replay 的结果一致"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import history_archive
+
+TABLES = [
+    ('games', 'title_id, title_name, image_url, device_type'),
+    ('game_history', 'account_id, title_id, first_played_at, last_played_at, '
+                     'total_played_days, total_played_minutes, collected_at'),
+    ('game_latest', '*'),
+    ('daily_play', 'account_id, title_id, played_date, played_minutes, collected_at'),
+    ('play_rollups', '*'),
+    ('game_search', '*'),
+]
+
+
+def table_contents(db_file, table, columns):
+    conn = sqlite3.connect(db_file)
+    try:
+        return sorted(conn.execute(f'SELECT {columns} FROM {table}'))
+    finally:
+        conn.close()
+
+
+def test_import_legacy_files(workdir, make_payload):
+    title_ids = [f'0100{i:012X}' for i in range(10)]
+    os.makedirs(history_archive.LEGACY_HISTORY_DIR)
+    start_time = datetime(2024, 1, 1)
+    # 12 次采集，每 4 次数据变化一次
+    for i in range(12):
+        captured_at = start_time + timedelta(minutes=15 * i)
+        path = os.path.join(history_archive.LEGACY_HISTORY_DIR, captured_at.strftime('history_%Y%m%d_%H%M%S.json'))
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(make_payload(title_ids, i // 4), f, ensure_ascii=False, indent=2)
+
+    assert history_archive.import_history_files() == 12
+    assert history_archive.archive_size()[0] == 3
+    assert history_archive.replay(str(workdir / 'replay.db')) == (3, 9)
+
+
+def test_rebuild_matches_replay(workdir, make_archive):
+    make_archive(snapshots=40, titles=20)
+    replay_db, rebuild_db = str(workdir / 'replay.db'), str(workdir / 'rebuild.db')
+    replayed = history_archive.replay(replay_db)
+    assert history_archive.rebuild(rebuild_db, workers=2) == replayed
+    for table, columns in TABLES:
+        assert table_contents(replay_db, table, columns) == table_contents(rebuild_db, table, columns), table
+
+
+def test_failed_rebuild_keeps_indexes(workdir, make_archive, monkeypatch):
+    make_archive(snapshots=5, titles=10)
+    rebuild_db = str(workdir / 'rebuild.db')
+    history_archive.rebuild(rebuild_db)
+    indexes = table_contents(rebuild_db, 'sqlite_master', 'name')
+    assert ('idx_daily_play_account_title_date',) in indexes
+
+    # 删除索引之后写入 games 时主键冲突
+    merge_snapshots = history_archive.merge_snapshots
+
+    def duplicated(entries, parsed):
+        games, *rest = merge_snapshots(entries, parsed)
+        return (games + games[:1], *rest)
+    monkeypatch.setattr(history_archive, 'merge_snapshots', duplicated)
+    failed_db = str(workdir / 'failed.db')
+    with pytest.raises(sqlite3.IntegrityError):
+        history_archive.rebuild(failed_db)
+    # 索引的删除与写入一起回滚
+    assert table_contents(failed_db, 'sqlite_master', 'name') == indexes
+    assert table_contents(failed_db, 'daily_play', 'COUNT(*)') == [(0,)]
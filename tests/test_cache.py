@@ -0,0 +1,80 @@
+"""API 响应缓存：相同的 If-None-Match 返回 304，数据版本号在进程内缓存，其他连接入库后缓存失效"""
+
+import sqlite3
+
+import pytest
+
+import api_cache
+import database
+import get_switch_data
+
+
+@pytest.fixture
+def queries(make_db):
+    """记录 DataVersionWatcher 常驻连接执行的语句"""
+    make_db()
+    statements = []
+    api_cache.data_version.get()
+    api_cache.data_version._conn.set_trace_callback(statements.append)
+    return statements
+
+
+def test_if_none_match_returns_304(make_db, client):
+    make_db()
+    first = client.get('/api/games')
+    etag = first.headers['ETag']
+    response = client.get('/api/games', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.data == b''
+    assert response.headers['ETag'] == etag
+    # 压缩方式不同的响应 ETag 不同
+    assert client.get('/api/games', headers={'Accept-Encoding': 'gzip'}).headers['ETag'] != etag
+
+
+def test_version_is_read_only_after_changes(queries, client, make_payload):
+    for _ in range(3):
+        client.get('/api/games')
+    # 数据没有变化时每次请求只执行 PRAGMA data_version
+    assert queries == ['PRAGMA data_version'] * 3
+
+    queries.clear()
+    title_ids = [f'0100{i:012X}' for i in range(3)]
+    assert get_switch_data.save_to_database(make_payload(title_ids, 99, days=1, titles_per_day=3))
+    client.get('/api/games')
+    assert queries[0] == 'PRAGMA data_version'
+    assert any('meta' in query for query in queries[1:])
+
+
+def test_version_bump_invalidates_cache(make_db, client):
+    make_db()
+    first = client.get('/api/games')
+    etag = first.headers['ETag']
+
+    # 另一个连接（收集脚本或翻译导入）更新数据版本号
+    conn = sqlite3.connect(database.DB_FILE)
+    database.bump_data_version(conn)
+    conn.execute("UPDATE game_latest SET total_played_minutes = 1 WHERE rowid = 1")
+    conn.commit()
+    conn.close()
+
+    response = client.get('/api/games', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+    assert 1 in [game['total_played_minutes'] for game in response.get_json()]
+    assert response.get_json() != first.get_json()
+
+
+def bump_data_version():
+    conn = sqlite3.connect(database.DB_FILE)
+    database.bump_data_version(conn)
+    conn.commit()
+    conn.close()
+
+
+def test_switching_database_file(make_db, workdir, monkeypatch):
+    make_db()
+    bump_data_version()
+    assert api_cache.data_version.get() == 1
+    monkeypatch.setattr(database, 'DB_FILE', str(workdir / 'other.db'))
+    # 新的数据库没有 meta 表，版本号为 0
+    assert api_cache.data_version.get() == 0
@@ -0,0 +1,54 @@
+"""日历数据：/api/calendar 的 JSON 数组和 uint16 二进制都与按天汇总的 daily_play 一致"""
+
+import calendar
+import sqlite3
+import sys
+from array import array
+from datetime import date
+
+import pytest
+
+import database
+
+YEAR = date.today().year - 1
+
+
+@pytest.fixture
+def expected(make_db):
+    """去年每天的总分钟数，第 0 项为 1 月 1 日"""
+    make_db(years=2)
+    minutes_by_day = [0] * (366 if calendar.isleap(YEAR) else 365)
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        for played_date, minutes in conn.execute('''
+            SELECT played_date, SUM(played_minutes) FROM daily_play
+            WHERE played_date BETWEEN ? AND ? GROUP BY played_date
+        ''', (f'{YEAR}-01-01', f'{YEAR}-12-31')):
+            minutes_by_day[(date.fromisoformat(played_date) - date(YEAR, 1, 1)).days] = minutes
+    finally:
+        conn.close()
+    return minutes_by_day
+
+
+def test_json_matches_daily_play(expected, client):
+    assert client.get(f'/api/calendar?year={YEAR}').get_json() == expected
+
+
+def test_uint16_matches_daily_play(expected, client):
+    binary = array('H')
+    binary.frombytes(client.get(f'/api/calendar?year={YEAR}&format=uint16').data)
+    if sys.byteorder == 'big':
+        binary.byteswap()
+    assert binary.tolist() == expected
+
+
+def test_leap_year_has_366_days(make_db, client):
+    make_db()
+    leap_year = next(year for year in range(YEAR, YEAR + 4) if calendar.isleap(year))
+    assert len(client.get(f'/api/calendar?year={leap_year}').get_json()) == 366
+
+
+@pytest.mark.parametrize('query', ['year=abc', f'year={YEAR}&format=csv'])
+def test_invalid_parameters(make_db, client, query):
+    make_db()
+    assert client.get(f'/api/calendar?{query}').status_code == 400
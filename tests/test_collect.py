@@ -0,0 +1,150 @@
+"""daily_collect.collect_once 的指标：没有写入数据的收集必须记录为失败"""
+
+import time
+
+import pytest
+
+import daily_collect
+import database
+import get_switch_data
+import history_archive
+
+
+@pytest.fixture
+def api(nintendo_api):
+    get_switch_data.init_database()
+    return nintendo_api
+
+
+def stored_session():
+    ns = get_switch_data.nsession()
+    ns.session_token = 'session'
+    ns.access_token = {'token_type': 'Bearer', 'access_token': 'stored'}
+    ns.expires_at = time.time() + 3600
+    return ns
+
+
+def test_successful_collection(api):
+    metrics = daily_collect.collect_once(stored_session())
+    assert metrics['ok']
+    assert metrics['error'] is None
+    assert metrics['games'] == len(api.title_ids)
+
+
+def test_failed_save_is_reported(api, monkeypatch):
+    monkeypatch.setattr(get_switch_data, 'save_to_database', lambda *args, **kwargs: False)
+    metrics = daily_collect.collect_once(stored_session())
+    assert not metrics['ok']
+    assert metrics['status'] == 200
+    assert '保存数据到数据库失败' in metrics['error']
+
+
+def test_parse_error_is_reported(api, monkeypatch):
+    def broken(content):
+        raise ValueError('bad payload')
+    monkeypatch.setattr(get_switch_data, 'parse_play_histories', broken)
+    metrics = daily_collect.collect_once(stored_session())
+    assert not metrics['ok']
+    assert 'bad payload' in metrics['error']
+
+
+def test_failed_save_is_retried(api, monkeypatch):
+    """失败时不记录内容哈希，下一次收集到相同的数据仍会写入"""
+    with monkeypatch.context() as patch:
+        patch.setattr(get_switch_data, 'save_to_database', lambda *args, **kwargs: False)
+        assert not daily_collect.collect_once(stored_session())['ok']
+    metrics = daily_collect.collect_once(stored_session())
+    assert metrics['ok'] and not metrics['unchanged']
+
+
+@pytest.mark.parametrize('expires_in, revoked, expected', [
+    (3600, False, 1),   # 令牌未到期：只请求一次 play_histories
+    (-60, False, 2),    # 令牌已到期：先刷新令牌
+    (3600, True, 3),    # 令牌未到期但被服务器拒绝：收到 401 后刷新并重试一次
+])
+def test_request_count_per_token_state(api, expires_in, revoked, expected):
+    api.valid_tokens = set() if revoked else {'stored'}
+    ns = stored_session()
+    ns.expires_at = time.time() + expires_in
+    metrics = daily_collect.collect_once(ns)
+    assert metrics['ok']
+    assert api.count_of('/play_histories') + api.count_of('/token') == expected
+
+
+def test_only_changes_are_written(api):
+    """连续收集时未变化的数据不新增归档、不写数据库、数据版本号不变，变化时只写入差异"""
+    scenarios = [
+        # (服务器是否返回 ETag, 额外游玩分钟数, 预期 (状态码, 新归档数, 游戏, 历史, 每日, 版本号是否变化))
+        (False, 0, (200, 1, len(api.title_ids), len(api.title_ids), 20 * 7, True)),
+        (False, 0, (200, 0, 0, 0, 0, False)),    # 内容哈希相同
+        (True, 0, (200, 0, 0, 0, 0, False)),     # 首次返回 ETag
+        (True, 0, (304, 0, 0, 0, 0, False)),
+        (True, 15, (200, 1, 0, 1, 1, True)),     # 一个游戏有新的游玩记录
+        (True, 15, (304, 0, 0, 0, 0, False)),
+    ]
+    ns = stored_session()
+    for send_etag, extra_minutes, expected in scenarios:
+        api.send_etag = send_etag
+        api.extra_minutes = extra_minutes
+        conn = database.get_connection()
+        version_before = database.get_data_version(conn)
+        conn.close()
+        objects_before = history_archive.archive_size()[0]
+
+        metrics = daily_collect.collect_once(ns)
+        conn = database.get_connection()
+        version_changed = database.get_data_version(conn) != version_before
+        conn.close()
+        assert metrics['ok']
+        assert (metrics['status'], history_archive.archive_size()[0] - objects_before, metrics['games'],
+                metrics['history_rows'], metrics['daily_rows'], version_changed) == expected
+
+
+def test_unchanged_poll_writes_fetch_state_only_for_new_validators(api, monkeypatch):
+    """数据未变化时只有服务器返回了新的 ETag/Last-Modified 才写入 fetch_state"""
+    writes = []
+    save_fetch_state = get_switch_data.save_fetch_state
+
+    def recording(account_id, etag, last_modified, content_hash, changed):
+        writes.append((etag, changed))
+        save_fetch_state(account_id, etag, last_modified, content_hash, changed)
+    monkeypatch.setattr(get_switch_data, 'save_fetch_state', recording)
+
+    ns = stored_session()
+    scenarios = [
+        # (服务器是否返回 ETag, 预期写入 fetch_state 的次数)
+        (False, 1),     # 首次收集
+        (False, 0),     # 内容哈希相同
+        (True, 1),      # 首次返回 ETag
+        (True, 0),      # 304
+        (True, 0),
+    ]
+    for send_etag, expected in scenarios:
+        api.send_etag = send_etag
+        writes.clear()
+        assert daily_collect.collect_once(ns)['ok']
+        assert len(writes) == expected
+    etag = get_switch_data.load_fetch_state()[0]
+    assert etag and etag.startswith('"')
+
+
+@pytest.mark.parametrize('args, expected', [
+    ([], (daily_collect.DAEMON_INTERVAL, daily_collect.DAEMON_JITTER)),
+    (['600', '30'], (600.0, 30.0)),
+    (['abc'], None),
+    (['600', 'x'], None),
+    (['0'], None),
+    (['600', '-1'], None),
+    (['600', '30', '1'], None),
+])
+def test_daemon_arguments(workdir, monkeypatch, capsys, args, expected):
+    calls = []
+    monkeypatch.setattr(daily_collect, 'run_daemon', lambda interval, jitter: calls.append((interval, jitter)) or 0)
+    monkeypatch.setattr(daily_collect.sys, 'argv', ['daily_collect.py', 'daemon', *args])
+    if expected is None:
+        assert daily_collect.main() == 1
+        assert calls == []
+        assert '用法' in capsys.readouterr().out
+    else:
+        assert daily_collect.main() == 0
+        assert calls == [expected]
@@ -0,0 +1,34 @@
+"""首屏数据：/api/dashboard 的各部分与原来的接口一致，数据版本变化后重新计算"""
+
+import database
+import server
+
+
+def test_matches_original_apis(make_db, client):
+    make_db()
+    body = client.get('/api/dashboard').get_json()
+    games = client.get('/api/games').get_json()
+    periods = client.get('/api/stats/period').get_json()
+
+    assert body['summary']['game_count'] == len(games)
+    assert body['summary']['total_minutes'] == sum(game['total_played_minutes'] for game in games)
+    for period in server.ROLLUP_PERIODS:
+        assert body['summary'][period] == periods[period]
+    assert body['top_games'] == games[:8]
+    assert body['recentPlayHistories'] == client.get('/api/recent_activities').get_json()['recentPlayHistories']
+    assert body['monthly'] == client.get('/api/monthly_playtime').get_json()
+
+
+def test_recomputed_after_data_version_changes(make_db, client):
+    make_db()
+    version = client.get('/api/dashboard').get_json()['data_version']
+    conn = database.get_connection()
+    database.bump_data_version(conn)
+    conn.commit()
+    conn.close()
+    assert client.get('/api/dashboard').get_json()['data_version'] == version + 1
+
+
+def test_invalid_top(make_db, client):
+    make_db()
+    assert client.get('/api/dashboard?top=0').status_code == 400
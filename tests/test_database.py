@@ -0,0 +1,96 @@
+"""共用的连接层：close() 把连接归还连接池并复用，新连接使用 WAL 模式，归还时丢弃未提交的修改"""
+
+import sqlite3
+import threading
+
+import pytest
+
+import database
+
+
+@pytest.fixture
+def pool(workdir):
+    pool = database.ConnectionPool(database.DB_FILE, size=2)
+    yield pool
+    pool.close_all()
+
+
+def test_closed_connection_is_reused(workdir):
+    conn = database.get_connection()
+    conn.close()
+    # 归还的连接仍然可用，下一次获取拿到的是同一个连接
+    assert database.get_connection() is conn
+    assert conn.execute('SELECT 1').fetchone()[0] == 1
+    conn.close()
+
+
+def test_connection_pragmas(workdir):
+    conn = database.get_connection()
+    assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert conn.execute('PRAGMA busy_timeout').fetchone()[0] == int(database.BUSY_TIMEOUT * 1000)
+    assert conn.execute('PRAGMA synchronous').fetchone()[0] == 1  # NORMAL
+    assert conn.row_factory is sqlite3.Row
+    conn.close()
+
+
+def test_release_rolls_back_uncommitted_changes(pool):
+    conn = pool.acquire()
+    conn.execute('CREATE TABLE t (x INTEGER)')
+    conn.commit()
+    conn.execute('INSERT INTO t VALUES (1)')
+    assert conn.in_transaction
+    conn.close()
+
+    conn = pool.acquire()
+    assert not conn.in_transaction
+    assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    conn.close()
+
+
+def test_pool_keeps_at_most_size_idle_connections(pool):
+    connections = [pool.acquire() for _ in range(3)]
+    assert len(set(map(id, connections))) == 3
+    for conn in connections:
+        conn.close()
+    assert pool._idle.qsize() == 2
+    # 超出的连接被真正关闭
+    with pytest.raises(sqlite3.ProgrammingError):
+        connections[-1].execute('SELECT 1')
+
+
+def test_reader_is_not_blocked_by_writer(workdir):
+    writer = database.get_connection()
+    writer.execute('CREATE TABLE t (x INTEGER)')
+    writer.execute('INSERT INTO t VALUES (1)')
+    writer.commit()
+    writer.execute('BEGIN IMMEDIATE')
+    writer.execute('INSERT INTO t VALUES (2)')
+
+    # WAL 模式下写事务未提交时，其他线程的读取直接看到已提交的数据
+    result = []
+
+    def read():
+        reader = database.get_connection()
+        result.append(reader.execute('SELECT COUNT(*) FROM t').fetchone()[0])
+        reader.close()
+
+    thread = threading.Thread(target=read)
+    thread.start()
+    thread.join(timeout=database.BUSY_TIMEOUT)
+    assert result == [1]
+
+    writer.commit()
+    writer.close()
+
+
+def test_close_all_connections(workdir):
+    conn = database.get_connection()
+    conn.close()
+    database.close_all_connections()
+    assert database._pools == {}
+    with pytest.raises(sqlite3.ProgrammingError):
+        conn.execute('SELECT 1')
+    # 关闭后再次获取会创建新的连接池
+    fresh = database.get_connection()
+    assert fresh is not conn
+    fresh.close()
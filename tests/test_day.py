@@ -0,0 +1,44 @@
+"""单日详情：/api/day 与 daily_play 一致，playedDate 带时间和时区时也能按日期读取"""
+
+import sqlite3
+
+import database
+import get_switch_data
+
+
+def test_matches_daily_play(make_db, client):
+    make_db()
+    conn = sqlite3.connect(database.DB_FILE)
+    played_date = conn.execute('SELECT MAX(played_date) FROM daily_play').fetchone()[0]
+    expected = conn.execute('''
+        SELECT title_id, played_minutes FROM daily_play
+        WHERE played_date = ? ORDER BY played_minutes DESC, title_id
+    ''', (played_date,)).fetchall()
+    conn.close()
+
+    body = client.get(f'/api/day/{played_date}').get_json()
+    minutes = [game['minutes'] for game in body['games']]
+    assert sorted((game['title_id'], game['minutes']) for game in body['games']) == sorted(expected)
+    assert minutes == sorted(minutes, reverse=True)
+    assert body['total_minutes'] == sum(minutes for _, minutes in expected)
+
+
+def test_timestamp_played_date(make_payload, client):
+    get_switch_data.init_database()
+    title_ids = [f'0100{i:012X}' for i in range(3)]
+    payload = make_payload(title_ids, 0, days=1, titles_per_day=3)
+    payload['recentPlayHistories'][0]['playedDate'] = '2024-03-01T00:00:00+09:00'
+    assert get_switch_data.save_to_database(payload)
+
+    body = client.get('/api/day/2024-03-01').get_json()
+    assert sorted(game['title_id'] for game in body['games']) == title_ids
+    assert body['total_minutes'] == 30 * len(title_ids)
+    history = client.get('/api/history?from=2024-03-01&to=2024-03-01').get_json()
+    assert sum(game['minutes'] for day in history for game in day['games']) == body['total_minutes']
+    assert client.get('/api/day/2024-03-02').get_json()['games'] == []
+
+
+def test_invalid_date(make_db, client):
+    make_db()
+    assert client.get('/api/day/1999-01-01').get_json()['games'] == []
+    assert client.get('/api/day/2024-13-01').status_code == 400
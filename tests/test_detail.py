@@ -0,0 +1,72 @@
+"""单个游戏的时间序列：各粒度汇总与 daily_play 一致，降采样保留首尾且不超过点数上限"""
+
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import database
+
+POINTS = 50
+
+
+@pytest.fixture
+def title(make_db):
+    """记录天数最多的游戏及其记录的首尾日期"""
+    make_db(titles=10)
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        title_id = conn.execute(
+            'SELECT title_id FROM daily_play GROUP BY title_id ORDER BY COUNT(*) DESC LIMIT 1'
+        ).fetchone()[0]
+        date_from, date_to = conn.execute(
+            'SELECT MIN(played_date), MAX(played_date) FROM daily_play WHERE title_id = ?', (title_id,)
+        ).fetchone()
+    finally:
+        conn.close()
+    return title_id, date_from, date_to
+
+
+def played_minutes(title_id, date_from='0000-00-00', date_to='9999-99-99'):
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        return conn.execute(
+            'SELECT SUM(played_minutes) FROM daily_play WHERE title_id = ? AND played_date BETWEEN ? AND ?',
+            (title_id, date_from, date_to)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+def daily_data(client, title_id, query=''):
+    return client.get(f'/api/game/{title_id}/daily{query}').get_json()['daily_data']
+
+
+@pytest.mark.parametrize('query', ['', '?bucket=week', '?bucket=month'])
+def test_bucket_totals_match_daily_play(title, client, query):
+    title_id = title[0]
+    assert sum(point['minutes'] for point in daily_data(client, title_id, query)) == played_minutes(title_id)
+
+
+def test_date_range_total(title, client):
+    title_id, date_from, date_to = title
+    # 取中间一段作为范围查询的区间
+    middle_from = (date.fromisoformat(date_from) + timedelta(days=100)).isoformat()
+    middle_to = (date.fromisoformat(date_to) - timedelta(days=100)).isoformat()
+    points = daily_data(client, title_id, f'?from={middle_from}&to={middle_to}')
+    assert sum(point['minutes'] for point in points) == played_minutes(title_id, middle_from, middle_to)
+
+
+def test_downsampling(title, client):
+    title_id = title[0]
+    full = daily_data(client, title_id)
+    sampled = daily_data(client, title_id, f'?points={POINTS}')
+    assert len(full) > POINTS
+    assert len(sampled) <= POINTS
+    assert sampled[0] == full[0] and sampled[-1] == full[-1]
+    assert all(point in full for point in sampled)
+
+
+@pytest.mark.parametrize('query', ['?bucket=year', '?from=2024/01/01', '?points=2'])
+def test_invalid_parameters(title, client, query):
+    assert client.get(f'/api/game/{title[0]}/daily{query}').status_code == 400
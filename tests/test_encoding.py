@@ -0,0 +1,102 @@
+"""API 响应编码：gzip/br 压缩后解码与未压缩的 JSON 一致，流式响应分块输出，shape=normalized 还原后与默认结构一致"""
+
+import gzip
+import json
+
+import pytest
+
+import api_encoding
+
+# 流式（不分页）和一次性生成（分页）的响应都要检查
+PATHS = ['/api/history', '/api/history?limit=30', '/api/games', '/api/games?limit=30&sort=name']
+
+
+def decode(response):
+    encoding = response.headers.get('Content-Encoding')
+    if encoding == 'gzip':
+        return json.loads(gzip.decompress(response.data))
+    if encoding == 'br':
+        brotli = pytest.importorskip('brotli')
+        return json.loads(brotli.decompress(response.data))
+    assert encoding is None
+    return json.loads(response.data)
+
+
+def denormalize(body):
+    games = body['games']
+    return [{
+        'date': day['date'],
+        'games': [{**games[index], 'minutes': minutes} for index, minutes in day['games']],
+    } for day in body['days']]
+
+
+@pytest.mark.parametrize('path', PATHS)
+def test_gzip_matches_plain(make_db, client, path):
+    make_db()
+    plain = client.get(path)
+    assert 'Content-Encoding' not in plain.headers
+    # 第一次 gzip 请求在缓存失效后重新生成，第二次命中缓存，两次返回的字节相同
+    compressed = client.get(path, headers={'Accept-Encoding': 'gzip'})
+    assert compressed.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in compressed.headers['Vary']
+    assert decode(compressed) == plain.get_json()
+    assert client.get(path, headers={'Accept-Encoding': 'gzip'}).data == compressed.data
+
+
+def test_streamed_response_cached_with_same_bytes(make_db, client):
+    make_db()
+    # 第一次请求以流式压缩输出，之后命中缓存时返回同样的字节和 ETag
+    first = client.get('/api/history', headers={'Accept-Encoding': 'gzip'})
+    second = client.get('/api/history', headers={'Accept-Encoding': 'gzip'})
+    assert first.data == second.data
+    assert first.headers['ETag'] == second.headers['ETag']
+    assert len(first.data) < len(client.get('/api/history').data) / 4
+
+
+def test_overlapping_first_requests_send_same_bytes(make_db, client):
+    make_db()
+    # 测试客户端在读取 data 时才消费流式响应：两个首次请求同时进行，
+    # 未压缩的先写入缓存，之后命中缓存的 gzip 响应要与流式压缩的字节相同
+    plain = client.get('/api/history')
+    streamed = client.get('/api/history', headers={'Accept-Encoding': 'gzip'})
+    plain.get_data()
+    cached = client.get('/api/history', headers={'Accept-Encoding': 'gzip'})
+    assert cached.headers['ETag'] == streamed.headers['ETag']
+    assert cached.data == streamed.data
+
+
+def test_br_matches_plain(make_db, client, monkeypatch):
+    brotli = pytest.importorskip('brotli')
+    monkeypatch.setattr(api_encoding, 'brotli', brotli)
+    make_db()
+    response = client.get('/api/history', headers={'Accept-Encoding': 'gzip, br'})
+    assert response.headers['Content-Encoding'] == 'br'
+    assert decode(response) == client.get('/api/history').get_json()
+
+
+def test_small_response_is_not_compressed(make_db, client):
+    make_db()
+    response = client.get('/api/history?limit=1', headers={'Accept-Encoding': 'gzip'})
+    assert len(response.data) < api_encoding.MIN_COMPRESS_SIZE
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_json_array_chunks(monkeypatch):
+    monkeypatch.setattr(api_encoding, 'STREAM_CHUNK_SIZE', 64)
+    items = [{'title_id': f'0100{i:012X}', 'name': f'游戏 {i}'} for i in range(20)]
+    chunks = list(api_encoding.json_array_chunks(iter(items)))
+    assert len(chunks) > 1
+    assert json.loads(b''.join(chunks)) == items
+    assert json.loads(b''.join(api_encoding.json_array_chunks(iter([])))) == []
+
+
+@pytest.mark.parametrize('query', [{}, {'limit': 30}, {'from': '2000-01-01', 'limit': 7}])
+def test_normalized_shape_matches_default(make_db, client, query):
+    make_db()
+    default = client.get('/api/history', query_string=query)
+    normalized = client.get('/api/history', query_string={**query, 'shape': 'normalized'})
+    assert denormalize(normalized.get_json()) == default.get_json()
+    assert normalized.headers.get('X-Next-Cursor') == default.headers.get('X-Next-Cursor')
+    # 每款游戏只出现一次
+    games = [game['title_id'] for game in normalized.get_json()['games']]
+    assert len(games) == len(set(games))
@@ -0,0 +1,75 @@
+"""游戏总时长的历史：game_latest 保存最新快照，game_history 只追加变化的记录，compact 删除旧数据中未变化的记录"""
+
+import sqlite3
+
+import pytest
+
+import database
+import get_switch_data
+
+TITLES = 20
+
+
+@pytest.fixture
+def title_ids(workdir):
+    get_switch_data.init_database()
+    return [f'0100{i:012X}' for i in range(TITLES)]
+
+
+def table_rows(sql, params=()):
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        return [tuple(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+def latest_totals():
+    return table_rows('SELECT title_id, total_played_days, total_played_minutes FROM game_latest ORDER BY title_id')
+
+
+def history_count():
+    return table_rows('SELECT COUNT(*) FROM game_history')[0][0]
+
+
+def test_unchanged_totals_add_no_history(title_ids, make_payload):
+    assert get_switch_data.save_to_database(make_payload(title_ids, 0))
+    assert history_count() == TITLES
+    # 总时长没有变化的采集不追加历史记录
+    assert get_switch_data.save_to_database(make_payload(title_ids, 0))
+    assert history_count() == TITLES
+    assert latest_totals() == [(title_id, 10, 600 + i) for i, title_id in enumerate(title_ids)]
+
+
+def test_changed_totals_update_snapshot(title_ids, make_payload, client):
+    assert get_switch_data.save_to_database(make_payload(title_ids, 0))
+    payload = make_payload(title_ids, 0)
+    payload['playHistories'][3]['totalPlayedMinutes'] += 45
+    assert get_switch_data.save_to_database(payload)
+
+    assert history_count() == TITLES + 1
+    assert table_rows('SELECT total_played_minutes FROM game_history WHERE title_id = ? ORDER BY id',
+                      (title_ids[3],)) == [(603,), (648,)]
+    assert latest_totals()[3] == (title_ids[3], 10, 648)
+    games = {game['title_id']: game for game in client.get('/api/games').get_json()}
+    assert games[title_ids[3]]['total_played_minutes'] == 648
+
+
+def test_compact_removes_unchanged_rows(title_ids):
+    # 改动前每次采集都为每个游戏追加一条记录：同一总时长连续出现多次
+    minutes_per_collection = [600, 600, 630, 630, 630, 600]
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.executemany('''
+    INSERT INTO game_history (title_id, total_played_days, total_played_minutes, collected_at)
+    VALUES (?, ?, ?, ?)
+    ''', [(title_id, 10, minutes, f'2024-01-0{n + 1}')
+          for n, minutes in enumerate(minutes_per_collection) for title_id in title_ids])
+    conn.commit()
+    conn.close()
+
+    assert get_switch_data.compact_game_history(batch_size=7)
+    for title_id in title_ids:
+        # 只保留每次变化的第一条记录，变回原值也算变化
+        assert table_rows('''
+        SELECT total_played_minutes, collected_at FROM game_history WHERE title_id = ? ORDER BY id
+        ''', (title_id,)) == [(600, '2024-01-01'), (630, '2024-01-03'), (600, '2024-01-06')]
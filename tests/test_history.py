@@ -0,0 +1,92 @@
+"""/api/history 的分页和日期范围：按 X-Next-Cursor 逐页读取与完整列表一致，playedDate 带时间和时区时也能按日期筛选"""
+
+import sqlite3
+from datetime import date, timedelta
+
+import pytest
+
+import database
+import get_switch_data
+
+
+def history_dates(client, query=None):
+    return [day['date'] for day in client.get('/api/history', query_string=query).get_json()]
+
+
+def all_pages(client, limit, query=None):
+    """从第一页开始按 X-Next-Cursor 读取到最后一页，返回每一页的响应"""
+    pages = [client.get('/api/history', query_string={**(query or {}), 'limit': limit})]
+    while 'X-Next-Cursor' in pages[-1].headers:
+        # 带时区的日期中有 +，cursor 需要编码后传回
+        cursor = pages[-1].headers['X-Next-Cursor']
+        pages.append(client.get('/api/history', query_string={**(query or {}), 'limit': limit, 'cursor': cursor}))
+    return pages
+
+
+@pytest.fixture
+def timestamp_dates(make_payload):
+    """按接口原样保存带时间和时区的 playedDate：2024-03-01 至 2024-03-10，每天 3 款游戏"""
+    get_switch_data.init_database()
+    title_ids = [f'0100{i:012X}' for i in range(3)]
+    payload = make_payload(title_ids, 0, days=10, titles_per_day=3)
+    dates = [(date(2024, 3, 10) - timedelta(days=offset)).isoformat() for offset in range(10)]
+    for day, played_date in zip(payload['recentPlayHistories'], dates):
+        day['playedDate'] = f'{played_date}T00:00:00+09:00'
+    assert get_switch_data.save_to_database(payload)
+    return dates
+
+
+def test_first_page_is_latest_week(make_db, client):
+    make_db()
+    conn = sqlite3.connect(database.DB_FILE)
+    latest = [row[0] for row in conn.execute(
+        'SELECT DISTINCT played_date FROM daily_play ORDER BY played_date DESC LIMIT 7'
+    )]
+    conn.close()
+
+    # 页面首屏只请求最近 7 天
+    response = client.get('/api/history?limit=7')
+    assert [day['date'] for day in response.get_json()] == latest
+    assert response.headers['X-Next-Cursor'] == latest[-1]
+
+
+@pytest.mark.parametrize('limit', [7, 31, 100])
+def test_pages_join_to_full_history(make_db, client, limit):
+    make_db()
+    full = client.get('/api/history').get_json()
+    pages = all_pages(client, limit)
+    assert all(len(page.get_json()) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1].get_json()) <= limit
+    assert 'X-Next-Cursor' not in pages[-1].headers
+    assert [day for page in pages for day in page.get_json()] == full
+
+
+def test_date_range(make_db, client):
+    make_db()
+    full = history_dates(client)
+    date_from, date_to = full[40], full[10]
+    assert history_dates(client, {'from': date_from, 'to': date_to}) == full[10:41]
+    assert history_dates(client, {'from': date_from}) == full[:41]
+    assert history_dates(client, {'to': date_to}) == full[10:]
+    # 日期范围内也可以分页
+    pages = all_pages(client, 7, {'from': date_from, 'to': date_to})
+    assert [day['date'] for page in pages for day in page.get_json()] == full[10:41]
+
+
+def test_timestamp_date_range(timestamp_dates, client):
+    dates = history_dates(client, {'from': '2024-03-03', 'to': '2024-03-05'})
+    assert [day[:10] for day in dates] == ['2024-03-05', '2024-03-04', '2024-03-03']
+    dates = history_dates(client, {'from': '2024-03-10', 'to': '2024-03-10'})
+    assert [day[:10] for day in dates] == ['2024-03-10']
+    assert history_dates(client, {'from': '2024-03-11'}) == []
+
+
+def test_timestamp_pages(timestamp_dates, client):
+    pages = all_pages(client, 4)
+    assert [len(page.get_json()) for page in pages] == [4, 4, 2]
+    assert [day['date'][:10] for page in pages for day in page.get_json()] == timestamp_dates
+
+
+def test_invalid_limit(make_db, client):
+    make_db()
+    assert client.get('/api/history?limit=0').status_code == 400
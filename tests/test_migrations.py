@@ -0,0 +1,90 @@
+"""数据库结构迁移：中途失败时整体回滚，修复后可以重新运行"""
+
+import pytest
+
+import database
+import get_switch_data
+
+
+def user_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+
+def game_columns(conn):
+    return {row[1] for row in conn.execute('PRAGMA table_info(games)')}
+
+
+def test_fresh_database_reaches_latest_version(workdir):
+    assert get_switch_data.init_database()
+    conn = database.get_connection()
+    assert user_version(conn) == len(get_switch_data.SCHEMA_MIGRATIONS)
+    conn.close()
+
+
+def test_failed_migration_rolls_back(workdir, monkeypatch):
+    assert get_switch_data.init_database()
+    latest = len(get_switch_data.SCHEMA_MIGRATIONS)
+
+    def half_done(conn):
+        conn.execute('ALTER TABLE games ADD COLUMN publisher TEXT')
+        raise RuntimeError('interrupted')
+
+    def complete(conn):
+        conn.execute('ALTER TABLE games ADD COLUMN publisher TEXT')
+
+    conn = database.get_connection()
+    monkeypatch.setattr(get_switch_data, 'SCHEMA_MIGRATIONS', get_switch_data.SCHEMA_MIGRATIONS + [half_done])
+    with pytest.raises(RuntimeError):
+        get_switch_data.migrate_database(conn)
+    assert user_version(conn) == latest
+    assert 'publisher' not in game_columns(conn)
+
+    # 重新运行时不会遇到 "duplicate column name"
+    monkeypatch.setattr(get_switch_data, 'SCHEMA_MIGRATIONS', get_switch_data.SCHEMA_MIGRATIONS[:-1] + [complete])
+    get_switch_data.migrate_database(conn)
+    assert user_version(conn) == latest + 1
+    assert 'publisher' in game_columns(conn)
+    conn.close()
+
+
+@pytest.fixture
+def legacy_duplicates(workdir, monkeypatch):
+    """版本 0 的旧数据库：250 款游戏每天各有 3 条重复的每日记录，最后采集的一条（id 最大）时长为 30"""
+    with monkeypatch.context() as patch:
+        patch.setattr(get_switch_data, 'SCHEMA_MIGRATIONS', [])
+        assert get_switch_data.init_database()
+    conn = database.get_connection()
+    rows = [(f'0100{i:012X}', f'2024-01-0{day}', minutes, f'2024-01-0{day}T{minutes}:00:00')
+            for minutes in (10, 20, 30) for day in (1, 2) for i in range(250)]
+    conn.executemany('''
+    INSERT INTO daily_play (title_id, played_date, played_minutes, collected_at) VALUES (?, ?, ?, ?)
+    ''', rows)
+    conn.commit()
+    conn.close()
+    return len(rows)
+
+
+def test_duplicates_are_merged_before_unique_index(legacy_duplicates):
+    assert get_switch_data.init_database()
+    conn = database.get_connection()
+    assert user_version(conn) == len(get_switch_data.SCHEMA_MIGRATIONS)
+    counts = conn.execute('SELECT COUNT(*), MIN(played_minutes), MAX(played_minutes) FROM daily_play').fetchone()
+    assert tuple(counts) == (500, 30, 30)
+    # 汇总表由合并后的记录初始化
+    assert conn.execute(
+        "SELECT SUM(total_minutes) FROM play_rollups WHERE period = 'day' AND title_id != ?",
+        (get_switch_data.ROLLUP_ALL_TITLES,)
+    ).fetchone()[0] == 500 * 30
+    conn.close()
+
+
+def test_deduplicate_commits_each_batch(legacy_duplicates):
+    conn = database.get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    assert get_switch_data.deduplicate_daily_play(conn, batch_size=100) == legacy_duplicates - 500
+    conn.set_trace_callback(None)
+    # 250 款游戏分 3 批，每批单独提交，结束时不留未提交的事务
+    assert statements.count('COMMIT') == 3
+    assert not conn.in_transaction
+    conn.close()
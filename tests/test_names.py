@@ -0,0 +1,51 @@
+"""游戏名称：另一个进程导入翻译后服务器无需重启即可按语言显示，?lang= 只在返回名称的 API 上检查"""
+
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import database
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'game_translation.py')
+
+
+def first_game_name(client, lang):
+    return client.get(f'/api/games?lang={lang}').get_json()[0]['name']
+
+
+def test_translation_import_is_visible_without_restart(make_db, client, workdir):
+    make_db()
+    title_id = sqlite3.connect(database.DB_FILE).execute(
+        'SELECT title_id FROM game_latest ORDER BY total_played_minutes DESC LIMIT 1'
+    ).fetchone()[0]
+    before = first_game_name(client, 'zh')
+
+    with open('game_translations.csv', 'w', newline='', encoding='utf-8') as f:
+        f.write('title_id,japanese_name,chinese_name,english_name\n')
+        f.write(f'{title_id},ゲーム,游戏,Game (EN)\n')
+    # 与服务器不同的进程中导入翻译
+    subprocess.run([sys.executable, SCRIPT, 'import'], cwd=workdir, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    assert before != '游戏'
+    assert first_game_name(client, 'zh') == '游戏'
+    assert first_game_name(client, 'ja') == 'ゲーム'
+    assert first_game_name(client, 'en') == 'Game (EN)'
+    assert client.get(f'/api/game/{title_id}/daily?lang=en').get_json()['name'] == 'Game (EN)'
+
+
+@pytest.mark.parametrize('url', ['/api/games', '/api/history', '/api/recent_activities', '/api/dashboard'])
+def test_unsupported_locale_on_name_api(make_db, client, url):
+    make_db()
+    response = client.get(f'{url}?lang=xx')
+    assert response.status_code == 400
+    assert 'xx' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('url', ['/', '/api/accounts', '/api/stats/period', '/api/calendar', '/script.js'])
+def test_lang_is_ignored_elsewhere(make_db, client, url):
+    make_db()
+    assert client.get(f'{url}?lang=xx').status_code == 200
@@ -0,0 +1,92 @@
+"""server.py 执行的每条查询都不能出现全表扫描"""
+
+import re
+import sqlite3
+from contextlib import contextmanager
+
+import database
+import game_names
+
+# 形如 "SCAN d" 而不带 USING INDEX 的计划步骤即为全表扫描
+FULL_SCAN_PATTERN = re.compile(r'^SCAN (\w+)$')
+
+
+def endpoints(conn):
+    """覆盖 server.py 中所有查询分支的请求"""
+    title_id, played_date = conn.execute(
+        'SELECT title_id, played_date FROM daily_play ORDER BY played_date DESC LIMIT 1'
+    ).fetchone()
+    return [
+        '/api/monthly_playtime',
+        '/api/accounts',
+        '/api/stats/period',
+        f'/api/stats/period?title_id={title_id}',
+        '/api/stats/period/day?limit=30',
+        f'/api/stats/period/week?title_id={title_id}',
+        '/api/stats/period/month?from=2000-01&to=2100-12',
+        '/api/games',
+        '/api/games?q=Game%201&sort=last_played&limit=10',
+        '/api/games?device_type=HAC&sort=days&offset=10&limit=10',
+        '/api/games?q=Ga&sort=name&offset=5&limit=5',
+        '/api/games?device_type=HAC&played_since=2000-01-01&sort=first_played&order=asc',
+        f'/api/game/{title_id}/daily',
+        f'/api/game/{title_id}/daily?from=2000-01-01&to={played_date}&bucket=week',
+        f'/api/game/{title_id}/daily?bucket=month&points=12',
+        '/api/history',
+        '/api/history?limit=31',
+        '/api/history?shape=normalized',
+        f'/api/history?limit=7&cursor={played_date}',
+        f'/api/history?from={played_date}&to={played_date}',
+        '/api/recent_activities',
+        '/api/calendar',
+        '/api/dashboard',
+        f'/api/day/{played_date}',
+        f'/api/calendar?year={played_date[:4]}&format=uint16',
+        '/test',
+    ]
+
+
+@contextmanager
+def trace_statements(statements):
+    """记录期间所有新建连接执行的 SQL 语句（参数已展开）"""
+    original_connect = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        conn = original_connect(*args, **kwargs)
+        conn.set_trace_callback(statements.append)
+        return conn
+
+    sqlite3.connect = connect
+    try:
+        yield statements
+    finally:
+        sqlite3.connect = original_connect
+
+
+def test_no_full_table_scans(make_db, client):
+    db_file = make_db()
+    conn = sqlite3.connect(db_file)
+    # 名称缓存只在服务器启动或翻译变化时整体加载一次，不属于请求路径上的查询
+    game_names.name_cache.games()
+    # 连接池中已有的连接不会被跟踪，先全部关闭
+    database.close_all_connections()
+    statements = []
+    with trace_statements(statements):
+        for url in endpoints(conn):
+            response = client.get(url)
+            assert response.status_code == 200, url
+
+    checked = {}
+    for sql in statements:
+        if sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+            # 参数不同的同一条语句只检查一次
+            checked.setdefault(re.sub(r"'[^']*'|\b\d+\b", '?', ' '.join(sql.split())), sql)
+    assert checked
+
+    full_scans = {}
+    for key, sql in checked.items():
+        details = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+        if any(FULL_SCAN_PATTERN.match(detail) for detail in details):
+            full_scans[key] = details
+    conn.close()
+    assert full_scans == {}
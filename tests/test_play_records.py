@@ -0,0 +1,44 @@
+"""play_histories 响应解析为类型化记录，无效记录被丢弃并按字段计数"""
+
+import json
+
+import pytest
+
+import play_records
+
+
+def test_invalid_records_are_counted(make_payload):
+    title_ids = [f'0100{i:012X}' for i in range(100)]
+    payload = make_payload(title_ids, 0, days=7, titles_per_day=20)
+    # 注入几类错误：缺少名称、时长为字符串、日期格式错误
+    payload['playHistories'][0]['titleName'] = None
+    payload['playHistories'][1]['totalPlayedMinutes'] = '600'
+    payload['recentPlayHistories'].append({'playedDate': 'yesterday', 'dailyPlayHistories': []})
+
+    records = play_records.parse_play_histories(json.dumps(payload).encode('utf-8'))
+    assert dict(records.errors) == {
+        'playHistories.titleName': 1,
+        'playHistories.totalPlayedMinutes': 1,
+        'recentPlayHistories.playedDate': 1,
+    }
+    assert len(records.games) == len(title_ids) - 2
+    assert len(records.daily) == 20 * 7
+
+
+@pytest.mark.parametrize('played_date, valid', [
+    ('2024-02-29', True),
+    ('2024-03-01T00:00:00+09:00', True),
+    ('2023-02-29', False),   # 非闰年
+    ('2024-02-30', False),
+    ('2024-13-01', False),
+    ('2024-00-10', False),
+    ('2024-3-1', False),
+])
+def test_played_date_must_exist(played_date, valid):
+    payload = {'playHistories': [], 'recentPlayHistories': [{
+        'playedDate': played_date,
+        'dailyPlayHistories': [{'titleId': '0100000000000000', 'totalPlayedMinutes': 30}],
+    }]}
+    records = play_records.parse_play_histories(payload)
+    assert len(records.daily) == (1 if valid else 0)
+    assert records.errors['recentPlayHistories.playedDate'] == (0 if valid else 1)
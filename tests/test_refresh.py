@@ -0,0 +1,96 @@
+"""收集数据入库期间服务器不重启：请求不失败，并且能看到新数据和新名称"""
+
+import http.client
+import sqlite3
+import threading
+import time
+
+import get_switch_data
+
+ROUNDS = 3
+
+
+def test_ingest_while_serving(make_db, make_payload, live_server):
+    db_file = make_db(titles=100)
+    title_ids = [row[0] for row in sqlite3.connect(db_file).execute('SELECT title_id FROM games')]
+    stop = threading.Event()
+    etags = set()
+    errors = []
+
+    def reader(host, port):
+        connection = http.client.HTTPConnection(host, port, timeout=30)
+        while not stop.is_set():
+            try:
+                connection.request('GET', '/api/games', headers={'Accept-Encoding': 'gzip'})
+                response = connection.getresponse()
+                response.read()
+            except (OSError, http.client.HTTPException) as e:
+                errors.append(str(e))
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            if response.status != 200:
+                errors.append(response.status)
+            else:
+                etags.add(response.getheader('ETag'))
+        connection.close()
+
+    threads = [threading.Thread(target=reader, args=live_server) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for round_no in range(1, ROUNDS + 1):
+        # 与 get_switch_data.py 每次收集后的入库相同，服务器全程不重启
+        assert get_switch_data.save_to_database(make_payload(title_ids, round_no))
+        time.sleep(0.2)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    # 每一轮入库都会产生新的数据版本，对应新的 ETag
+    assert len(etags) >= ROUNDS + 1
+
+
+def test_rename_is_visible_without_restart(make_db, make_payload, client):
+    make_db(titles=20)
+    title_ids = [f'0100{i:012X}' for i in range(20)]
+    names = {game['title_id']: game['name'] for game in client.get('/api/games').get_json()}
+    assert names[title_ids[3]] == 'Game 3'
+
+    payload = make_payload(title_ids, 1)
+    payload['playHistories'][3]['titleName'] = 'Renamed Game'
+    assert get_switch_data.save_to_database(payload)
+
+    names = {game['title_id']: game['name'] for game in client.get('/api/games').get_json()}
+    assert names[title_ids[3]] == 'Renamed Game'
+
+
+def background_refreshes(nintendo_api, seconds):
+    """从已到期的令牌开始运行后台刷新 seconds 秒，返回刷新令牌的请求数"""
+    get_switch_data.init_database()
+    ns = get_switch_data.nsession()
+    ns.session_token = 'session'
+    ns.access_token = {'token_type': 'Bearer', 'access_token': 'stored'}
+    ns.expires_at = 0
+    ns.start_background_refresh()
+    time.sleep(seconds)
+    ns.stop_background_refresh()
+    return ns, nintendo_api.count_of('/token')
+
+
+def test_token_without_expires_in(nintendo_api):
+    # 令牌响应中没有 expires_in 时按默认有效期计算刷新时间，后台刷新不会空转
+    nintendo_api.expires_in = None
+    ns, refreshes = background_refreshes(nintendo_api, 0.5)
+    assert refreshes == 1
+    expected = time.time() + get_switch_data.DEFAULT_TOKEN_LIFETIME - get_switch_data.TOKEN_REFRESH_AHEAD
+    assert abs(ns.expires_at - expected) < 5
+    assert not ns.access_token_expired()
+
+
+def test_short_lived_token_waits_between_refreshes(nintendo_api, monkeypatch):
+    # 有效期短于 TOKEN_REFRESH_AHEAD 的令牌刷新后仍视为到期，两次刷新之间至少间隔 TOKEN_RETRY_INTERVAL
+    monkeypatch.setattr(get_switch_data, 'TOKEN_RETRY_INTERVAL', 0.2)
+    nintendo_api.expires_in = 10
+    _, refreshes = background_refreshes(nintendo_api, 0.5)
+    assert 2 <= refreshes <= 3
@@ -0,0 +1,91 @@
+"""日/周/月汇总：入库时按时长变化增量更新，结果始终等于按 daily_play 重新汇总"""
+
+import sqlite3
+from collections import Counter
+from datetime import date, timedelta
+
+import pytest
+
+import database
+import get_switch_data
+
+# 跨越月份和 ISO 周的 7 天：2024-02-26（周一）至 2024-03-03（周日）
+DATES = [(date(2024, 3, 3) - timedelta(days=offset)).isoformat() for offset in range(7)]
+
+
+@pytest.fixture
+def ingest(workdir, make_payload):
+    """按固定日期入库第 round_no 轮采集，extra 为 {(下标, 日期): 额外分钟数}"""
+    get_switch_data.init_database()
+    title_ids = [f'0100{i:012X}' for i in range(10)]
+
+    def ingest(round_no, extra=None, account_id=database.DEFAULT_ACCOUNT):
+        payload = make_payload(title_ids, round_no, days=len(DATES), titles_per_day=5)
+        for day, played_date in zip(payload['recentPlayHistories'], DATES):
+            day['playedDate'] = played_date
+            for i, entry in enumerate(day['dailyPlayHistories']):
+                entry['totalPlayedMinutes'] += (extra or {}).get((i, played_date), 0)
+        assert get_switch_data.save_to_database(payload, account_id=account_id)
+        return title_ids
+    return ingest
+
+
+def rollups():
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        return {tuple(row[:4]): row[4] for row in conn.execute(
+            'SELECT account_id, period, title_id, period_key, total_minutes FROM play_rollups'
+        )}
+    finally:
+        conn.close()
+
+
+def expected_rollups():
+    """按 daily_play 重新汇总"""
+    totals = Counter()
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        for account_id, title_id, played_date, minutes in conn.execute(
+            'SELECT account_id, title_id, played_date, played_minutes FROM daily_play'
+        ):
+            for period, period_key in database.rollup_periods(played_date):
+                for rollup_title_id in (title_id, database.ROLLUP_ALL_TITLES):
+                    totals[(account_id, period, rollup_title_id, period_key)] += minutes
+    finally:
+        conn.close()
+    return dict(totals)
+
+
+def test_rollups_follow_changed_minutes(ingest):
+    title_ids = ingest(0)
+    assert rollups() == expected_rollups()
+    # 第二次采集：所有记录各加 1 分钟，其中一条再多玩 45 分钟
+    ingest(1, extra={(2, DATES[0]): 45})
+    assert rollups() == expected_rollups()
+
+    assert rollups()[('', 'week', title_ids[2], '2024-W09')] == 7 * 31 + 45
+    assert rollups()[('', 'month', database.ROLLUP_ALL_TITLES, '2024-03')] == 3 * 5 * 31 + 45
+    assert rollups()[('', 'month', database.ROLLUP_ALL_TITLES, '2024-02')] == 4 * 5 * 31
+
+
+def test_unchanged_ingest_keeps_rollups(ingest):
+    ingest(0)
+    before = rollups()
+    ingest(0)
+    assert rollups() == before
+
+
+def test_accounts_are_rolled_up_separately(ingest):
+    ingest(0)
+    ingest(3, account_id='second')
+    assert rollups() == expected_rollups()
+    assert rollups()[('', 'day', database.ROLLUP_ALL_TITLES, DATES[0])] == 5 * 30
+    assert rollups()[('second', 'day', database.ROLLUP_ALL_TITLES, DATES[0])] == 5 * 33
+
+
+def test_period_series_api(ingest, client):
+    ingest(0)
+    series = client.get('/api/stats/period/week').get_json()
+    assert series == [{'key': '2024-W09', 'minutes': 7 * 5 * 30}]
+    months = client.get('/api/stats/period/month').get_json()
+    assert months == [{'key': '2024-02', 'minutes': 4 * 5 * 30}, {'key': '2024-03', 'minutes': 3 * 5 * 30}]
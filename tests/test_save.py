@@ -0,0 +1,116 @@
+"""save_to_database 的暂存表合并：各表只写入变化的行，写入行数记录在 stats 中，没有变化时数据版本号不变"""
+
+import sqlite3
+
+import pytest
+
+import database
+import get_switch_data
+
+TITLES = 30
+
+
+@pytest.fixture
+def title_ids(workdir):
+    get_switch_data.init_database()
+    return [f'0100{i:012X}' for i in range(TITLES)]
+
+
+def save(payload, **kwargs):
+    stats = {}
+    assert get_switch_data.save_to_database(payload, stats, **kwargs)
+    return stats
+
+
+def versions():
+    """(数据版本号, 名称版本号)"""
+    conn = database.get_connection()
+    try:
+        return database.get_data_version(conn), database.get_names_version(conn)
+    finally:
+        conn.close()
+
+
+def version_changes(before):
+    """相对 before，数据版本号和名称版本号是否变化"""
+    return tuple(now != then for now, then in zip(versions(), before))
+
+
+def table_rows(sql, params=()):
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        return [tuple(row) for row in conn.execute(sql, params)]
+    finally:
+        conn.close()
+
+
+def test_first_ingest_writes_everything(title_ids, make_payload):
+    before = versions()
+    stats = save(make_payload(title_ids, 0, days=7, titles_per_day=10))
+    assert stats == {'games': TITLES, 'history_rows': TITLES, 'daily_rows': 7 * 10, 'invalid': 0}
+    assert table_rows('SELECT COUNT(*) FROM games') == [(TITLES,)]
+    assert table_rows('SELECT COUNT(*), SUM(played_minutes) FROM daily_play') == [(70, 70 * 30)]
+    assert version_changes(before) == (True, True)
+
+
+def test_unchanged_ingest_writes_nothing(title_ids, make_payload):
+    save(make_payload(title_ids, 0))
+    rows = table_rows('SELECT * FROM daily_play ORDER BY id')
+    before = versions()
+    stats = save(make_payload(title_ids, 0))
+    assert stats == {'games': 0, 'history_rows': 0, 'daily_rows': 0, 'invalid': 0}
+    # 没有变化时 collected_at 也不更新，数据版本号不变，服务器缓存继续有效
+    assert table_rows('SELECT * FROM daily_play ORDER BY id') == rows
+    assert version_changes(before) == (False, False)
+
+
+def test_only_changed_rows_are_written(title_ids, make_payload):
+    save(make_payload(title_ids, 0))
+    before = versions()
+    payload = make_payload(title_ids, 0)
+    payload['playHistories'][5]['totalPlayedMinutes'] += 20
+    payload['recentPlayHistories'][0]['dailyPlayHistories'][5]['totalPlayedMinutes'] += 20
+    stats = save(payload)
+    assert stats == {'games': 0, 'history_rows': 1, 'daily_rows': 1, 'invalid': 0}
+    assert table_rows('''
+    SELECT played_minutes FROM daily_play WHERE title_id = ? ORDER BY played_date DESC LIMIT 1
+    ''', (title_ids[5],)) == [(50,)]
+    # 只有数据版本号变化，名称缓存不需要重新加载
+    assert version_changes(before) == (True, False)
+
+
+def test_renamed_game_keeps_translation(title_ids, make_payload):
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.executemany('INSERT INTO game_translations (title_id, japanese_name, chinese_name) VALUES (?, ?, ?)',
+                     [(title_ids[0], 'Game 0', '游戏 0'), (title_ids[1], 'Game 1', '游戏 1')])
+    conn.commit()
+    conn.close()
+    save(make_payload(title_ids, 0))
+    assert table_rows('SELECT chinese_name FROM games WHERE title_id IN (?, ?, ?) ORDER BY title_id',
+                      tuple(title_ids[:3])) == [('游戏 0',), ('游戏 1',), (None,)]
+
+    before = versions()
+    payload = make_payload(title_ids, 0)
+    payload['playHistories'][1]['titleName'] = 'Game 1 Deluxe'
+    stats = save(payload)
+    assert stats['games'] == 1 and stats['history_rows'] == 0
+    assert table_rows('SELECT title_name, chinese_name FROM games WHERE title_id = ?',
+                      (title_ids[1],)) == [('Game 1 Deluxe', '游戏 1')]
+    # 改名后服务器需要重新加载名称缓存
+    assert version_changes(before) == (True, True)
+
+
+def test_staging_tables_are_cleared_between_ingests(title_ids, make_payload):
+    # 暂存表是连接上的临时表，连接归还连接池后复用时不能带入上一次的数据
+    save(make_payload(title_ids, 0), account_id='alice')
+    stats = save(make_payload(title_ids[:5], 0, titles_per_day=5), account_id='bob')
+    assert stats['games'] == 0 and stats['history_rows'] == 5 and stats['daily_rows'] == 7 * 5
+    assert table_rows("SELECT COUNT(*) FROM game_latest WHERE account_id = 'bob'") == [(5,)]
+
+
+def test_invalid_records_are_counted(title_ids, make_payload):
+    payload = make_payload(title_ids, 0)
+    payload['playHistories'][0]['titleId'] = None
+    stats = save(payload)
+    assert stats['invalid'] == 1
+    assert stats['games'] == TITLES - 1
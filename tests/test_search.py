@@ -0,0 +1,137 @@
+"""/api/games 的搜索、筛选、排序和分页：与在完整列表上筛选的结果一致，索引随入库和翻译导入同步"""
+
+import csv
+import sqlite3
+
+import pytest
+
+import database
+import game_names
+import game_translation
+import get_switch_data
+import server
+
+TITLES = 200
+
+
+@pytest.fixture
+def everything(make_db, client):
+    """补上首次/最近游玩时间和设备类型，每 10 款游戏导入一个中文名称，返回完整的游戏列表"""
+    make_db(titles=TITLES, titles_per_day=20)
+    conn = sqlite3.connect(database.DB_FILE)
+    # 合成数据库没有首次/最近游玩时间和其他设备类型，按每日记录补上
+    conn.execute('''
+    UPDATE game_latest SET
+        first_played_at = (SELECT MIN(played_date) FROM daily_play d WHERE d.title_id = game_latest.title_id),
+        last_played_at = (SELECT MAX(played_date) FROM daily_play d WHERE d.title_id = game_latest.title_id)
+    ''')
+    conn.execute("UPDATE games SET device_type = 'BEE' WHERE rowid % 4 = 0")
+    conn.commit()
+    conn.close()
+
+    game_translation.init_translation_table()
+    with open(game_translation.TRANSLATION_CSV, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(game_translation.CSV_HEADER)
+        writer.writerows([f'0100{i:012X}', f'Game {i}', f'塞尔达传说 {i}', ''] for i in range(0, TITLES, 10))
+    assert game_translation.import_translations_from_csv()
+    return client.get('/api/games').get_json()
+
+
+def titles(client, **query):
+    return [game['title_id'] for game in client.get('/api/games', query_string=query).get_json()]
+
+
+def expected(everything, text):
+    names = game_names.name_cache.games()
+    return [game['title_id'] for game in everything if game_names.matches_name(names[game['title_id']], text)]
+
+
+@pytest.mark.parametrize('q, text', [
+    ('Game 1', 'Game 1'),      # FTS5 索引
+    ('gAME 1', 'Game 1'),      # 不区分大小写
+    ('塞尔达传说', '塞尔达传说'),  # 导入的中文名称
+    ('塞尔', '塞尔'),           # 不足 3 个字符时回退到名称缓存
+])
+def test_search_matches_name_substring(everything, client, q, text):
+    assert titles(client, q=q) == expected(everything, text)
+
+
+def test_imported_names_are_searchable(everything, client):
+    assert len(titles(client, q='塞尔达传说')) == len(range(0, TITLES, 10))
+    assert titles(client, q='Metroid') == []
+
+
+def test_sort(everything, client):
+    names = game_names.name_cache.games()
+    by_name = sorted(game['title_id'] for game in everything)
+    by_name.sort(key=lambda title_id: names[title_id].name().casefold())
+    # 最近游玩时间相同的游戏按 title_id 升序排列
+    last_played = {game['title_id']: game['last_played_at'] for game in everything}
+    by_last_played = sorted(last_played)
+    by_last_played.sort(key=last_played.get, reverse=True)
+
+    assert titles(client, sort='name') == by_name
+    assert titles(client, sort='name', order='desc') == by_name[::-1]
+    assert titles(client, sort='last_played') == by_last_played
+
+
+def test_filters(everything, client):
+    names = game_names.name_cache.games()
+    since = sorted(game['last_played_at'] for game in everything)[len(everything) // 2]
+    filtered = [game['title_id'] for game in everything
+                if names[game['title_id']].device_type == 'BEE' and game['last_played_at'] >= since]
+    assert filtered
+    assert sorted(titles(client, device_type='BEE', played_since=since)) == sorted(filtered)
+
+
+@pytest.mark.parametrize('query', [{}, {'sort': 'last_played', 'order': 'asc'}, {'sort': 'name'},
+                                   {'q': 'Game 1', 'sort': 'days'}, {'device_type': 'BEE'}])
+def test_pages_join_to_full_list(everything, client, query):
+    full = titles(client, **query)
+    pages = [client.get('/api/games', query_string={**query, 'limit': 30, 'offset': offset})
+             for offset in range(0, len(full) + 30, 30)]
+    assert [game['title_id'] for page in pages for game in page.get_json()] == full
+    assert all(page.headers['X-Total-Count'] == str(len(full)) for page in pages)
+
+
+@pytest.mark.parametrize('query', [
+    {'sort': 'size'}, {'order': 'up'}, {'limit': 0}, {'limit': server.GAMES_MAX_LIMIT + 1},
+    {'offset': -1}, {'played_since': '2024-13-01'},
+])
+def test_invalid_parameters(everything, client, query):
+    assert client.get('/api/games', query_string=query).status_code == 400
+
+
+def test_index_follows_renames(everything, make_payload, client):
+    # 入库时游戏改名，索引在同一个事务中更新
+    title_ids = [f'0100{i:012X}' for i in range(TITLES)]
+    payload = make_payload(title_ids, 1, days=1, titles_per_day=20)
+    payload['playHistories'][1]['titleName'] = 'Metroid Dread'
+    assert get_switch_data.save_to_database(payload)
+    assert titles(client, q='metroid') == [title_ids[1]]
+    assert title_ids[1] not in titles(client, q='Game 1')
+
+
+def test_total_count_matches_rows(everything, client):
+    conn = sqlite3.connect(database.DB_FILE)
+    # 一款游戏在 games 中没有记录；另一款游戏入库时没有更新名称版本号，名称缓存中还没有它
+    conn.execute('DELETE FROM games WHERE title_id = ?', (everything[0]['title_id'],))
+    conn.execute("INSERT INTO games (title_id, title_name, device_type) VALUES ('01FFFFFFFFFFFFFF', 'New Game', 'HAC')")
+    conn.execute('''
+    INSERT INTO game_latest (account_id, title_id, total_played_days, total_played_minutes, collected_at)
+    VALUES ('', '01FFFFFFFFFFFFFF', 1, 5, '2024-01-01')
+    ''')
+    database.bump_data_version(conn)
+    conn.commit()
+    conn.close()
+
+    full = client.get('/api/games').get_json()
+    assert len(full) == len(everything)
+    assert everything[0]['title_id'] not in [game['title_id'] for game in full]
+    assert {'title_id': '01FFFFFFFFFFFFFF', 'name': 'New Game'}.items() <= full[-1].items()
+    for query in [{}, {'sort': 'name'}, {'device_type': 'HAC'}]:
+        pages = [client.get('/api/games', query_string={**query, 'limit': 30, 'offset': offset})
+                 for offset in range(0, len(full) + 30, 30)]
+        total = sum(len(page.get_json()) for page in pages)
+        assert all(page.headers['X-Total-Count'] == str(total) for page in pages), query
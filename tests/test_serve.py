@@ -0,0 +1,108 @@
+"""生产环境启动脚本：build 只在内容变化时复制模板；多进程服务器处理请求，收到 SIGTERM 后等正在处理的请求完成再退出"""
+
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.request
+
+import pytest
+
+import serve
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 在子进程中启动服务器，额外注册一个耗时的路由用于检查优雅退出
+SERVER_SCRIPT = '''
+import sys, time
+sys.path.insert(0, {repo!r})
+import database
+database.DB_FILE = {db_file!r}
+import serve, server
+
+@server.app.route('/slow')
+def slow():
+    time.sleep(1)
+    return 'done'
+
+serve.run(server.app, '127.0.0.1', {port}, {workers})
+'''
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def fetch(url):
+    with urllib.request.urlopen(url, timeout=10) as response:
+        return response.status, response.read()
+
+
+@pytest.fixture
+def start_server(make_db, workdir):
+    processes = []
+
+    def start(workers):
+        port = free_port()
+        script = SERVER_SCRIPT.format(repo=REPO_DIR, db_file=str(make_db()), port=port, workers=workers)
+        process = subprocess.Popen([sys.executable, '-c', script], cwd=workdir)
+        processes.append(process)
+        base = f'http://127.0.0.1:{port}'
+        deadline = time.monotonic() + 10
+        while True:
+            try:
+                fetch(f'{base}/api/accounts')
+                return process, base
+            except OSError:
+                if time.monotonic() > deadline or process.poll() is not None:
+                    raise
+                time.sleep(0.05)
+    yield start
+    for process in processes:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def test_build_templates(workdir):
+    with open(serve.TEMPLATE_SOURCE, 'w', encoding='utf-8') as f:
+        f.write('<html>v1</html>')
+    assert serve.build_templates()
+    mtime = os.stat(serve.TEMPLATE_FILE).st_mtime_ns
+    # 内容未变化时不改写文件
+    assert not serve.build_templates()
+    assert os.stat(serve.TEMPLATE_FILE).st_mtime_ns == mtime
+
+    with open(serve.TEMPLATE_SOURCE, 'w', encoding='utf-8') as f:
+        f.write('<html>v2</html>')
+    assert serve.build_templates()
+    with open(serve.TEMPLATE_FILE, encoding='utf-8') as f:
+        assert f.read() == '<html>v2</html>'
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='多进程模式仅支持 POSIX')
+@pytest.mark.parametrize('workers', [1, 2])
+def test_graceful_shutdown(start_server, workdir, workers):
+    process, base = start_server(workers)
+    assert (workdir / serve.PID_FILE).read_text() == str(process.pid)
+    status, body = fetch(f'{base}/api/history?limit=7')
+    assert status == 200 and len(json.loads(body)) == 7
+
+    # 请求处理期间收到 SIGTERM：请求正常完成，之后进程退出并删除 PID 文件
+    result = []
+    thread = threading.Thread(target=lambda: result.append(fetch(f'{base}/slow')))
+    thread.start()
+    time.sleep(0.3)
+    process.send_signal(signal.SIGTERM)
+    thread.join()
+    assert result == [(200, b'done')]
+    assert process.wait(timeout=10) == 0
+    assert not (workdir / serve.PID_FILE).exists()
+    with pytest.raises(OSError):
+        fetch(f'{base}/api/accounts')
@@ -0,0 +1,115 @@
+"""翻译导入、导出和应用：重复导入不触发缓存失效，导出只追加不重复，导入和应用只重新索引变化的游戏"""
+
+import csv
+import sqlite3
+
+import pytest
+
+import database
+import game_translation
+import get_switch_data
+
+
+@pytest.fixture
+def games(workdir):
+    """空数据库中的 60 款游戏，前 40 款写入翻译 CSV；返回 [(title_id, 日文名, 中文名)]"""
+    games = [(f'0100{i:012X}', f'ゼルダの伝説 {i}', f'塞尔达传说 {i}') for i in range(60)]
+    get_switch_data.init_database()
+    game_translation.init_translation_table()
+    conn = database.get_connection()
+    conn.executemany('INSERT INTO games (title_id, title_name, device_type) VALUES (?, ?, ?)',
+                     [(title_id, jp_name, 'HAC') for title_id, jp_name, _ in games])
+    conn.commit()
+    conn.close()
+    write_translations(games[:40])
+    return games
+
+
+def write_translations(games):
+    with open(game_translation.TRANSLATION_CSV, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(game_translation.CSV_HEADER)
+        writer.writerows([title_id, jp_name, cn_name, ''] for title_id, jp_name, cn_name in games)
+
+
+def names_version():
+    conn = database.get_connection()
+    try:
+        return database.get_names_version(conn)
+    finally:
+        conn.close()
+
+
+def search(text):
+    conn = sqlite3.connect(database.DB_FILE)
+    try:
+        return {row[0] for row in conn.execute('SELECT title_id FROM game_search WHERE game_search MATCH ?',
+                                                (f'"{text}"',))}
+    finally:
+        conn.close()
+
+
+def test_reimport_keeps_names_version(games):
+    assert game_translation.import_translations_from_csv()
+    version = names_version()
+    assert game_translation.import_translations_from_csv()
+    assert names_version() == version
+
+
+def test_import_updates_search_index(games):
+    title_id, _, cn_name = games[0]
+    assert title_id not in search(cn_name)
+    assert game_translation.import_translations_from_csv()
+    assert title_id in search(cn_name)
+
+
+def test_export_appends_untranslated_once(games):
+    translated = games[:40]
+    game_translation.import_translations_from_csv()
+    game_translation.export_untranslated_games()
+    game_translation.export_untranslated_games()
+    with open(game_translation.TRANSLATION_CSV, newline='', encoding='utf-8') as f:
+        rows = list(csv.reader(f))[1:]
+
+    assert len(rows) == len(games)
+    assert len({row[0] for row in rows}) == len(rows)
+    assert rows[:len(translated)] == [[t, j, c, ''] for t, j, c in translated]
+
+
+def test_apply_reindexes_only_changed_titles(games):
+    game_translation.import_translations_from_csv()
+    version = names_version()
+    # 导入已同步 games.chinese_name，没有需要应用的变化
+    assert game_translation.apply_translations()
+    assert names_version() == version
+
+    title_id = games[0][0]
+    conn = sqlite3.connect(database.DB_FILE)
+    conn.execute("UPDATE game_translations SET chinese_name = '新译名' WHERE title_id = ?", (title_id,))
+    conn.commit()
+    conn.close()
+    assert game_translation.apply_translations()
+    assert names_version() > version
+    assert search('新译名') == {title_id}
+
+
+def test_import_reindexes_only_changed_titles(games, monkeypatch):
+    reindexed = []
+    refresh_search_index = game_translation.refresh_search_index
+
+    def recording(conn, title_ids=None):
+        reindexed.append({row[0] for row in conn.execute(title_ids)})
+        refresh_search_index(conn, title_ids)
+    monkeypatch.setattr(game_translation, 'refresh_search_index', recording)
+
+    assert game_translation.import_translations_from_csv()
+    assert reindexed == [{title_id for title_id, _, _ in games[:40]}]
+
+    # 修改一条翻译、新增一条翻译，其余 39 条不变
+    reindexed.clear()
+    changed = [games[0][:2] + ('新译名',)] + games[1:41]
+    write_translations(changed)
+    assert game_translation.import_translations_from_csv()
+    assert reindexed == [{games[0][0], games[40][0]}]
+    assert search('新译名') == {games[0][0]}
+    assert games[40][0] in search(games[40][2])
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Switch Tracker 游戏名称相似度匹配
+用字符三元组（trigram）的倒排索引，在已翻译的游戏中查找与新游戏名称最相似的条目，
+为续作、豪华版、合集等名称相近的游戏批量给出中文名称建议。
+
+相似度为按逆文档频率（IDF）加权的 Dice 系数，取值 0~1：
+"デラックス"、"for Nintendo Switch" 这类许多游戏共有的后缀权重很低，
+系列名称本身的三元组决定匹配结果
+"""
+
+import re
+import math
+import heapq
+import unicodedata
+from collections import defaultdict
+
+# 比较前去掉空白和标点（长音符 ー 属于字母，会保留）
+_IGNORED = re.compile(r'[\W_]+')
+
+# 低于该相似度的匹配不作为建议
+DEFAULT_MIN_SCORE = 0.3
+
+# 出现在超过该比例名称中的三元组只用于给候选打分，不用来产生候选
+COMMON_GRAM_RATIO = 0.02
+
+
+def normalize(name):
+    """统一全角/半角和大小写，去掉空白和标点"""
+    return _IGNORED.sub('', unicodedata.normalize('NFKC', name or '').lower())
+
+
+def trigrams(name):
+    """返回名称的三元组集合；首尾补空格，较短的名称也能产生三元组"""
+    text = normalize(name)
+    if not text:
+        return frozenset()
+    padded = f'  {text} '
+    return frozenset(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+class TitleMatcher:
+    """已翻译游戏名称的三元组倒排索引"""
+
+    def __init__(self, entries):
+        """entries 为 (名称, 附带数据) 的可迭代对象，附带数据会原样出现在匹配结果中"""
+        self._entries = []
+        self._index = defaultdict(list)
+        entry_grams = []
+        for name, payload in entries:
+            grams = trigrams(name)
+            if not grams:
+                continue
+            position = len(self._entries)
+            self._entries.append((name, payload))
+            entry_grams.append(grams)
+            for gram in grams:
+                self._index[gram].append(position)
+        # 索引中没有出现过的三元组按只出现一次计算权重
+        self._unseen_weight = math.log(len(self._entries) + 1)
+        self._weights = {gram: math.log((len(self._entries) + 1) / len(postings))
+                         for gram, postings in self._index.items()}
+        self._sizes = [sum(self._weights[gram] for gram in grams) for grams in entry_grams]
+        self._grams = entry_grams
+        self._common_limit = max(50, int(len(self._entries) * COMMON_GRAM_RATIO))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def suggest(self, name, limit=3, min_score=DEFAULT_MIN_SCORE):
+        """返回与 name 最相似的至多 limit 个条目：[(相似度, 名称, 附带数据)]，按相似度从高到低排列"""
+        grams = trigrams(name)
+        if not grams:
+            return []
+        rare, common = [], []
+        for gram in grams:
+            postings = self._index.get(gram, ())
+            (common if len(postings) > self._common_limit else rare).append(gram)
+        if not rare:
+            rare, common = common, []
+
+        shared = defaultdict(float)
+        for gram in rare:
+            weight = self._weights.get(gram, self._unseen_weight)
+            for position in self._index.get(gram, ()):
+                shared[position] += weight
+        # 常见三元组的倒排列表很长，只在已有候选上检查
+        for gram in common:
+            weight = self._weights[gram]
+            for position in shared:
+                if gram in self._grams[position]:
+                    shared[position] += weight
+        total = sum(self._weights.get(gram, self._unseen_weight) for gram in grams) or 1.0
+        scored = (
+            (2 * weight / (total + self._sizes[position]), position)
+            for position, weight in shared.items()
+        )
+        best = heapq.nlargest(limit, (item for item in scored if item[0] >= min_score))
+        return [(round(score, 3),) + self._entries[position] for score, position in best]